@@ -0,0 +1,54 @@
+"""Benchmark for the ExtractTable.com client: extracts 48 reports of 2 pages from the local ExtractTable.com stand-in, with a simulated latency and jobs to poll, with as many requests in flight as the process pool used to run (4, and fewer if camelot-py jobs were queued) and with more.
+
+Run from the root of the repository: `python benchmarks/bench_et_client.py`."""
+import os
+import sys
+import tempfile
+import time
+
+import pandas as pd
+from PyPDF2 import PdfWriter
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from extraction.extracttable_client import ExtractTableClient
+from tests.stand_ins import ExtractTableStandIn
+
+LATENCY = 0.1  # seconds
+POLLS = 3
+NB_REPORTS = 48
+
+
+def main():
+    server = ExtractTableStandIn(
+        [pd.DataFrame([["Jurisdiction", "Revenues"], ["France", "1"]]).to_dict()],
+        latency=LATENCY,
+        polls=POLLS,
+    )
+    server.start()
+    try:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            pdf_path = os.path.join(tmp_dir, "report.pdf")
+            writer = PdfWriter()
+            for _ in range(2):
+                writer.add_blank_page(width=200, height=200)
+            with open(pdf_path, "wb") as f:
+                writer.write(f)
+            for max_workers in (1, 4, 16, 48):
+                start = time.perf_counter()
+                with ExtractTableClient(
+                    "key",
+                    max_workers=max_workers,
+                    poll_interval=LATENCY,
+                    trigger_url=server.trigger_url,
+                    result_url=server.result_url,
+                ) as client:
+                    jobs = [client.submit(pdf_path, [1, 2]) for _ in range(NB_REPORTS)]
+                    assert all(len(job.result()) == 1 for job in jobs)
+                elapsed = time.perf_counter() - start
+                print(f"max_workers={max_workers:>2}: {NB_REPORTS} reports in {elapsed:.2f}s")
+    finally:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""Benchmark for the parallel standardization of headless runs: standardizes an archive of copies of the example reports (from their amended tables) with 1 to `os.cpu_count()` standardization workers, checks that the CSV files and the review queue are the same as with a single process, and compares the run times.
+
+Run from the root of the repository: `python benchmarks/bench_parallel_standardization.py`."""
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from extraction import ReviewQueue, Rules, extract_all_reports, get_reports_from_metadata
+
+EXAMPLE_DIR = os.path.join(os.path.dirname(__file__), "..", "example", "inputs")
+NB_COPIES = 100
+
+
+def make_archive(tmp_dir) -> tuple[list, str]:
+    """NB_COPIES copies of each example report with amended tables, as different MNCs (with the rules of the original MNC). Returns the reports and the rules, as a JSON string."""
+    with open(os.path.join(EXAMPLE_DIR, "metadata.json"), encoding="utf-8") as f:
+        example_metadata = json.load(f)
+    with open(os.path.join(EXAMPLE_DIR, "rules.json"), encoding="utf-8") as f:
+        rules = json.load(f)
+    intervened_dir = os.path.join(tmp_dir, "intervened")
+    os.makedirs(intervened_dir)
+    metadata = {}
+    for filename in os.listdir(os.path.join(EXAMPLE_DIR, "amended_tables")):
+        group_name, end_of_year = filename[: -len(".csv")].split("_")
+        for copy in range(NB_COPIES):
+            metadata[f"{group_name} {copy}"] = example_metadata[group_name]
+            for rule_set in rules.values():
+                if group_name in rule_set:
+                    rule_set[f"{group_name} {copy}"] = rule_set[group_name]
+            shutil.copy(
+                os.path.join(EXAMPLE_DIR, "amended_tables", filename),
+                os.path.join(intervened_dir, f"{group_name} {copy}_{end_of_year}.csv"),
+            )
+    return get_reports_from_metadata(json.dumps(metadata)), json.dumps(rules)
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        reports, rules = make_archive(tmp_dir)
+        reference = None
+        for workers in sorted({1, 2, os.cpu_count() or 1}):
+            output_dir = os.path.join(tmp_dir, f"outputs_{workers}")
+            review_queue = ReviewQueue()
+            start = time.perf_counter()
+            not_extracted = extract_all_reports(
+                reports,
+                Rules(rules),
+                os.path.join(tmp_dir, "pdfs"),
+                os.path.join(tmp_dir, "intervened"),
+                os.path.join(tmp_dir, "intermediate_files"),
+                output_dir,
+                default_max_reports=len(reports),
+                quiet=True,
+                review_queue=review_queue,
+                standardization_workers=workers,
+            )
+            run_time = time.perf_counter() - start
+            assert not not_extracted, f"{len(not_extracted)} reports not extracted"
+            outputs = {}
+            for filename in os.listdir(output_dir):
+                with open(os.path.join(output_dir, filename), encoding="utf-8") as f:
+                    outputs[filename] = f.read()
+            if reference is None:
+                reference = (outputs, review_queue.pending())
+            assert (outputs, review_queue.pending()) == reference
+            print(f"{len(reports)} reports, {workers} standardization workers: {run_time:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
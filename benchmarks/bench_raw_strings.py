@@ -0,0 +1,60 @@
+"""Benchmark for the storage of raw extracted tables: memory of a long table built from the example tables (with 20000 more rows of random jurisdictions and amounts) as Python objects and in RAW_STRING_DTYPE, and run times of its profiling (`TableProfile.of`) and of the parsing of its numeric cells. Requires pyarrow (in the requirements): without it, RAW_STRING_DTYPE would be pandas' own string dtype, holding one Python object per cell as well.
+
+Run from the root of the repository: `python benchmarks/bench_raw_strings.py`."""
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from extraction.numeric_cells import parse_numeric_column
+from extraction.schema import RAW_STRING_DTYPE, as_raw_strings
+from extraction.table_profile import TableProfile
+from extraction.utils import CONTRY_TO_ISO3166_MAPPING
+
+TABLES_DIR = os.path.join(os.path.dirname(__file__), "..", "example", "inputs", "amended_tables")
+NB_ROWS = 20000
+REPEAT = 3
+
+
+def random_rows(nb_cols) -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    names = np.array(sorted(CONTRY_TO_ISO3166_MAPPING) + ["Other", "Total", "nan"], dtype=object)
+    rows = pd.DataFrame(
+        rng.integers(-(10**6), 10**6, size=(NB_ROWS, nb_cols)).astype(str), dtype=object
+    )
+    rows[0] = rng.choice(names, NB_ROWS)
+    return rows
+
+
+def timed(function, *args, **kwargs):
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        result = function(*args, **kwargs)
+    return result, (time.perf_counter() - start) / REPEAT
+
+
+def main():
+    if RAW_STRING_DTYPE.storage != "pyarrow":
+        sys.exit("pyarrow is not installed: install the requirements (requirements.txt).")
+    print(f"RAW_STRING_DTYPE: {RAW_STRING_DTYPE!r}")
+    for filename in sorted(os.listdir(TABLES_DIR)):
+        table = pd.read_csv(os.path.join(TABLES_DIR, filename), header=None)
+        long = pd.concat([table.astype(str), random_rows(table.shape[1])], ignore_index=True)
+        print(f"{filename} + {NB_ROWS} rows: {long.shape[0]} rows, {long.shape[1]} columns")
+        results = []
+        for name, df in [("objects", long), ("raw strings", as_raw_strings(long))]:
+            profile, profile_time = timed(TableProfile.of, df)
+            parsed, parse_time = timed(lambda: df.iloc[:, 1:].apply(parse_numeric_column))
+            results.append((profile.nb_countries, profile.nb_terms, parsed))
+            print(
+                f"  {name}: {df.memory_usage(deep=True).sum() / 2**20:.2f}MiB, profile {profile_time * 1000:.0f}ms, numeric cells {parse_time * 1000:.0f}ms"
+            )
+        assert results[0][:2] == results[1][:2]
+        pd.testing.assert_frame_equal(results[0][2], results[1][2])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""Benchmark for the regex rules: checks that `Rules.get_sink_from_regex` (combined matcher) returns the same sinks as trying the regex rules one by one - as done before - with ten times the regex rules of the example rules file.
+
+Run from the root of the repository: `python benchmarks/bench_regex_rules.py`."""
+import json
+import os
+import re
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from extraction import Rules, get_reports_from_metadata
+from extraction.utils import CONTRY_TO_ISO3166_MAPPING
+
+RULES_PATH = os.path.join(os.path.dirname(__file__), "..", "example", "inputs", "rules.json")
+METADATA_PATH = os.path.join(os.path.dirname(__file__), "..", "example", "inputs", "metadata.json")
+SCALE = 10
+
+
+def legacy_sink_from_regex(all_rules: dict, report, source: str, col_or_jur):
+    """The lookup as it was before rule views: merge the scopes and try each regex in turn."""
+    rule_book = all_rules["column_rules" if col_or_jur == "c" else "jurisdiction_rules"]
+    year_rules = rule_book.get(report.group_name, {}).get(report.end_of_year, {})
+    mne_rules = rule_book.get(report.group_name, {}).get("default", {})
+    rules_in_effect = {**rule_book["default"], **mne_rules, **year_rules}
+    for source_rule, sink in rules_in_effect.items():
+        sink = sink["sink"] if isinstance(sink, dict) else sink
+        found = re.search(r"_regex_(.*)", source_rule)
+        if found and re.match(re.compile(found.group(1)), source):
+            return sink
+    return None
+
+
+def scale_regex_rules(all_rules: dict, scale: int) -> dict:
+    """Adds (scale - 1) variants of each regex rule, in every scope, each with a sink of its own."""
+    def scale_scope(scope: dict):
+        out = dict(scope)
+        for source, sink in scope.items():
+            if isinstance(sink, dict) and "sink" not in sink:  # MNC or year level
+                out[source] = scale_scope(sink)
+            elif source.startswith("_regex_"):
+                core = source[len("_regex_"):].lstrip("^").rstrip("$")
+                for i in range(1, scale):
+                    out[f"_regex_^v{i} (?:{core})$"] = f"sink_v{i}"
+        return out
+
+    return {k: scale_scope(v) for k, v in all_rules.items()}
+
+
+def main():
+    with open(RULES_PATH, encoding="utf-8") as f:
+        all_rules = scale_regex_rules(json.load(f), SCALE)
+    rules = Rules(json.dumps(all_rules))
+    reports = [r for r in get_reports_from_metadata(METADATA_PATH) if r.to_extract]
+    names = list(CONTRY_TO_ISO3166_MAPPING)
+    words = ["total", "others", "other", "group total", "europe", "sum of all", "gruppo", "asia and oceania"]
+    names += words + [f"v{i} {w}" for w in words + names[:100] for i in range(1, SCALE)]
+
+    t0 = time.perf_counter()
+    expected = [legacy_sink_from_regex(all_rules, r, n, "j") for r in reports for n in names]
+    legacy_time = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    found = [rules.get_sink_from_regex(r, n, "j") for r in reports for n in names]
+    new_time = time.perf_counter() - t0
+
+    mismatches = [(e, f) for e, f in zip(expected, found) if e != f]
+    nb_regex = sum(k.startswith("_regex_") for k in json.dumps(all_rules).split('"'))
+    print(f"{nb_regex} regex rules, {len(expected)} lookups ({sum(e is not None for e in expected)} matched)")
+    print(f"one by one: {legacy_time:.3f}s, combined: {new_time:.3f}s")
+    if mismatches:
+        raise SystemExit(f"{len(mismatches)} different sinks, e.g. {mismatches[:5]}")
+    print("same sinks returned.")
+
+
+if __name__ == "__main__":
+    main()
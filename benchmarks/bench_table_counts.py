@@ -0,0 +1,82 @@
+"""Benchmark for `count_countries` and `count_CbCR_terms`: checks that the vectorized counts (one pass over the distinct cells of a table) are the same as counting cell by cell - as done before - on wide tables built from the example tables, with 250 more rows of random jurisdictions and amounts, and compares their run times.
+
+Run from the root of the repository: `python benchmarks/bench_table_counts.py`."""
+import itertools
+import os
+import re
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from extraction.standardize_dataframe import count_CbCR_terms, count_countries
+from extraction.utils import CBCR_TERMS, CONTINENTS, CONTRY_TO_ISO3166_MAPPING, ISO3166_ALPHA3, neatify
+
+TABLES_DIR = os.path.join(os.path.dirname(__file__), "..", "example", "inputs", "amended_tables")
+NB_ROWS = 250
+REPEAT = 5
+
+
+def legacy_count_countries(smtg, include_continents=False, stop_at=None) -> int:
+    total = 0
+    iterator = itertools.chain.from_iterable((column for _, column in smtg.items()))
+    for cell in iterator:
+        if (
+            cell.upper() in ISO3166_ALPHA3
+            or (cell.upper() in CONTINENTS if include_continents else False)
+            or CONTRY_TO_ISO3166_MAPPING.get(neatify(cell), "")
+        ):
+            total += 1
+        if stop_at and total >= stop_at:
+            break
+    return total
+
+
+def legacy_count_CbCR_terms(smtg, stop_at=None) -> int:
+    """Without the `stop_at` quirk (the count only stopped within a cell)."""
+    pattern = "|".join(r"\b{}".format(word) for word in CBCR_TERMS)
+    counter = 0
+    for cell in itertools.chain.from_iterable((row for _, row in smtg.iterrows())):
+        counter += len(re.findall(pattern, str(cell.casefold())))
+    return min(counter, stop_at) if stop_at else counter
+
+
+def random_rows(nb_cols) -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    names = np.array(sorted(CONTRY_TO_ISO3166_MAPPING) + ["Other", "Total", "nan"], dtype=object)
+    rows = pd.DataFrame(
+        rng.integers(-(10**6), 10**6, size=(NB_ROWS, nb_cols)).astype(str), dtype=object
+    )
+    rows[0] = rng.choice(names, NB_ROWS)
+    return rows
+
+
+def timed(function, *args, **kwargs):
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        result = function(*args, **kwargs)
+    return result, (time.perf_counter() - start) / REPEAT
+
+
+def main():
+    for filename in sorted(os.listdir(TABLES_DIR)):
+        table = pd.read_csv(os.path.join(TABLES_DIR, filename), header=None).astype(str)
+        wide = pd.concat([table, random_rows(table.shape[1])], ignore_index=True)
+        print(f"{filename} + {NB_ROWS} rows: {wide.shape[0]} rows, {wide.shape[1]} columns")
+        for name, legacy, new, kwargs in [
+            ("count_countries", legacy_count_countries, count_countries, {"include_continents": True}),
+            ("count_CbCR_terms", legacy_count_CbCR_terms, count_CbCR_terms, {}),
+        ]:
+            for stop_at in (None, 10):
+                expected, legacy_time = timed(legacy, wide, stop_at=stop_at, **kwargs)
+                got, new_time = timed(new, wide, stop_at=stop_at, **kwargs)
+                assert got == expected, (name, stop_at, got, expected)
+                print(
+                    f"  {name}(stop_at={stop_at}): {got} - cell by cell {legacy_time * 1000:.2f}ms, vectorized {new_time * 1000:.2f}ms"
+                )
+
+
+if __name__ == "__main__":
+    main()
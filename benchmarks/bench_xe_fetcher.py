@@ -0,0 +1,42 @@
+"""Benchmark for the refresh of monthly_rates.csv: fetches all the rates of monthly_rates.csv from the local XE API stand-in, with a simulated latency, one request at a time (as before) and concurrently.
+
+Run from the root of the repository: `python benchmarks/bench_xe_fetcher.py`."""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from extraction.configuration.exchange_rates_from_XE_api import (
+    MONTHLY_RATES_PATH,
+    read_monthly_rates,
+    update_monthly_rates,
+)
+from tests.stand_ins import XEStandIn, responses_from_monthly_rates
+
+LATENCY = 0.05  # seconds
+
+
+def main():
+    monthly_rates = read_monthly_rates(MONTHLY_RATES_PATH)
+    currencies = list(monthly_rates["from"].unique())
+    years = range(2010, 2023)
+    server = XEStandIn(responses_from_monthly_rates(monthly_rates), latency=LATENCY)
+    server.start()
+    try:
+        for max_workers in (1, 8, 16):
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                path = os.path.join(tmp_dir, "monthly_rates.csv")
+                start = time.perf_counter()
+                nb_rows = update_monthly_rates(
+                    ("id", "key"), path, server.url, currencies, years, max_workers=max_workers
+                )
+                elapsed = time.perf_counter() - start
+                assert nb_rows == len(monthly_rates)
+            print(f"max_workers={max_workers:>2}: {nb_rows} rows in {elapsed:.2f}s")
+    finally:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
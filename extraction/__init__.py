@@ -2,5 +2,6 @@
 from .extract_all_reports import *
 from .cbc_report import *
 from .rules import *
+from .review_queue import *
 from .concat_extracted import *
 from .exceptions import *
\ No newline at end of file
@@ -3,7 +3,8 @@ import argparse
 import os
 from datetime import datetime
 
-from . import Rules, extract_all_reports, get_reports_from_metadata
+from . import ReviewQueue, Rules, extract_all_reports, get_reports_from_metadata
+from .extracttable_client import DEFAULT_ET_REQUESTS, ExtractTableClient
 
 init_time = datetime.now()
 parser = argparse.ArgumentParser(description="A script to extract CbC data from PDFs.")
@@ -27,6 +28,16 @@ parser.add_argument(
     default=False,
     help="do not prompt the operator whenever column or jurisdiction names are not standard. Non-standard names will have a trailing '_tocheck' flag.",
 )
+parser.add_argument(
+    "--review-queue",
+    default=None,
+    help="the path of a review queue (JSON). Runs headless: column and jurisdiction names that no rule applies to are queued, once across all reports with their counts and example contexts, instead of prompting the operator. Reports with names resolved since the previous run (see --resolve-review-queue) are standardized again.",
+)
+parser.add_argument(
+    "--resolve-review-queue",
+    default=None,
+    help="the path of a review queue (JSON). Prompts the operator for all the names in the queue, writes the rules and exits without extracting. Run with --review-queue to apply the new rules.",
+)
 parser.add_argument(
     "-i",
     "--input_pdf_dir",
@@ -45,6 +56,11 @@ parser.add_argument(
     default=os.path.join("inputs", "rules.json"),
     help="the path of the rules file.",
 )
+parser.add_argument(
+    "--rules-store",
+    default=None,
+    help="the path of a SQLite rules store, to be shared by concurrent extraction processes. The rules of the rules file that are not in the store are added to it (rules that differ are reported, the store's being used); the rules file is then replaced by an export of the store.",
+)
 parser.add_argument(
     "-m",
     "--metadata",
@@ -62,6 +78,17 @@ parser.add_argument(
     default=None,
     help="the path at which to write the file with the justifications for the rules.",
 )
+parser.add_argument(
+    "--write_rule_stats_to",
+    default=None,
+    help="the path at which to write, for each rule, how many times it applied and the time spent matching it. Rules are slower to match while recording.",
+)
+parser.add_argument(
+    "--regex-time-budget",
+    default=None,
+    type=float,
+    help="time budget, in seconds, for matching a regex rule. Regex rules are tried against adversarial strings when loaded or created, and skipped if they take longer than the budget (without a budget, only the rules that look prone to catastrophic backtracking are tried). A rule taking longer than the budget to match a name while extracting is reported and skipped from then on.",
+)
 parser.add_argument(
     "--after_intervention_dir",
     default=os.path.join("inputs", "files_after_human_intervention"),
@@ -70,11 +97,106 @@ parser.add_argument(
 parser.add_argument(
     "-k", "--et_key", default=None, help="KEY for the ExtractTable.com API"
 )
+parser.add_argument(
+    "--et-max-requests",
+    default=DEFAULT_ET_REQUESTS,
+    type=int,
+    help="number of ExtractTable.com requests in flight at once. They wait on the network in threads, alongside the camelot-py processes.",
+)
+parser.add_argument(
+    "--et-credits-per-second",
+    default=None,
+    type=float,
+    help="paces ExtractTable.com requests so that no more credits (one per page) are spent per second on average.",
+)
+parser.add_argument(
+    "--et-max-credits",
+    default=None,
+    type=int,
+    help="number of ExtractTable.com credits the run may spend at most. Reports that would need more fail to extract.",
+)
+parser.add_argument(
+    "--et-timeout",
+    default=60,
+    type=float,
+    help="timeout, in seconds, of each request to ExtractTable.com. Failed requests are retried with exponential backoff.",
+)
+parser.add_argument(
+    "--camelot-workers",
+    default=None,
+    type=int,
+    help="number of processes running camelot-py. Defaults to one per core, fewer if their workers would not fit in the available memory.",
+)
+parser.add_argument(
+    "--camelot-timeout",
+    default=600,
+    type=float,
+    help="time, in seconds, after which a camelot-py job is interrupted (its worker is killed if the job is stuck, e.g. in ghostscript). The report then fails to extract and the next ones are extracted.",
+)
+parser.add_argument(
+    "--camelot-memory-limit",
+    default=None,
+    type=int,
+    help="maximum virtual address space (RLIMIT_AS, not resident memory), in MiB, of each camelot-py process, ghostscript included: set it well above the memory a job actually uses. Jobs needing more fail, and so do their reports. Not enforced on Windows.",
+)
+parser.add_argument(
+    "--camelot-rss-limit",
+    default=None,
+    type=int,
+    help="maximum resident memory (RSS), in MiB, of each camelot-py process: the worker of a job using more is killed, and the job's report fails. Checked every 0.1s, on Linux only.",
+)
+parser.add_argument(
+    "--camelot-max-tasks-per-child",
+    default=100,
+    type=int,
+    help="number of jobs after which a camelot-py process is replaced by a new one, so that leaked memory does not pile up (Python 3.11 or later). 0 to never replace them.",
+)
+parser.add_argument(
+    "--standardization-workers",
+    default=None,
+    type=int,
+    help="number of processes standardizing reports in parallel. Only for headless runs (--operator-wont-intervene or --review-queue): workers use a snapshot of the rules taken at the start of the run. Defaults to one per core, fewer if their workers would not fit in the available memory alongside the camelot-py ones.",
+)
+parser.add_argument(
+    "--prefetch",
+    default=2,
+    type=int,
+    help="number of reports whose PDF-to-table extraction is submitted ahead of time, so that it runs while the current report is standardized (and the operator prompted).",
+)
 args = parser.parse_args()
 
-rules = Rules(args.rules)
+rules = Rules(
+    args.rules,
+    store=args.rules_store,
+    record_stats=bool(args.write_rule_stats_to),
+    regex_time_budget=args.regex_time_budget,
+)
+reports = get_reports_from_metadata(args.metadata)
+if args.resolve_review_queue:
+    review_queue = ReviewQueue(args.resolve_review_queue)
+    nb_resolved = review_queue.resolve(rules, reports)
+    review_queue.save()
+    rules.write(args.rules)
+    if args.write_justifications_to:
+        rules.export_justifications_to_csv(args.write_justifications_to)
+    print(f" \n{nb_resolved} names resolved, {len(review_queue)} left in the review queue.")
+    print(f" \nReports to standardize again ({len(review_queue.reports_to_restandardize())}) below:")
+    print("\n".join(sorted(review_queue.reports_to_restandardize())))
+    raise SystemExit()
+review_queue = ReviewQueue(args.review_queue) if args.review_queue else None
+et_client = (
+    ExtractTableClient(
+        args.et_key,
+        max_workers=args.et_max_requests,
+        credits_per_second=args.et_credits_per_second,
+        max_credits=args.et_max_credits,
+        timeout=args.et_timeout,
+    )
+    if args.et_key
+    else None
+)
 not_extracted = extract_all_reports(
-    get_reports_from_metadata(args.metadata),
+    reports,
     rules,
     default_max_reports=1000,
     force_rewrite=args.force_rewrite,
@@ -83,13 +205,40 @@ not_extracted = extract_all_reports(
     intervened_dir=args.after_intervention_dir,
     intermediate_files_dir=args.intermediate_files_dir,
     write_tables_to_dir=args.write_tables_to_dir,
-    quiet=args.quiet, key=args.et_key
+    quiet=args.quiet, key=args.et_key,
+    review_queue=review_queue,
+    prefetch=args.prefetch,
+    standardization_workers=args.standardization_workers,
+    et_client=et_client,
+    camelot_workers=args.camelot_workers,
+    camelot_timeout=args.camelot_timeout or None,
+    camelot_memory_limit=args.camelot_memory_limit * 2**20 if args.camelot_memory_limit else None,
+    camelot_rss_limit=args.camelot_rss_limit * 2**20 if args.camelot_rss_limit else None,
+    camelot_max_tasks_per_child=args.camelot_max_tasks_per_child or None,
 )
+if et_client is not None:
+    et_client.close()
+    print(f" \nExtractTable.com credits spent: {et_client.credits_spent}.")
 
 rules.write(args.rules)
+if review_queue is not None:
+    review_queue.save()
 if args.write_justifications_to:
     rules.export_justifications_to_csv(args.write_justifications_to)
+if args.write_rule_stats_to:
+    rules.export_rule_stats_to_csv(args.write_rule_stats_to)
+    print(
+        f" \nTime spent in rule lookups: {rules.lookup_time['strict']:.3f}s strict, {rules.lookup_time['regex']:.3f}s regex."
+    )
 
+if rules.skipped_rules:
+    print(f" \nSkipped rules ({len(rules.skipped_rules)}) below:")
+    print("\n".join([f"{rule}: {reason}" for rule, reason in rules.skipped_rules.items()]))
+if rules.slow_matches:
+    print(f" \nSlow regex rules ({len(rules.slow_matches)}) below:")
+    print("\n".join([f"{rule}: {elapsed:.3f}s" for rule, elapsed in rules.slow_matches.items()]))
+if review_queue is not None:
+    print(f" \nNames to review ({len(review_queue)}) in {args.review_queue}.")
 print(f" \nNot extracted ({len(not_extracted)}) below:")
 print("\n".join([str(f) for f in not_extracted]))
 print(f" \n Total time spent: {datetime.now() - init_time}\n")
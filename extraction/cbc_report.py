@@ -61,6 +61,14 @@ class CbCReport:
         except KeyError:
             return 2
 
+    @property
+    def months_in_period(self) -> int:
+        """Length of the reporting period, in months: 12 unless stated otherwise (e.g. first or transition fiscal years)."""
+        try:
+            return int(self.metadata['months_in_period'])
+        except KeyError:
+            return 12
+
     @property
     def min_nb_jurs_per_table(self):
         try:
@@ -23,10 +23,16 @@ parser.add_argument(
     "--rules_file",
     help="Path to rules file. Must be provided.",
 )
+parser.add_argument(
+    "--to_euro",
+    default=False,
+    action="store_true",
+    help="add the monetary columns converted to EUR (`<column>_eur`).",
+)
 args = parser.parse_args()
 
 reports_ = get_reports_from_metadata(args.metadata_path)
 rules_ = Rules(args.rules_file)
 concatenate_tables(
-    args.extracted_tables_at, args.aggregate_output_path, rules_, reports_
+    args.extracted_tables_at, args.aggregate_output_path, rules_, reports_, to_euro=args.to_euro
 )
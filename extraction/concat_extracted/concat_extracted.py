@@ -2,23 +2,53 @@
 import csv
 import os
 from os.path import exists
+import numpy as np
 import pandas as pd
 
 from ..cbc_report import CbCReport
 from ..exceptions import StandardizationError
 from ..log import logger
-from ..rules import Rules
+from ..rules import IRS_COLUMNS, Rules
+from ..schema import concat_standardized, read_standardized_csv
 from ..standardize_dataframe import apply_rules_to_rows, trim_dataframe
+from ..utils import EXCHANGE_RATES
 
 __all__ = ["concatenate_tables"]
 
+MONETARY_COLUMNS = [column for column in IRS_COLUMNS if column != "employees"]
+
+
+def add_euro_columns(df: pd.DataFrame) -> None:
+    """In-place. Adds a `<column>_eur` column for each monetary column, converted with the `multiplier_to_euro` of each row (the rate over the period of its report). Rows without one (tables standardized before the column existed) are converted with the rate of their currency as of their end of year; conversions with no known rate are left empty."""
+    to_convert = [column for column in MONETARY_COLUMNS if column in df.columns]
+    if "multiplier_to_euro" in df.columns:
+        multipliers = pd.to_numeric(df["multiplier_to_euro"], errors="coerce").astype("float64").to_numpy()
+    else:
+        multipliers = np.full(len(df), np.nan)
+    missing = np.isnan(multipliers)
+    for currency in pd.unique(df["currency"][missing]):
+        rows = missing & (df["currency"] == currency).to_numpy()
+        try:
+            multipliers[rows] = EXCHANGE_RATES.rates(df["currency"][rows], df["end_of_year"][rows])
+        except StandardizationError as exception:
+            logger.error("No conversion to EUR of %s rows: %s", rows.sum(), exception)
+    for column in to_convert:
+        df[f"{column}_eur"] = (
+            pd.to_numeric(df[column], errors="coerce").astype("float64").to_numpy() * multipliers
+        )
+
 
 def concatenate_tables(
-    extracted_tables_at, aggregate_output_path, rules: Rules, reports: list[CbCReport]
+    extracted_tables_at,
+    aggregate_output_path,
+    rules: Rules,
+    reports: list[CbCReport],
+    to_euro=False,
 ):
     """made separate from the extraction of each report so as to allow more flexibility in the
     extraction of each report and ensuring greater rigidity
-     in the final database comprised of all extracted reports."""
+     in the final database comprised of all extracted reports.
+    If `to_euro`, monetary columns are also given in EUR (`<column>_eur`)."""
     cumulative_df = []
     for report in reports:
         try:
@@ -28,17 +58,17 @@ def concatenate_tables(
             if not exists(extracted_report_path):
                 logger.info("%s not extracted so not in output file.", report)
                 continue
-            dataframe = pd.read_csv(
-                extracted_report_path,
-                dtype={"parent_entity_nace2_core_code": "str"},
-            )
+            dataframe = read_standardized_csv(extracted_report_path)
             apply_rules_to_rows(dataframe, report, rules)
             trim_dataframe(dataframe)
             cumulative_df.append(dataframe)
         except StandardizationError as exception:
             logger.error(exception, exc_info=True)
 
-    pd.concat(cumulative_df).to_csv(
+    aggregate_df = concat_standardized(cumulative_df)
+    if to_euro:
+        add_euro_columns(aggregate_df)
+    aggregate_df.to_csv(
         aggregate_output_path, index=False, quoting=csv.QUOTE_NONNUMERIC
     )
     print(f"\n wrote aggregate CSV to: {aggregate_output_path}")
@@ -1,60 +1,176 @@
-import requests
+"""Fetches from the XE API the monthly average rates to EUR missing from monthly_rates.csv and appends them to it. Requests share a pooled session, run concurrently (a bounded number at a time) and are retried with exponential backoff, so an interrupted refresh resumes where it stopped.
+Credentials are read from the environment (XE_API_ID and XE_API_KEY) or given as arguments. Run from the root of the repository: python -m extraction.configuration.exchange_rates_from_XE_api
+To refresh offline (tests, benchmarks), point --url to the stand-in of tests/stand_ins.py (`python tests/stand_ins.py xe`)."""
+import argparse
+import calendar
+import datetime
 import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+CONFIGURATION_DIR = os.path.dirname(os.path.abspath(__file__))
+MONTHLY_RATES_PATH = os.path.join(CONFIGURATION_DIR, "monthly_rates.csv")
+XE_API_URL = "https://xecdapi.xe.com/v1/monthly_average/"
+BASE_CURRENCY = "EUR"
+CURRENCIES_OF_INTEREST = [
+    "EUR",
+    "NOK",
+    "MXN",
+    "USD",
+    "ZAR",
+    "GBP",
+    "INR",
+    "DKK",
+    "COP",
+    "JPY",
+    "SEK",
+    "AUD",
+    "CHF",
+    "BRL",
+    "PLN",
+    "CNY",
+    "CAD",
+    "HKD",
+    "SGD",
+    "THB",
+    "MYR",
+    "NZD",
+    "RUB",
+    "TWD",
+]
+FIRST_YEAR = 2010
+MONTHLY_RATES_COLUMNS = ["from", "to", "end_of_month", "average_rate", "number_of_days"]
+# throttling and server errors are retried; authentication errors are not.
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+def make_session(auth, max_workers=8, retries=5, backoff_factor=0.5) -> requests.Session:
+    """Session with one pooled connection per worker, retrying failed requests after backoff_factor * 2 ** (attempt - 1) seconds."""
+    session = requests.Session()
+    session.auth = auth
+    adapter = HTTPAdapter(
+        pool_connections=1,
+        pool_maxsize=max_workers,
+        max_retries=Retry(
+            total=retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=RETRY_STATUSES,
+            raise_on_status=False,
+        ),
+    )
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
 
-# using free  for XE API. New credentials will be needed!
-base_currency = "EUR"
-currencies_of_interest = ["EUR",
-                          "NOK",
-                          "MXN",
-                          "USD",
-                          "ZAR",
-                          "GBP",
-                          "INR",
-                          "DKK",
-                          "COP",
-                          "JPY",
-                          "SEK",
-                          "AUD",
-                          "CHF",
-                          "BRL",
-                          "PLN",
-                          "CNY",
-                          "CAD",
-                          "HKD",
-                          "SGD",
-                          "THB",
-                          "MYR",
-                          "NZD",
-                          "RUB",
-                          "TWD"
-                          ]
-base = 'https://xecdapi.xe.com/v1/monthly_average/'
-print("from,to,end_of_month,average_rate,number_of_days")
-
-# end_march = f"{year}.03.31"
-# end_june = f"{year}.06.30"
-# end_december = f"{year}.12.31"
-    # print(f"EUR,EUR,{year},1")
-for cur in currencies_of_interest:
-    for year in range(2010, 2023):
-        msg = f"{base}?from={cur}&to={base_currency}&year={year}"
-        response = requests.get(
-            msg,
-            auth=('vaitefoder773176967', 'uumk0r6ia8k1ek8augb2uun5m1') # using free trial, new credentials needed!
+def fetch_year(session, url, currency, year, record_dir=None, timeout=30) -> list[tuple]:
+    """Monthly average rates of the currency to EUR over the year, as rows of monthly_rates.csv. The raw response is saved in record_dir (as {currency}_{year}.json) if given, for the stand-in to replay."""
+    response = session.get(
+        url, params={"from": currency, "to": BASE_CURRENCY, "year": year}, timeout=timeout
+    )
+    response.raise_for_status()
+    data = response.json()
+    if record_dir is not None:
+        with open(os.path.join(record_dir, f"{currency}_{year}.json"), "w", encoding="utf-8") as f:
+            json.dump(data, f)
+    return [
+        (
+            currency,
+            BASE_CURRENCY,
+            f"{year}.{str(month['month']).rjust(2, '0')}.{month['daysInMonth']}",
+            month["monthlyAverage"],
+            month["daysInMonth"],
         )
+        for month in data["to"][BASE_CURRENCY]
+    ]
+
+
+def read_monthly_rates(monthly_rates_path=MONTHLY_RATES_PATH) -> pd.DataFrame:
+    if not os.path.exists(monthly_rates_path):
+        return pd.DataFrame(columns=MONTHLY_RATES_COLUMNS)
+    return pd.read_csv(monthly_rates_path, dtype={"end_of_month": str}, float_precision="round_trip")
+
+
+def missing_years(monthly_rates: pd.DataFrame, currencies, years, today=None) -> list[tuple]:
+    """(currency, year) pairs with months that are over and not in monthly_rates."""
+    today = today or datetime.date.today()
+    known = set(zip(monthly_rates["from"], monthly_rates["end_of_month"]))
+    out = []
+    for currency in currencies:
+        for year in years:
+            last_month = 12 if year < today.year else today.month - 1
+            if any(
+                (currency, f"{year}.{str(month).rjust(2, '0')}.{calendar.monthrange(year, month)[1]}")
+                not in known
+                for month in range(1, last_month + 1)
+            ):
+                out.append((currency, year))
+    return out
+
+
+def update_monthly_rates(
+    auth,
+    monthly_rates_path=MONTHLY_RATES_PATH,
+    url=XE_API_URL,
+    currencies=CURRENCIES_OF_INTEREST,
+    years=None,
+    max_workers=8,
+    retries=5,
+    backoff_factor=0.5,
+    record_dir=None,
+) -> int:
+    """Fetches the years with missing months and appends the missing months to monthly_rates.csv. Returns the number of rows appended.
+    Rows are appended as soon as the requests (in the order of currencies, then years) are done, so that an interrupted refresh does not lose the months already fetched."""
+    years = years or range(FIRST_YEAR, datetime.date.today().year + 1)
+    monthly_rates = read_monthly_rates(monthly_rates_path)
+    known = set(zip(monthly_rates["from"], monthly_rates["end_of_month"]))
+    to_fetch = missing_years(monthly_rates, currencies, years)
+    header = not os.path.exists(monthly_rates_path)
+    nb_appended = 0
+    with make_session(auth, max_workers, retries, backoff_factor) as session, ThreadPoolExecutor(
+        max_workers=max_workers
+    ) as executor:
+        futures = [
+            executor.submit(fetch_year, session, url, currency, year, record_dir)
+            for currency, year in to_fetch
+        ]
+        for future in futures:
+            rows = [row for row in future.result() if (row[0], row[2]) not in known]
+            if not rows:
+                continue
+            pd.DataFrame(rows, columns=MONTHLY_RATES_COLUMNS).to_csv(
+                monthly_rates_path, mode="a", header=header, index=False
+            )
+            header = False
+            nb_appended += len(rows)
+    return nb_appended
+
 
-        data = json.loads(response.content)
-        # print(data)
-        jsonData = data["to"]['EUR']
-        out = 0
-        days_year = 0
-        for month in jsonData:
-            avg = month["monthlyAverage"]
-            days = month["daysInMonth"]
-            print(f"{cur},{base_currency},{year}.{str(month['month']).rjust(2, '0')}.{days},{avg},{days}")
-        #     days_year += days
-        #     out += avg * days
-        # if days_year > 366 or days_year < 364:
-        #     raise ValueError("Wrong number of days.")
-        # out = out / days_year
-        # print(f"{cur},{base_currency},{year}.{month},{out}")
\ No newline at end of file
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--api_id", default=os.environ.get("XE_API_ID"), help="defaults to $XE_API_ID")
+    parser.add_argument("--api_key", default=os.environ.get("XE_API_KEY"), help="defaults to $XE_API_KEY")
+    parser.add_argument("--url", default=XE_API_URL)
+    parser.add_argument("--monthly_rates", default=MONTHLY_RATES_PATH)
+    parser.add_argument("--first_year", type=int, default=FIRST_YEAR)
+    parser.add_argument("--max_workers", type=int, default=8, help="number of concurrent requests")
+    parser.add_argument("--retries", type=int, default=5)
+    parser.add_argument("--record_to", help="directory where to save the raw responses, for the stand-in to replay")
+    args = parser.parse_args()
+    if args.api_id is None or args.api_key is None:
+        parser.error("XE credentials are needed: set XE_API_ID and XE_API_KEY or use --api_id and --api_key.")
+    nb_appended = update_monthly_rates(
+        (args.api_id, args.api_key),
+        monthly_rates_path=args.monthly_rates,
+        url=args.url,
+        years=range(args.first_year, datetime.date.today().year + 1),
+        max_workers=args.max_workers,
+        retries=args.retries,
+        record_dir=args.record_to,
+    )
+    print(f"{nb_appended} rows appended to {args.monthly_rates}.")
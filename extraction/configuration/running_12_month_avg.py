@@ -1,22 +1,31 @@
+"""Appends to rolling_avg_rate.csv the day-weighted average rates of the 12 months ending at each month end of monthly_rates.csv that is not there yet. Months need not be in order in monthly_rates.csv, and months missing for a currency do not end up inside a 12 months window.
+Run from the root of the repository: python -m extraction.configuration.running_12_month_avg"""
+import os
+
 import pandas as pd
-from collections import deque
-# relies too much on the order from the monthly_rates2.csv, which, in turn, relies on the http response from the XE API. tested and appears to have same values as the one previously used.
+
+from extraction.exchange_rates import MonthlyRates
+
+CONFIGURATION_DIR = os.path.dirname(os.path.abspath(__file__))
+MONTHLY_RATES_PATH = os.path.join(CONFIGURATION_DIR, "monthly_rates.csv")
+ROLLING_AVG_RATE_PATH = os.path.join(CONFIGURATION_DIR, "rolling_avg_rate.csv")
+
+
+def update_rolling_avg_rate(monthly_rates_path=MONTHLY_RATES_PATH, rolling_avg_rate_path=ROLLING_AVG_RATE_PATH, months=12) -> int:
+    """Returns the number of rows appended."""
+    with open(monthly_rates_path, "r", encoding="utf-8") as f:
+        monthly_rates = MonthlyRates.from_csv(f.read())
+    averages = monthly_rates.rolling_averages(months)
+    if os.path.exists(rolling_avg_rate_path):
+        existing = pd.read_csv(rolling_avg_rate_path, dtype={"end_of_year": str})
+        known = pd.MultiIndex.from_frame(existing[["from", "end_of_year"]])
+        averages = averages[~pd.MultiIndex.from_frame(averages[["from", "end_of_year"]]).isin(known)]
+        header = False
+    else:
+        header = True
+    averages.to_csv(rolling_avg_rate_path, mode="a", header=header, index=False)
+    return len(averages)
 
 
-# Create a deque with a maximum length of 12
-cache_currency = deque(maxlen=12)
-cache_avg_and_days = deque(maxlen=12)
-df = pd.read_csv("monthly_rates.csv", header=0)
-last_12_cur = set()
-print(f"from,end_of_year,total_days,rolling_12_months_avg_rate")
-for _,r in df.iterrows():
-    cache_currency.append(r['from'])
-    cache_avg_and_days.append((r['average_rate'],r['number_of_days']))
-    if(len(cache_currency) == 12 and len(set(cache_currency)) == 1):
-        total_days = 0
-        x_rate_sum = 0
-        for x_rate, ndays in cache_avg_and_days:
-            x_rate_sum += x_rate * ndays
-            total_days += ndays
-        avg_rate = x_rate_sum/total_days
-        print(f"{r['from']},{r['end_of_month']},{total_days},{avg_rate}")
\ No newline at end of file
+if __name__ == "__main__":
+    print(f"{update_rolling_avg_rate()} rows appended to {ROLLING_AVG_RATE_PATH}.")
@@ -10,4 +10,6 @@ class MetadataError(AttributeError):
 class RulesError(ValueError):
     pass
 class ExtractionError(ValueError):
+    pass
+class ExtractionTimeout(ExtractionError):
     pass
\ No newline at end of file
@@ -0,0 +1,195 @@
+"""This module contains the classes ExchangeRates and MonthlyRates, which hold the rates used to convert the values of the reports to EUR. Rates are kept in NumPy arrays per currency, sorted by date, so that the rate applicable to any date - and to whole columns of dates - is found by binary search."""
+import io
+
+import numpy as np
+import pandas as pd
+
+from .exceptions import StandardizationError
+
+__all__ = ["ExchangeRates", "MonthlyRates"]
+
+DATE_FORMAT = "%Y.%m.%d"
+# a month end at most this far back is the "nearest preceding month end" of any date covered by the rates.
+MAX_DAYS_TO_MONTH_END = np.timedelta64(31, "D")
+
+
+class ExchangeRates:
+    """Rates to EUR by currency and date (usually month ends). The rate of a date is the one of the nearest preceding (or same) date with a rate - "as of" the date."""
+
+    def __init__(self, rates: pd.DataFrame) -> None:
+        """`rates` has one row per (currency, date): columns `from` (currency), `end_of_year` (date as YYYY.MM.DD) and `rolling_12_months_avg_rate` (rate to EUR), as in `configuration/rolling_avg_rate.csv`."""
+        rates = rates.assign(
+            date=pd.to_datetime(rates["end_of_year"], format=DATE_FORMAT).values.astype("datetime64[D]")
+        ).sort_values(["from", "date"])
+        # currency -> (dates, rates)
+        self._rates = {
+            currency: (
+                group["date"].to_numpy(dtype="datetime64[D]"),
+                group["rolling_12_months_avg_rate"].to_numpy(dtype=float),
+            )
+            for currency, group in rates.groupby("from")
+        }
+
+    @classmethod
+    def from_csv(cls, csv_text: str) -> "ExchangeRates":
+        return cls(
+            pd.read_csv(
+                io.StringIO(csv_text), dtype={"end_of_year": str}, float_precision="round_trip"
+            )
+        )
+
+    @property
+    def currencies(self) -> list[str]:
+        return list(self._rates)
+
+    def rate(self, currency: str, date: str) -> float:
+        """Rate to EUR of the currency as of the date (YYYY.MM.DD)."""
+        return float(self.rates([currency], [date])[0])
+
+    def rates(self, currencies, dates) -> np.ndarray:
+        """Vectorized `rate`: rates to EUR for each (currency, date) pair of the two sequences."""
+        currencies = np.asarray(currencies, dtype=object)
+        dates = pd.to_datetime(pd.Series(dates, dtype=object), format=DATE_FORMAT).to_numpy(
+            dtype="datetime64[D]"
+        )
+        out = np.empty(len(currencies), dtype=float)
+        for currency in pd.unique(currencies):
+            mask = currencies == currency
+            try:
+                known_dates, known_rates = self._rates[currency]
+            except KeyError as exc:
+                raise StandardizationError(f"No exchange rates for {currency}.") from exc
+            positions = np.searchsorted(known_dates, dates[mask], side="right") - 1
+            missing = (positions < 0) | (
+                dates[mask] - known_dates[np.maximum(positions, 0)] > MAX_DAYS_TO_MONTH_END
+            )
+            if missing.any():
+                raise StandardizationError(
+                    f"No exchange rate for {currency} as of {np.datetime_as_string(dates[mask][missing][0])} (rates from {known_dates[0]} to {known_dates[-1]})."
+                )
+            out[mask] = known_rates[positions]
+        return out
+
+    def convert(self, values, currencies, dates) -> np.ndarray:
+        """Converts values to EUR, each with its own currency and date."""
+        return np.asarray(values, dtype=float) * self.rates(currencies, dates)
+
+
+def _month_ordinals(dates: np.ndarray) -> np.ndarray:
+    return dates.astype("datetime64[M]").astype(np.int64)
+
+
+class MonthlyRates:
+    """Monthly average rates to EUR, as in `configuration/monthly_rates.csv`. For each currency, cumulative sums of the day-weighted rates and of the days are kept, so that the (day-weighted) average rate of any run of consecutive months - 12 months, but also 6, 15 or 18 months for first or transition fiscal years - takes O(1)."""
+
+    def __init__(self, monthly: pd.DataFrame) -> None:
+        """`monthly` has the columns `from` (currency), `end_of_month` (YYYY.MM.DD), `average_rate` and `number_of_days`."""
+        # currency -> (month ends, cumulative sum of rate * days, cumulative sum of days); cumulative sums start with 0.
+        self._sums = {}
+        self.append(monthly)
+
+    @classmethod
+    def from_csv(cls, csv_text: str) -> "MonthlyRates":
+        return cls(
+            pd.read_csv(
+                io.StringIO(csv_text), dtype={"end_of_month": str}, float_precision="round_trip"
+            )
+        )
+
+    def append(self, monthly: pd.DataFrame) -> None:
+        """Adds months (same columns as for the constructor). Months after the last known one of the currency extend its cumulative sums; otherwise, the sums of the currency are rebuilt."""
+        monthly = monthly.assign(
+            date=pd.to_datetime(monthly["end_of_month"], format=DATE_FORMAT).values.astype("datetime64[D]")
+        ).sort_values(["from", "date"])
+        for currency, group in monthly.groupby("from"):
+            dates = group["date"].to_numpy(dtype="datetime64[D]")
+            days = group["number_of_days"].to_numpy(dtype=float)
+            weighted = group["average_rate"].to_numpy(dtype=float) * days
+            try:
+                known_dates, known_weighted, known_days = self._sums[currency]
+            except KeyError:
+                known_dates, known_weighted, known_days = (
+                    np.array([], dtype="datetime64[D]"), np.zeros(1), np.zeros(1)
+                )
+            if len(known_dates) and dates[0] <= known_dates[-1]:
+                # not a plain extension: rebuild from the monthly values (later rows win).
+                known_weighted_months = np.diff(known_weighted)
+                known_days_months = np.diff(known_days)
+                merged = pd.DataFrame(
+                    {
+                        "date": np.concatenate([known_dates, dates]),
+                        "weighted": np.concatenate([known_weighted_months, weighted]),
+                        "days": np.concatenate([known_days_months, days]),
+                    }
+                ).drop_duplicates("date", keep="last").sort_values("date")
+                known_dates, known_weighted, known_days = (
+                    np.array([], dtype="datetime64[D]"), np.zeros(1), np.zeros(1)
+                )
+                dates = merged["date"].to_numpy(dtype="datetime64[D]")
+                weighted = merged["weighted"].to_numpy(dtype=float)
+                days = merged["days"].to_numpy(dtype=float)
+            self._sums[currency] = (
+                np.concatenate([known_dates, dates]),
+                np.concatenate([known_weighted, known_weighted[-1] + np.cumsum(weighted)]),
+                np.concatenate([known_days, known_days[-1] + np.cumsum(days)]),
+            )
+
+    def averages(self, currencies, ends_of_period, months=12) -> tuple[np.ndarray, np.ndarray]:
+        """Average rates to EUR over the `months` months ending at each end of period (the nearest preceding month end, as in ExchangeRates), with the number of days they cover. `months` may be a number or a sequence with one number per period."""
+        currencies = np.asarray(currencies, dtype=object)
+        ends = pd.to_datetime(pd.Series(ends_of_period, dtype=object), format=DATE_FORMAT).to_numpy(
+            dtype="datetime64[D]"
+        )
+        months = np.broadcast_to(np.asarray(months, dtype=np.int64), currencies.shape)
+        rates = np.empty(len(currencies), dtype=float)
+        total_days = np.empty(len(currencies), dtype=float)
+        for currency in pd.unique(currencies):
+            mask = currencies == currency
+            try:
+                dates, weighted, days = self._sums[currency]
+            except KeyError as exc:
+                raise StandardizationError(f"No monthly exchange rates for {currency}.") from exc
+            last = np.searchsorted(dates, ends[mask], side="right") - 1
+            first = last - months[mask] + 1
+            missing = (
+                (first < 0)
+                | (ends[mask] - dates[np.maximum(last, 0)] > MAX_DAYS_TO_MONTH_END)
+                # gaps in the monthly rates
+                | (
+                    _month_ordinals(dates[np.maximum(last, 0)])
+                    - _month_ordinals(dates[np.clip(first, 0, len(dates) - 1)])
+                    != months[mask] - 1
+                )
+            )
+            if missing.any():
+                raise StandardizationError(
+                    f"No monthly exchange rates for {currency} over the {months[mask][missing][0]} months to {np.datetime_as_string(ends[mask][missing][0])}."
+                )
+            total_days[mask] = days[last + 1] - days[first]
+            rates[mask] = (weighted[last + 1] - weighted[first]) / total_days[mask]
+        return rates, total_days
+
+    def average(self, currency: str, end_of_period: str, months=12) -> float:
+        rates, _ = self.averages([currency], [end_of_period], months)
+        return float(rates[0])
+
+    def rolling_averages(self, months=12) -> pd.DataFrame:
+        """Average rates over every run of `months` consecutive months, in the format of `configuration/rolling_avg_rate.csv`."""
+        out = []
+        for currency, (dates, weighted, days) in self._sums.items():
+            if len(dates) < months:
+                continue
+            ends = dates[months - 1 :]
+            consecutive = _month_ordinals(ends) - _month_ordinals(dates[: len(dates) - months + 1]) == months - 1
+            total_days = days[months:] - days[:-months]
+            out.append(
+                pd.DataFrame(
+                    {
+                        "from": currency,
+                        "end_of_year": pd.to_datetime(ends).strftime(DATE_FORMAT),
+                        "total_days": total_days.astype(np.int64),
+                        "rolling_12_months_avg_rate": (weighted[months:] - weighted[:-months]) / total_days,
+                    }
+                )[consecutive]
+            )
+        return pd.concat(out, ignore_index=True)
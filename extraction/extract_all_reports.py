@@ -1,4 +1,6 @@
+import contextlib
 import csv
+import multiprocessing
 import os
 import shutil
 from concurrent import futures
@@ -8,13 +10,56 @@ import pandas as pd
 
 from .cbc_report import CbCReport
 from .exceptions import ExtractionError, IncompatibleTables, NoCbCReportFound, StandardizationError
+from .extracttable_client import DEFAULT_ET_REQUESTS, ExtractTableClient
 from .log import logger
-from .pdf_to_dataframe import get_DataFrames
+from .pdf_to_dataframe import PendingExtraction, camelot_executor, get_DataFrames, submit_extraction
+from .resources import plan_pools
+from .review_queue import ReviewQueue, report_key
 from .rules import Rules
+from .schema import as_raw_strings
 from .standardize_dataframe import standardize_dataframe, unify_CbCR_tables
+from .utils import COUNTRY_MEMO, load_country_memo, save_country_memo
 
 __all__ = ["extract_all_reports"]
 
+# read-only snapshot of the rules, in the worker processes standardizing reports in parallel
+_worker_rules = None
+# queries of COUNTRY_MEMO already known to the process running the extraction, in those worker processes
+_worker_known_queries = set()
+
+
+def _write_standardized(df: pd.DataFrame, path) -> None:
+    df.to_csv(path, index=False, quoting=csv.QUOTE_NONNUMERIC)
+
+
+def _init_standardization_worker(rules: Rules, country_memo_path) -> None:
+    global _worker_rules
+    _worker_rules = rules
+    load_country_memo(country_memo_path)
+    _worker_known_queries.update(COUNTRY_MEMO)
+
+
+def _new_country_memo_entries() -> dict:
+    """Fuzzy country searches made in this worker process since the last call, to be sent back to the process running the extraction (which saves the memo)."""
+    new_entries = {query: COUNTRY_MEMO[query] for query in COUNTRY_MEMO.keys() - _worker_known_queries}
+    _worker_known_queries.update(new_entries)
+    return new_entries
+
+
+def _standardize_report(
+    report: CbCReport, dfs: list[pd.DataFrame], path, queue_names: bool
+) -> tuple[bool, ReviewQueue | None, dict]:
+    """Unifies and standardizes (headless) the tables of the report in a worker process and writes the result to `path`. Returns whether it succeeded, if `queue_names` the names that no rule applies to, to be merged into the review queue of the run, and the new entries of COUNTRY_MEMO, to be merged into the memo of the run."""
+    review_queue = ReviewQueue() if queue_names else None
+    try:
+        unified_df, profile = unify_CbCR_tables(dfs, report, return_profile=True)
+        standardize_dataframe(True, unified_df, report, _worker_rules, profile, review_queue)
+    except (IncompatibleTables, NoCbCReportFound, StandardizationError) as exception:
+        logger.error("Fatal error on %s :\n%s\n\n", report, exception, exc_info=True)
+        return False, review_queue, _new_country_memo_entries()
+    _write_standardized(unified_df, path)
+    return True, review_queue, _new_country_memo_entries()
+
 
 def extract_all_reports(
     reports: list[CbCReport],
@@ -28,11 +73,69 @@ def extract_all_reports(
     operator_wont_intervene=False,
     quiet=False,
     key=None,
+    review_queue: ReviewQueue | None = None,
+    prefetch=2,
+    standardization_workers=None,
+    et_client: ExtractTableClient | None = None,
+    camelot_workers=None,
+    et_requests=None,
+    camelot_timeout=None,
+    camelot_memory_limit=None,
+    camelot_max_tasks_per_child=None,
+    camelot_rss_limit=None,
 ):
     """Attempts to create a unique and standardized CSV file for each reports from the metadata file, using the rules file, the pdf repository and the CSV files that have been manually edited. Extracted files will be named '<mnc_id>_<end_of_year>.csv' and be on the specified directory <write_tables_to_dir>. May update the rules during execution (Rules object gets updated in-place).
 
     Temporary files will be inside the respective '<intermediate_files_dir>/<mnc_id>_<end_of_year>/' folder.
-    ExtractTable.com's extractions will be named '<mnc_id>_<end_of_year>_<table_number>.csv'. Camelot-py's extractions have the same naming convention but  will be in '<intermediate_files_dir>/<mnc_id>_<end_of_year>/camelot/'."""
+    ExtractTable.com's extractions will be named '<mnc_id>_<end_of_year>_<table_number>.csv'. Camelot-py's extractions have the same naming convention but  will be in '<intermediate_files_dir>/<mnc_id>_<end_of_year>/camelot/'.
+
+    With a `review_queue`, the run is headless: names that no rule applies to are queued instead of prompting the operator, and the reports with names resolved since they were queued are standardized again (their CSV files are rewritten). The queue is updated in-place.
+
+    Reports are standardized one after the other, in the order of `reports`, but the PDF-to-table jobs of the next `prefetch` reports are submitted ahead of time: they run in the process pool while the current report is being standardized (and the operator prompted).
+    camelot-py jobs run in a pool of `camelot_workers` processes (see CamelotPool), each process with a virtual address space of at most `camelot_memory_limit` bytes and replaced after `camelot_max_tasks_per_child` jobs. Jobs are interrupted after `camelot_timeout` seconds, or killed with their worker if stuck or if the worker's resident memory exceeds `camelot_rss_limit` bytes: the report then fails to extract, and the next ones are extracted. ExtractTable.com jobs are sent by `et_client` (by default, a client for `key` with `et_requests` requests in flight, DEFAULT_ET_REQUESTS if None, see ExtractTableClient): they wait on the network in its threads, not in the process pool.
+    Headless runs (`operator_wont_intervene` or with a `review_queue`) standardize the reports in parallel, in a pool of `standardization_workers` processes.
+    Process pools not sized explicitly (None) are sized from the cores and the memory available, see `plan_pools`. Each worker gets a read-only snapshot of the rules (see `Rules.snapshot`) and sends the names to review and its fuzzy country matches (see COUNTRY_MEMO) back to this process: rules usage stats only cover the rules applied in this process. A report whose standardization job fails (e.g. its worker died) is counted as not extracted, and the next ones are standardized."""
+
+    def output_path(report) -> str:
+        return os.path.join(write_tables_to_dir, f"{report.group_name}_{report.end_of_year}.csv")
+
+    def output_is_up_to_date(report) -> bool:
+        return exists(output_path(report)) and (report_key(report) not in to_restandardize)
+
+    def needs_pdf_extraction(report) -> bool:
+        """Whether the tables of the report are to be extracted from its PDF file (see extract_one)."""
+        return (
+            not output_is_up_to_date(report)
+            and not exists(
+                os.path.join(intervened_dir, f"{report.group_name}_{report.end_of_year}.csv")
+            )
+            and exists(os.path.join(input_pdf_directory, report.filename_of_source))
+        )
+
+    def read_tables(report, pending: PendingExtraction | None) -> list[pd.DataFrame]:
+        """Gets a CSV version of the tables of the report. Raises ExtractionError or FileNotFoundError."""
+        logger.info("\nExtracting %s\n", report, exc_info=True)
+        # 2a. check if there is a extraction (from pdf to csv) that underwent manual editing.
+        manual_path = os.path.join(
+            intervened_dir, f"{report.group_name}_{report.end_of_year}.csv"
+        )
+        if exists(manual_path):
+            return [as_raw_strings(pd.read_csv(manual_path, header=None))]
+        # 2b. otherwise, get the result from the 3rd party software that transforms the pdf tables into CSV (ExtractTable.com).
+        # each file is ran by the 3rd party software only once. the results are cached in root/extraction/ExtractTable.com/
+        if exists(os.path.join(input_pdf_directory, report.filename_of_source)):
+            return pending.collect() if pending is not None else get_DataFrames(
+                key,
+                report,
+                input_pdf_directory,
+                executor=executor,
+                intermediate_files_dir=intermediate_files_dir,
+                et_client=et_client,
+                camelot_timeout=camelot_timeout,
+            )
+        raise FileNotFoundError(
+            f"Source file not found at {os.path.join(input_pdf_directory, report.filename_of_source)}."
+        )
 
     def extract_one(
         key,
@@ -44,51 +147,36 @@ def extract_all_reports(
         intermediate_files_dir,
         write_tables_to_dir,
         operator_wont_intervene,
+        pending: PendingExtraction | None = None,
     ) -> tuple[bool, bool, pd.DataFrame]:
-        """Extracts the tables from the pdf file of the report, standardizes the column names and jurisdiction codes, and returns a pandas.DataFrame conformant to the tidy data format. It also returns two flags: one indicating whether the operator will (not) continue to intervene, another stating whether the extraction was successful."""
-        if exists(
-            os.path.join(
-                write_tables_to_dir, f"{report.group_name}_{report.end_of_year}.csv"
-            )
-        ):
+        """Extracts the tables from the pdf file of the report, standardizes the column names and jurisdiction codes, and returns a pandas.DataFrame conformant to the tidy data format. It also returns two flags: one indicating whether the operator will (not) continue to intervene, another stating whether the extraction was successful.
+        `pending` are the extraction jobs of the report, if already submitted."""
+        if output_is_up_to_date(report):
             return operator_wont_intervene, True, None
         try:
             # 2. get a CSV version of the Tables
-            logger.info("\nExtracting %s\n", report, exc_info=True)
-            # 2a. check if there is a extraction (from pdf to csv) that underwent manual editing.
-            manual_path = os.path.join(
-                intervened_dir, f"{report.group_name}_{report.end_of_year}.csv"
-            )
-            if exists(manual_path):
-                dfs = [pd.read_csv(manual_path, header=None).astype(str)]
-            # 2b. otherwise, get the result from the 3rd party software that transforms the pdf tables into CSV (ExtractTable.com).
-            # each file is ran by the 3rd party software only once. the results are cached in root/extraction/ExtractTable.com/
-            elif exists(os.path.join(input_pdf_directory, report.filename_of_source)):
-                try:
-                    dfs = get_DataFrames(
-                    key,
-                    report,
-                    input_pdf_directory,
-                    executor=executor,
-                    intermediate_files_dir=intermediate_files_dir,
-                )
-                except ExtractionError as e:
-                    logger.error(
-                        "Extraction error on %s :\n%s\n\n", report, e, exc_info=True
-                    )
-                    return operator_wont_intervene, False, None
-            else:
-                raise FileNotFoundError(
-                    f"Source file not found at {os.path.join(input_pdf_directory, report.filename_of_source)}."
+            try:
+                dfs = read_tables(report, pending)
+            except ExtractionError as e:
+                logger.error(
+                    "Extraction error on %s :\n%s\n\n", report, e, exc_info=True
                 )
+                return operator_wont_intervene, False, None
             # 3. as reports may span across multiple tables, create a dataframe with all the data
-            unified_df = unify_CbCR_tables(dfs, report)
+            unified_df, profile = unify_CbCR_tables(dfs, report, return_profile=True)
             # 4. use the rules from `rules.json` (or another specified file!) to make column names and jurisdiction codes standard.
             # For jurisdiction/column names that cannot be resolved with the current rules, get input from the operator is human_bored == False.
             # As the operator can become bored during a report, update the value of human_bored for the remaining documents (only goes from not bored to bored.)
+            # Rules may have been added meanwhile by concurrent extraction processes sharing a rules store.
+            rules.refresh()
+            # names still unresolved are queued again, and replace what was queued from this report once it is standardized
+            queued = ReviewQueue() if review_queue is not None else None
             operator_wont_intervene = standardize_dataframe(
-                operator_wont_intervene, unified_df, report, rules
+                operator_wont_intervene, unified_df, report, rules, profile, queued
             )
+            if review_queue is not None:
+                review_queue.forget(report)
+                review_queue.merge(queued)
             return operator_wont_intervene, True, unified_df
         except (
             IncompatibleTables,
@@ -101,14 +189,82 @@ def extract_all_reports(
             )
             return operator_wont_intervene, False, None
 
+    def record(report, success) -> None:
+        """Success: either because the reports has just been extracted, or because it was already extracted."""
+        if success:
+            msg = f"{report} successfully extracted.\n"
+            not_extracted.remove(report)
+        else:
+            msg = f"{report} failed to extract.\n"
+        if not quiet:
+            print(msg)
+
     for directory in [intermediate_files_dir, write_tables_to_dir]:
         os.makedirs(directory, exist_ok=True)
     if force_rewrite:
         shutil.rmtree(write_tables_to_dir)
         os.makedirs(write_tables_to_dir)
     not_extracted = set(reports)
-    with futures.ProcessPoolExecutor(max_workers=4) as executor:
-        for report in [r for r in reports if r.to_extract][:default_max_reports]:
+    to_restandardize = review_queue.reports_to_restandardize() if review_queue is not None else set()
+    # fuzzy matches of country names are remembered across runs.
+    country_memo_path = os.path.join(intermediate_files_dir, "country_fuzzy_matches.json")
+    load_country_memo(country_memo_path)
+    to_extract = [r for r in reports if r.to_extract][:default_max_reports]
+    headless = operator_wont_intervene or review_queue is not None
+    pools = plan_pools(camelot_workers, standardization_workers, parallel_standardization=headless)
+    in_parallel = headless and pools.standardization > 1
+    with camelot_executor(
+        pools.camelot, camelot_memory_limit, camelot_max_tasks_per_child, camelot_timeout, camelot_rss_limit
+    ) as executor, (
+        ExtractTableClient(key, max_workers=et_requests or DEFAULT_ET_REQUESTS)
+        if et_client is None and key
+        else contextlib.nullcontext(et_client)
+    ) as et_client, (
+        # spawned, not forked: the threads of the ExtractTable.com client and of the camelot-py pool may hold locks a forked worker would inherit
+        futures.ProcessPoolExecutor(
+            max_workers=pools.standardization,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_standardization_worker,
+            initargs=(rules.snapshot(), country_memo_path),
+        )
+        if in_parallel
+        else contextlib.nullcontext()
+    ) as standardization_pool:
+        # report -> PendingExtraction, for the current report and the next `prefetch` ones
+        pending = {}
+        # report -> standardization job, in parallel
+        standardizing = {}
+        for position, report in enumerate(to_extract):
+            for ahead in to_extract[position : position + prefetch + 1]:
+                # a PDF shared with a pending report is submitted once the latter is collected, and its results cached
+                if (
+                    ahead not in pending
+                    and all(p.report.filename_of_source != ahead.filename_of_source for p in pending.values())
+                    and needs_pdf_extraction(ahead)
+                ):
+                    pending[ahead] = submit_extraction(
+                        key,
+                        ahead,
+                        input_pdf_directory,
+                        executor,
+                        intermediate_files_dir,
+                        et_client,
+                        camelot_timeout,
+                    )
+            if in_parallel:
+                if output_is_up_to_date(report):
+                    record(report, True)
+                    continue
+                try:
+                    dfs = read_tables(report, pending.pop(report, None))
+                except (ExtractionError, FileNotFoundError) as exception:
+                    logger.error("Fatal error on %s :\n%s\n\n", report, exception, exc_info=True)
+                    record(report, False)
+                    continue
+                standardizing[report] = standardization_pool.submit(
+                    _standardize_report, report, dfs, output_path(report), review_queue is not None
+                )
+                continue
             operator_wont_intervene, success, df = extract_one(
                 key,
                 executor,
@@ -119,25 +275,25 @@ def extract_all_reports(
                 intermediate_files_dir,
                 write_tables_to_dir,
                 operator_wont_intervene,
+                pending.pop(report, None),
             )
-            if (
-                success
-            ):  # either because the reports has just been extracted, or because it was already extracted.
-                # 5. export the final, standardized dataframe to CSV.
-                if df is not None:
-                    df.to_csv(
-                        os.path.join(
-                            write_tables_to_dir,
-                            f"{report.group_name}_{report.end_of_year}.csv",
-                        ),
-                        index=False,
-                        quoting=csv.QUOTE_NONNUMERIC,
-                    )
-                msg = f"{report} successfully extracted.\n"
-                not_extracted.remove(report)
-            else:
-                msg = f"{report} failed to extract.\n"
-            if not quiet:
-                print(msg)
-
+            # 5. export the final, standardized dataframe to CSV.
+            if success and df is not None:
+                _write_standardized(df, output_path(report))
+            record(report, success)
+        # in the order of the reports, so that the review queue does not depend on which worker finished first
+        for report, job in standardizing.items():
+            try:
+                success, queued, country_memo_entries = job.result()
+            except Exception as exception:  # e.g. a bug, or a worker killed for lack of memory
+                logger.error("Fatal error on %s :\n%s\n\n", report, exception, exc_info=True)
+                record(report, False)
+                continue
+            for query, results in country_memo_entries.items():
+                COUNTRY_MEMO.setdefault(query, results)
+            if success and review_queue is not None:  # what was queued from this report is replaced
+                review_queue.forget(report)
+                review_queue.merge(queued)
+            record(report, success)
+    save_country_memo(country_memo_path)
     return not_extracted
@@ -0,0 +1,215 @@
+"""This module contains ExtractTableClient, which sends the pages of the reports to ExtractTable.com from a pool of threads. Waiting on the network needs neither a process of its own nor a slot of the process pool running camelot-py: dozens of reports can be in flight while camelot keeps the cores busy.
+Requests are bounded in number (`max_workers`), paced by the credits they cost (one per page, see RateLimiter), retried with exponential backoff on 429 and 5xx responses and time out. The number of credits a run may spend can be capped.
+The endpoints can be pointed to the local stand-in of tests/stand_ins.py, to test and benchmark offline.
+The ExtractTable library's own `process_file` is not used, only its helpers (file size check, conversion of the results): it always sends its requests to the https hosts of ExtractTable.com (it cannot be pointed to a stand-in), without timeouts nor retries, and counts no credits. ExtractTable.com has no parameter for the pages to extract: like the library, the client sends a PDF of these pages only (see write_pages)."""
+import os
+import tempfile
+import threading
+import time
+from concurrent import futures
+
+import requests
+from PyPDF2 import PdfReader, PdfWriter
+from ExtractTable import ExtractTable
+from ExtractTable.common import ConvertTo
+from ExtractTable.config import HOST, JobStatus
+from ExtractTable.FileOperations import CheckFile
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from .exceptions import ExtractionError
+from .log import logger
+
+__all__ = ["ExtractTableClient", "RateLimiter", "DEFAULT_ET_REQUESTS"]
+
+ET_TRIGGER_URL = f"https://{HOST.TRIGGER}"
+ET_RESULT_URL = f"https://{HOST.RESULT}"
+ET_BIGFILE_URL = f"https://{HOST.BIGFILE}"
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+# requests in flight at once: a limit of ExtractTable.com rather than of this machine, as they wait on the network
+DEFAULT_ET_REQUESTS = 8
+
+
+def write_pages(file_path, pages: list[int], out_path) -> None:
+    """Writes the pages (numbered from 1) of the PDF file to a new PDF file: only they are sent, and charged."""
+    reader = PdfReader(file_path)
+    writer = PdfWriter()
+    for page in pages:
+        try:
+            writer.add_page(reader.pages[page - 1])
+        except IndexError:
+            raise ExtractionError(f"{file_path} has only {len(reader.pages)} pages, page {page} asked for.")
+    with open(out_path, "wb") as f:
+        writer.write(f)
+
+
+class RateLimiter:
+    """Paces calls to `acquire` across threads so that no more than `rate` units (e.g. credits) are spent per second on average. A call costing n units waits until the previous ones are paid for, then books the next n / rate seconds. No rate: no waiting."""
+
+    def __init__(self, rate: float | None = None) -> None:
+        self.rate = rate
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self, cost: float = 1) -> None:
+        if not self.rate:
+            return
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next)
+            self._next = start + cost / self.rate
+        time.sleep(start - now)
+
+
+class ExtractTableClient:
+    """Client of the ExtractTable.com API, extracting the tables of PDF pages in a pool of `max_workers` threads (see `submit`). Triggers are paced to `credits_per_second` and refused if they could take the credits spent over `max_credits`; only successful jobs count as spent (see `credits_spent`). Each request times out after `timeout` seconds and failed ones are retried `retries` times, after backoff_factor * 2 ** (attempt - 1) seconds; a job still processing after `max_wait` seconds fails.
+    Triggers are sent with `dup_check`, so that a retried trigger is not processed (and charged) twice."""
+
+    def __init__(
+        self,
+        api_key: str,
+        max_workers=DEFAULT_ET_REQUESTS,
+        credits_per_second: float | None = None,
+        max_credits: int | None = None,
+        retries=5,
+        backoff_factor=0.5,
+        timeout=60,
+        max_wait=300,
+        poll_interval=10,
+        trigger_url=ET_TRIGGER_URL,
+        result_url=ET_RESULT_URL,
+        bigfile_url=ET_BIGFILE_URL,
+    ) -> None:
+        self.api_key = api_key
+        self.max_credits = max_credits
+        # credits of the successful jobs; those of the jobs in flight are reserved
+        self.credits_spent = 0
+        self._credits_reserved = 0
+        self.timeout = timeout
+        self.max_wait = max_wait
+        self.poll_interval = poll_interval
+        self.trigger_url = trigger_url
+        self.result_url = result_url
+        self.bigfile_url = bigfile_url
+        self.rate_limiter = RateLimiter(credits_per_second)
+        self.session = requests.Session()
+        self.session.headers["x-api-key"] = api_key
+        adapter = HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=max_workers,
+            max_retries=Retry(
+                total=retries,
+                backoff_factor=backoff_factor,
+                status_forcelist=RETRY_STATUSES,
+                allowed_methods=None,  # triggers are POSTed, and safe to retry thanks to dup_check
+                raise_on_status=False,
+            ),
+        )
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.executor = futures.ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="ExtractTable"
+        )
+        self._lock = threading.Lock()
+
+    def __enter__(self) -> "ExtractTableClient":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Waits for the jobs in flight, then closes the connections."""
+        self.executor.shutdown(wait=True)
+        self.session.close()
+
+    def submit(self, file_path, pages: list[int]) -> futures.Future:
+        """Extracts the tables of the pages of the PDF file in a thread. The future's result is the list of tables, each as a dict (as ExtractTable.process_file(output_format="dict") returns them)."""
+        return self.executor.submit(self.process_file, file_path, pages)
+
+    def _reserve(self, nb_credits: int) -> None:
+        """Books the credits of a request, so that requests in flight cannot spend more than `max_credits` together. Raises ExtractionError."""
+        with self._lock:
+            if self.max_credits is not None and self.credits_spent + self._credits_reserved + nb_credits > self.max_credits:
+                raise ExtractionError(
+                    f"ExtractTable.com credits exhausted: {self.credits_spent} of {self.max_credits} spent ({self._credits_reserved} in flight), {nb_credits} more needed."
+                )
+            self._credits_reserved += nb_credits
+
+    def _settle(self, nb_credits: int, spent: bool) -> None:
+        """Releases the credits booked by `_reserve`, counting them as spent if the job succeeded (failed jobs are not charged)."""
+        with self._lock:
+            self._credits_reserved -= nb_credits
+            if spent:
+                self.credits_spent += nb_credits
+
+    def _request(self, method, url, session=None, **kwargs) -> dict:
+        try:
+            response = (session or self.session).request(method, url, timeout=self.timeout, **kwargs)
+        except requests.RequestException as exc:
+            raise ExtractionError(f"ExtractTable.com request failed: {exc}") from exc
+        try:
+            body = response.json()
+        except ValueError:
+            body = {}
+        if not response.ok:
+            raise ExtractionError(
+                f"ExtractTable.com answered {response.status_code}: {body.get('Message', body.get('message', response.reason))}"
+            )
+        return body
+
+    def _trigger(self, path) -> dict:
+        data = {"dup_check": True, "library": ExtractTable.VERSION}
+        if not CheckFile(path).is_big:
+            with open(path, "rb") as fp:
+                return self._request("post", self.trigger_url, data=data, files={"input": fp})
+        # big files are uploaded to a signed URL first
+        signed = self._request("post", self.bigfile_url, data={"filename": os.path.basename(path)})
+        with open(path, "rb") as fp:
+            try:
+                requests.post(
+                    signed["url"], data=signed["fields"], files={"file": fp}, timeout=self.timeout
+                ).raise_for_status()
+            except requests.RequestException as exc:
+                raise ExtractionError(f"ExtractTable.com upload failed: {exc}") from exc
+        return self._request(
+            "post", self.trigger_url, data={**data, "signed_filename": signed["fields"]["key"]}
+        )
+
+    def process_file(self, file_path, pages: list[int]) -> list[dict]:
+        """Extracts the tables of the pages of the PDF file, blocking until the job is done. Raises ExtractionError."""
+        self._reserve(len(pages))
+        try:
+            tables = self._process_file(file_path, pages)
+        except BaseException:
+            self._settle(len(pages), spent=False)
+            raise
+        self._settle(len(pages), spent=True)
+        return tables
+
+    def _process_file(self, file_path, pages: list[int]) -> list[dict]:
+        t0 = time.time()
+        self.rate_limiter.acquire(len(pages))
+        logger.info("ET.com - request started %s, %s\n%s", file_path, pages, t0)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            pages_path = os.path.join(tmp_dir, os.path.basename(file_path))
+            write_pages(file_path, pages, pages_path)
+            response = self._trigger(pages_path)
+        deadline = time.monotonic() + self.max_wait
+        while response.get("JobStatus") == JobStatus.PROCESSING:
+            if time.monotonic() > deadline:
+                raise ExtractionError(
+                    f"ExtractTable.com job {response.get('JobId')} still processing after {self.max_wait}s."
+                )
+            time.sleep(self.poll_interval)
+            response = self._request("get", self.result_url, params={"JobId": response["JobId"]})
+        if response.get("DownloadUrl"):  # large results are stored elsewhere, without the API key
+            response = self._request("get", response["DownloadUrl"], session=requests)
+        if response.get("JobStatus") != JobStatus.SUCCESS:
+            raise ExtractionError(
+                f"ExtractTable.com job {response.get('JobId')} {response.get('JobStatus')}: {response.get('Message', '')}"
+            )
+        logger.info(
+            "ET.com - request finished %s, %s\ntook %ss", file_path, pages, time.time() - t0
+        )
+        return ConvertTo(server_response=response, output_format="dict").output
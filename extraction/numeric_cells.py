@@ -0,0 +1,104 @@
+"""This module turns the cells of the extracted tables into numbers, a whole column at a time: the cells of a column are joined into a single string (one cleaned cell per line) and each cleaning step is a single regex pass over it, instead of six composed functions per cell.
+Cells are cleaned as follows: only digits, brackets, minus signs, dots, commas and percent signs are kept; a lone dash is an empty cell; commas are decimal points, but dots followed by three digits are thousands separators (up to the fourth group); and a value starting with a bracket is negative (`(1.234)` is `-1234`, anything after the last closing bracket is dropped).
+Steps that a column does not need (no commas, no dots, no brackets) are skipped.
+The post-processing of the parsed columns (percentages, rates, unit scaling) also works on whole columns."""
+import re
+
+import numpy as np
+import pandas as pd
+
+from .log import logger
+from .utils import ETR_FORMAT_RE, NOT_NUMERIC_CHARS_RE, PERCENTAGE_FORMAT_RE
+
+__all__ = [
+    "clean_numeric_strings",
+    "parse_numeric_column",
+    "percentages_to_numbers",
+    "percentages_to_rationals",
+    "scale_column",
+]
+
+# ASCII unit separator: not a numeric char, so that it can only separate cells once they are cleaned.
+SEP = "\x1f"
+# NOT_NUMERIC_CHARS_RE, keeping the separators.
+NOT_NUMERIC_OR_SEP_RE = re.compile(r"[^0-9\(\)\-\.%,\x1f]")
+# once cleaned, cells are separated by newlines: with re.M, ^ and $ are the start and end of a cell and `.` stays in the cell.
+LONE_DASH_RE = re.compile(r"^-$", re.M)
+THOUSANDS_RE = re.compile(r"^.*?[\., ]\d{3}(?:[\., ]\d{3})?(?:[\., ]\d{3})?(?:[\., ]\d{3})?", re.M)
+BRACKETS_RE = re.compile(r"^\((.*)\).*$", re.M)
+# the first number of each cell, empty if there is none
+FIRST_PERCENTAGE_RE = re.compile(r"^(?:.*?" + PERCENTAGE_FORMAT_RE.pattern + r")?.*$", re.M)
+FIRST_ETR_RE = re.compile(r"^(?:.*?" + ETR_FORMAT_RE.pattern + r")?.*$", re.M)
+
+
+def _drop_separators(match: re.Match) -> str:
+    return match.group(0).replace(".", "").replace(" ", "")
+
+
+def _join(values: pd.Series) -> str:
+    """The (string) cells without their non-numeric chars, one per line."""
+    # as Python strings first: iterating over a pyarrow-backed Series boxes its cells one by one
+    text = SEP.join(values.to_numpy(dtype=object))
+    if text.count(SEP) != max(len(values) - 1, 0):  # the separator is in some cells: drop it, as any non-numeric char
+        text = SEP.join(values.str.replace(SEP, "", regex=False).to_numpy(dtype=object))
+    return NOT_NUMERIC_OR_SEP_RE.sub("", text).replace(SEP, "\n")
+
+
+def _split(text: str, values: pd.Series) -> pd.Series:
+    cleaned = text.split("\n") if len(values) else []
+    return pd.Series(cleaned, index=values.index, dtype=object, name=values.name)
+
+
+def clean_numeric_strings(values: pd.Series) -> pd.Series:
+    """Cleans the strings of the Series so that they can be read as numbers (see module docstring). Cells that cannot be read as numbers are left as cleaned."""
+    text = _join(values)
+    if "-" in text:
+        text = LONE_DASH_RE.sub("", text)
+    if "," in text:
+        text = text.replace(",", ".")
+    if "." in text:
+        text = THOUSANDS_RE.sub(_drop_separators, text)
+    if "(" in text:
+        text = BRACKETS_RE.sub(r"-\1", text)
+    return _split(text, values)
+
+
+def parse_numeric_column(values: pd.Series) -> pd.Series:
+    """Numbers from the cleaned strings if all of them are numbers (or empty), otherwise the cleaned strings."""
+    return pd.to_numeric(clean_numeric_strings(values), errors="ignore")
+
+
+def _first_numbers(values: pd.Series, first_number_re: re.Pattern) -> pd.Series:
+    """The number captured by `first_number_re` in each cell of the Series (any value, as a string), once cleaned of its non-numeric chars and with commas as decimal points; NaN if there is none."""
+    numbers = first_number_re.findall(_join(values.astype(str)).replace(",", "."))
+    return (
+        pd.Series(numbers if len(values) else [], index=values.index, dtype=object, name=values.name)
+        .replace("", np.nan)
+        .astype(float)
+    )
+
+
+def percentages_to_numbers(values: pd.Series) -> pd.Series:
+    """Percentages (`12,5%`) as numbers (0.125); -1 for cells without a percentage."""
+    return (_first_numbers(values, FIRST_PERCENTAGE_RE) / 100).fillna(-1)
+
+
+def percentages_to_rationals(values: pd.Series) -> pd.Series:
+    """Rates, with or without the percent sign (`12,5%` or `12.5`), as numbers (0.125); NaN for cells without a number."""
+    return _first_numbers(values, FIRST_ETR_RE) / 100
+
+
+def scale_column(values: pd.Series, multiplier: int) -> pd.Series:
+    """Multiplies the numeric column. Integer columns stay integers (int64) unless that would overflow, in which case they become float64."""
+    if pd.api.types.is_integer_dtype(values.dtype) and multiplier and len(values):
+        bound = np.iinfo(np.int64).max // abs(multiplier)
+        if values.max() > bound or values.min() < -bound:
+            logger.warning(
+                "%s: values too large for int64 once multiplied by %s, converted to float64.",
+                values.name,
+                multiplier,
+            )
+            values = values.astype("float64")
+        else:
+            values = values.astype("int64")
+    return values * multiplier
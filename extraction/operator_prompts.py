@@ -0,0 +1,97 @@
+"""This module contains the prompts through which the operator assigns standard names (and writes rules for them) to the column and jurisdiction names that no rule applies to - whether report by report during the extraction or for a whole review queue at once (see `review_queue`)."""
+import re
+
+from .rules import Rules
+
+__all__ = ["prompt_common", "prompt_text_col", "prompt_text_jurisdiction"]
+
+
+def prompt_common(rules: Rules, source, default_options, prompt_text):
+    """Prompts the operator until a rule is confirmed for `source`. Returns (mode, rule_source, sink, justification): `rule_source` is `source`, or `_regex_<regex>` if the operator wrote a regex rule. The sink is "quit" if the operator stops. Regex rules are checked by `rules` before being accepted."""
+    while True:
+        answer = input(prompt_text)
+        rule_source = source
+        if answer.casefold() == "r":
+            regex = input(
+                "Write your source regex (as you would in python):\n"
+            )
+            problem = rules.regex_rule_problem(regex)
+            if problem:
+                print(f"Regex not accepted: {problem}.")
+                continue
+            rule_source = f"_regex_{regex}"
+            sink = input("Write your sink:\n")
+            mode = input("Write the mode for the rule ('!','#' or '.'):\n")
+            justification = (
+                input("Write your justification (optional):\n")
+                or "<no justification>"
+            )
+        elif answer.casefold() == "q":
+            return ("", source, "quit", "")
+        else:
+            try:
+                match = re.match(r"(.*?)([!#\.])(.*)", answer)
+                mode = match.group(2) if match.group(2) else ""
+                choice = match.group(1)
+                justification = (
+                    match.group(3) if match.group(3) else "<no justification>"
+                )
+            except AttributeError:
+                continue
+            sink = default_options[int(choice)] if choice.isdigit() else choice
+        confirm = input(
+            f'Assign "{rule_source}" to "{sink}" in mode {mode}? Justification: "{justification}".\n(y/n)'
+        )
+        if (confirm in ["y", "Y"]) and (mode in ["#", ".", "!"]):
+            return (mode, rule_source, sink, justification)
+
+
+def prompt_text_col(odd_name, filename, col_dict: dict, context=""):
+    substring = "\n".join([f"{n} -> {name}" for n, name in col_dict.items()])
+    return f"""
+    Unknown column name found. Select a standard column name.
+    Instructions:
+    "q" to stop updating rules for the whole iteration.
+    "0" to delete this column.
+    "1" to leave as is.
+    "r" to create regex rule.
+    To assign new standard column:
+    Write the column name in snake_case (recommended) or choose a number from the list.
+    Then, append one of the following:
+        "!" to your option to make it a rule for every CbCR report. eg. 1!
+        "#" to make it a rule at the MNC level. eg: 2#
+        "." to make it a one-time rule. eg: 3.
+    Optionally, write a justification for the rule after the !/#/.  
+    Finalize by pressing ENTER.
+
+    Unknown column name: {odd_name}
+    File: {filename}{context}
+    Default options:
+    {substring}
+    """
+
+
+def prompt_text_jurisdiction(new_name, filename, jurisdiction_dict: dict, context=""):
+    substring = "\n\n".join(
+        [f"{n} -> {name}" for n, name in jurisdiction_dict.items()]
+    )
+    return f"""Select a standard jurisdiction name or press enter to leave it as is.
+    Instructions:
+
+    Write "r" to create a regex rule.
+    Choose "0" to keep jurisdiction name as is.
+    Choose "1" to delete this row.
+    Choose "2" for "other" - the chosen default for this DB.
+    To assign new jurisdiction name, write its ISO 3166-1 alpha-3 code (recommended).
+    Append "!" to your option to make it a rule for every CbCR report. eg. 1!
+    Append "#" to make it a rule at the MNC level. eg: 2#
+    Append "." to make it a one-time rule. eg: 3.
+    Optionally, write a justification for the rule after the !/#/.  
+    Write Q to stop updating rules for the whole iteration.
+    Then, press ENTER.
+
+    Unidentified jurisdiction name: {new_name}
+    File: {filename}{context}
+    Options:
+    {substring}
+    """
@@ -1,7 +1,14 @@
 """This module contains the functions to extract tables from PDFs and convert them to dataframes. If input is in Excel of equivalent, module is bypassed."""
 import abc
+import atexit
+import itertools
 import json
+import multiprocessing
 import os
+import queue
+import signal
+import sys
+import threading
 import time
 from concurrent import futures
 from os.path import exists
@@ -9,31 +16,305 @@ from os.path import exists
 import camelot.io as camelot
 import dill as pickle
 import pandas as pd
-from ExtractTable import ExtractTable
 
 from .cbc_report import CbCReport
 from .log import logger
-from .exceptions import ExtractionError
+from .exceptions import ExtractionError, ExtractionTimeout
+from .extracttable_client import ExtractTableClient
+from .schema import as_raw_strings
 
 
-def get_remote_ET_result(et_sess: ExtractTable, file_path, pages):
-    t0 = time.time()
-    logger.info("ET.com - worker started %s, %s\n%s", file_path, pages, time.time())
-    server_res = et_sess.process_file(
-        filepath=file_path,
-        output_format="dict",
-        pages=",".join(map(str, pages)),
-    )
-    logger.info(
-        "ET.com - worker finished %s, %s\ntook %ss", file_path, pages, time.time() - t0
-    )
-    return server_res
+# key -> ExtractTableClient, see default_et_client
+_default_et_clients = {}
+_default_et_clients_lock = threading.Lock()
+
+
+def default_et_client(key: str) -> ExtractTableClient:
+    """The client of the extractions submitted without one: a single one per key, shared by all of them, and closed at exit (see close_default_et_clients)."""
+    with _default_et_clients_lock:
+        if key not in _default_et_clients:
+            _default_et_clients[key] = ExtractTableClient(key)
+        return _default_et_clients[key]
+
+
+@atexit.register
+def close_default_et_clients() -> None:
+    """Waits for the jobs in flight of the default clients, then closes their threads and connections."""
+    with _default_et_clients_lock:
+        clients = list(_default_et_clients.values())
+        _default_et_clients.clear()
+    for client in clients:
+        client.close()
 
 
 pickled_camelot = pickle.dumps(camelot.read_pdf)
+# seconds left to a job after its timeout before its worker is killed, see CamelotPool
+TIMEOUT_GRACE = 2
+# seconds between two checks of the jobs running in a CamelotPool
+MONITOR_INTERVAL = 0.1
+# times a job running when its pool broke (e.g. its worker was killed for lack of memory) is submitted again
+MAX_RESUBMISSIONS = 1
+
+# in the workers of a CamelotPool: where they tell which job they run
+_started_queue = None
+
+
+def _init_camelot_worker(memory_limit: int | None, started_queue=None) -> None:
+    """Caps the virtual address space of the worker process (and of its ghostscript renderings) to `memory_limit` bytes: beyond it, allocations fail with a MemoryError, which fails the job rather than the machine. It is not a cap on resident memory (RSS), which Linux does not enforce."""
+    global _started_queue
+    _started_queue = started_queue
+    if memory_limit is not None:
+        try:
+            import resource
+        except ImportError:  # not on Unix
+            logger.warning("The memory of camelot-py workers cannot be limited on this platform.")
+            return
+        resource.setrlimit(resource.RLIMIT_AS, (memory_limit, memory_limit))
+
+
+def _run_job(job_id: int, fn, args, kwargs):
+    """Runs in a worker process of a CamelotPool, after telling the pool which process runs the job."""
+    if _started_queue is not None:
+        _started_queue.put((job_id, os.getpid()))
+    return fn(*args, **kwargs)
+
+
+class _Job:
+    def __init__(self, job_id: int, fn, args, kwargs) -> None:
+        self.job_id = job_id
+        self.fn, self.args, self.kwargs = fn, args, kwargs
+        self.future = futures.Future()
+        # the future of the job in the current process pool
+        self.inner: futures.Future | None = None
+        # set once a worker has started the job
+        self.pid: int | None = None
+        self.started_at: float | None = None
+        self.nb_resubmissions = 0
+
+
+def _settle(future: futures.Future, result=None, exception: BaseException | None = None) -> None:
+    try:
+        if exception is not None:
+            future.set_exception(exception)
+        else:
+            future.set_result(result)
+    except futures.InvalidStateError:  # cancelled meanwhile
+        pass
+
+
+class CamelotPool(futures.Executor):
+    """Process pool for camelot-py jobs that gets rid of stuck jobs. A job can only be interrupted from its worker while it runs Python code (see camelot_extraction), not while stuck in C code (e.g. ghostscript). So a thread of this process watches the jobs: once a job has run for `job_timeout` + TIMEOUT_GRACE seconds, it kills the job's worker, fails the job with an ExtractionTimeout and replaces the pool. The other jobs lost with the pool are submitted again to the new one. The same goes for a job whose worker's resident memory (RSS, Linux only) exceeds `rss_limit` bytes, which fails with an ExtractionError, and for a job cancelled while running, whose worker would otherwise stay busy. A pool that breaks on its own (e.g. a worker killed for lack of memory) is replaced too: the jobs that were running are submitted again, up to MAX_RESUBMISSIONS times, and then fail with BrokenProcessPool.
+    Each worker's virtual address space is capped to `memory_limit` bytes (allocations beyond it fail in the worker) and, so that memory leaked by a job does not pile up, workers are replaced after `max_tasks_per_child` jobs (Python 3.11 or later: workers are then started with spawn)."""
+
+    def __init__(
+        self,
+        max_workers: int,
+        memory_limit: int | None = None,
+        max_tasks_per_child: int | None = None,
+        job_timeout: float | None = None,
+        rss_limit: int | None = None,
+    ) -> None:
+        if max_tasks_per_child is not None and sys.version_info < (3, 11):
+            logger.warning("Workers can only be recycled with Python 3.11 or later.")
+            max_tasks_per_child = None
+        self.max_workers = max_workers
+        self.memory_limit = memory_limit
+        self.max_tasks_per_child = max_tasks_per_child
+        self.job_timeout = job_timeout
+        self.rss_limit = rss_limit
+        self.mp_context = multiprocessing.get_context("spawn" if max_tasks_per_child is not None else None)
+        # job id -> _Job, for the jobs not done yet
+        self._jobs = {}
+        self._job_ids = itertools.count()
+        self._lock = threading.RLock()
+        # (job, future in the pool) once done, handled by the watching thread (callbacks of the pool's futures would otherwise wait for self._lock in the pool's threads)
+        self._done = queue.SimpleQueue()
+        self._shutdown = False
+        self._new_pool()
+        self._monitor = threading.Thread(target=self._watch, name="CamelotPool", daemon=True)
+        self._monitor.start()
+
+    def _new_pool(self) -> None:
+        self._started_queue = self.mp_context.SimpleQueue()
+        self._executor = futures.ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            mp_context=self.mp_context,
+            initializer=_init_camelot_worker,
+            initargs=(self.memory_limit, self._started_queue),
+            **({"max_tasks_per_child": self.max_tasks_per_child} if self.max_tasks_per_child is not None else {}),
+        )
+
+    def submit(self, fn, /, *args, **kwargs) -> futures.Future:
+        with self._lock:
+            if self._shutdown:
+                raise RuntimeError("cannot schedule new jobs after shutdown")
+            job = _Job(next(self._job_ids), fn, args, kwargs)
+            self._jobs[job.job_id] = job
+            job.future.add_done_callback(lambda future: self._on_cancel(job) if future.cancelled() else None)
+            self._submit(job)
+        return job.future
+
+    def _submit(self, job: _Job) -> None:
+        job.pid = job.started_at = None
+        try:
+            inner = self._executor.submit(_run_job, job.job_id, job.fn, job.args, job.kwargs)
+        except futures.process.BrokenProcessPool as exc:  # not replaced yet: submitted again once it is
+            inner = futures.Future()
+            inner.set_exception(exc)
+        job.inner = inner
+        inner.add_done_callback(lambda _: self._done.put((job, inner)))
+
+    def _on_done(self, job: _Job, inner: futures.Future) -> bool:
+        """Settles the job done in its pool. Returns whether the pool broke."""
+        if inner is not job.inner or inner.cancelled():  # submitted again, or cancelled
+            return False
+        exception = inner.exception()
+        if isinstance(exception, futures.process.BrokenProcessPool):
+            return True
+        del self._jobs[job.job_id]
+        _settle(job.future, None if exception is not None else inner.result(), exception)
+        return False
+
+    def _on_cancel(self, job: _Job) -> None:
+        with self._lock:
+            # a job already running is left to the watching thread, which kills its worker
+            if job.inner is not None and job.inner.cancel():
+                self._jobs.pop(job.job_id, None)
+
+    def _read_started(self) -> None:
+        now = time.monotonic()
+        while not self._started_queue.empty():
+            job_id, pid = self._started_queue.get()
+            job = self._jobs.get(job_id)
+            if job is not None and job.started_at is None:
+                job.pid, job.started_at = pid, now
+
+    def _running(self) -> list[_Job]:
+        return [job for job in self._jobs.values() if job.started_at is not None and not job.inner.done()]
+
+    def _watch(self) -> None:
+        while True:
+            try:
+                done = [self._done.get(timeout=MONITOR_INTERVAL)]
+            except queue.Empty:
+                done = []
+            while not self._done.empty():
+                done.append(self._done.get())
+            with self._lock:
+                broken = False
+                for job, inner in done:
+                    broken = self._on_done(job, inner) or broken
+                if self._shutdown and not self._jobs:
+                    return
+                self._read_started()
+                to_kill = self._to_kill()
+                if to_kill or broken:
+                    self._replace_pool(to_kill)
+
+    def _to_kill(self) -> dict:
+        """{job: exception to fail it with (None if cancelled)} for the running jobs whose worker should be killed: stuck, over the RSS limit or cancelled."""
+        to_kill = {}
+        now = time.monotonic()
+        for job in self._running():
+            if job.future.cancelled():
+                to_kill[job] = None
+            elif self.job_timeout and now - job.started_at > self.job_timeout + TIMEOUT_GRACE:
+                logger.error(
+                    "camelot-py job stuck for more than %ss: killing its worker %s.", self.job_timeout + TIMEOUT_GRACE, job.pid
+                )
+                to_kill[job] = ExtractionTimeout(
+                    f"camelot-py job stuck for more than {self.job_timeout + TIMEOUT_GRACE}s, its worker was killed."
+                )
+            elif self.rss_limit and (_rss(job.pid) or 0) > self.rss_limit:
+                logger.error("camelot-py job over the RSS limit (%s bytes): killing its worker %s.", self.rss_limit, job.pid)
+                to_kill[job] = ExtractionError(
+                    f"camelot-py job over the RSS limit of {self.rss_limit} bytes, its worker was killed."
+                )
+        return to_kill
+
+    def _replace_pool(self, to_kill: dict) -> None:
+        """Kills the workers of the jobs `to_kill` (which breaks the pool), fails these jobs (see `_to_kill`), and submits the other jobs not done to a new pool."""
+        for job in to_kill:
+            _kill(job.pid)
+        # the jobs that were running when the pool broke on its own, one of which broke it
+        suspects = [] if to_kill else [job for job in self._jobs.values() if job.started_at is not None]
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self._new_pool()
+        failed = {job.job_id: exception for job, exception in to_kill.items() if exception is not None}
+        for job in suspects:
+            job.nb_resubmissions += 1
+            if job.nb_resubmissions > MAX_RESUBMISSIONS:
+                failed[job.job_id] = job.inner.exception() or futures.process.BrokenProcessPool(
+                    "A process of the pool was terminated abruptly."
+                )
+        for job in list(self._jobs.values()):
+            if job.job_id in failed:
+                del self._jobs[job.job_id]
+                job.inner = None
+                _settle(job.future, exception=failed[job.job_id])
+            elif job.future.cancelled():
+                del self._jobs[job.job_id]
+            else:
+                self._submit(job)
+
+    def shutdown(self, wait=True, *, cancel_futures=False) -> None:
+        """With `cancel_futures`, the jobs not started are cancelled and the workers of those running are killed: nothing is waited for."""
+        with self._lock:
+            self._shutdown = True
+            if cancel_futures:
+                self._read_started()
+                for job in list(self._jobs.values()):
+                    job.future.cancel()
+                    if job.started_at is not None and not job.inner.done():
+                        _kill(job.pid)
+                self._jobs.clear()
+        if wait:
+            with self._lock:
+                not_done = [job.future for job in self._jobs.values()]
+            futures.wait(not_done)
+            self._monitor.join()
+        with self._lock:
+            self._executor.shutdown(wait=wait, cancel_futures=cancel_futures)
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        # on an error (e.g. KeyboardInterrupt), the jobs are not waited for
+        self.shutdown(wait=exc_type is None, cancel_futures=exc_type is not None)
+        return False
+
+
+def _rss(pid: int) -> int | None:
+    """Resident memory of the process, in bytes, None if unknown (e.g. not on Linux)."""
+    try:
+        with open(f"/proc/{pid}/status", "r", encoding="utf-8") as f:
+            return next(int(line.split()[1]) * 1024 for line in f if line.startswith("VmRSS:"))
+    except (OSError, ValueError, IndexError, StopIteration):
+        return None
+
+
+def _kill(pid: int) -> None:
+    try:
+        os.kill(pid, signal.SIGKILL if hasattr(signal, "SIGKILL") else signal.SIGTERM)
+    except (ProcessLookupError, PermissionError, OSError):
+        pass
+
+
+def camelot_executor(
+    max_workers: int,
+    memory_limit: int | None = None,
+    max_tasks_per_child: int | None = None,
+    job_timeout: float | None = None,
+    rss_limit: int | None = None,
+) -> CamelotPool:
+    """Process pool for camelot-py jobs, see CamelotPool."""
+    return CamelotPool(max_workers, memory_limit, max_tasks_per_child, job_timeout, rss_limit)
 
 
-def camelot_extraction(pickled_read_pdf, fixed_options, options):
+def _raise_timeout(signum, frame):
+    raise ExtractionTimeout("camelot-py job timed out.")
+
+
+def camelot_extraction(pickled_read_pdf, fixed_options, options, timeout: float | None = None):
+    """Runs in a worker process. The job is interrupted with an ExtractionTimeout after `timeout` seconds, so that the worker is free for the next job, unless it is stuck outside of Python (then see CamelotPool) or the platform has no SIGALRM (Windows)."""
     t0 = time.time()
     unpickled_read_pdf = pickle.loads(pickled_read_pdf)
     logger.info(
@@ -42,7 +323,16 @@ def camelot_extraction(pickled_read_pdf, fixed_options, options):
         options,
         time.gmtime(time.time()),
     )
-    proc_res = unpickled_read_pdf(**fixed_options, **options)
+    interrupt = bool(timeout) and hasattr(signal, "setitimer")
+    if interrupt:
+        previous_handler = signal.signal(signal.SIGALRM, _raise_timeout)
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        proc_res = unpickled_read_pdf(**fixed_options, **options)
+    finally:
+        if interrupt:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, previous_handler)
     logger.info(
         "camelot_extraction by worker done %s %s\ntook %ss",
         fixed_options,
@@ -83,15 +373,19 @@ class AbstractExtractor(abc.ABC):
 
 
 class ExtractTableExtractor(AbstractExtractor):
+    """Remote extractions are network I/O: they are submitted to `et_client`'s threads (see ExtractTableClient), not to the process pool of camelot-py."""
+
     def __init__(
         self,
         key,
         pdf_repo_path,
         intermediate_files_dir,
         executor: futures.ProcessPoolExecutor,
+        et_client: ExtractTableClient | None = None,
     ) -> None:
         super().__init__(pdf_repo_path, intermediate_files_dir, executor)
         self.key = key
+        self.et_client = et_client
         self.cache_path = os.path.join(intermediate_files_dir, "ExtractTable.com_cache")
         os.makedirs(self.cache_path, exist_ok=True)
 
@@ -121,14 +415,11 @@ class ExtractTableExtractor(AbstractExtractor):
             logger.info(
                 "\nExtracting %s with ExtractTable.com\n", report, exc_info=True
             )
-            if self.key:
-                et_sess = ExtractTable(api_key=self.key)
-            else:
+            if not self.key:
                 raise ExtractionError("no ExtractTable.com key provided")
+            et_client = self.et_client or default_et_client(self.key)
             logger.info("submitting %s to ET", report)
-            return [
-                self.executor.submit(get_remote_ET_result, et_sess, file_path, pages)
-            ]
+            return [et_client.submit(file_path, pages)]
 
     def read_cache_write_intermediate_tables(
         self, report: CbCReport, jobs: list[futures.Future] | None
@@ -160,18 +451,22 @@ class ExtractTableExtractor(AbstractExtractor):
                 index=False,
                 header=False,
             )
-            dfs.append(df)
+            dfs.append(as_raw_strings(df))
         return dfs
 
 
 class CamelotExtractor(AbstractExtractor):
+    """Each camelot-py job is interrupted after `job_timeout` seconds (see camelot_extraction), and killed with its worker if stuck (when `executor` is a CamelotPool). A report with a job that timed out or failed is not cached: its extraction fails with an ExtractionError, and its other jobs are cancelled."""
+
     def __init__(
         self,
         pdf_repo_path,
         intermediate_files_dir,
-        executor: futures.ProcessPoolExecutor,
+        executor: futures.Executor,
+        job_timeout: float | None = None,
     ) -> None:
         super().__init__(pdf_repo_path, intermediate_files_dir, executor)
+        self.job_timeout = job_timeout
         self.cache_path = os.path.join(intermediate_files_dir, "camelot_cache")
         os.makedirs(self.cache_path, exist_ok=True)
 
@@ -187,9 +482,18 @@ class CamelotExtractor(AbstractExtractor):
         file_name = f"{os.path.basename(report.filename_of_source)}.json"
         method_extraction = dict()
         if jobs:
-            for i in futures.as_completed(jobs):
+            self.wait(report, jobs)
+            # the job that failed, if any, before those cancelled
+            for i in sorted(jobs, key=lambda job: job.cancelled()):
                 # cache as json to have a single file per report, not multiple CSV files.
-                opts, tables = i.result()
+                try:
+                    opts, tables = i.result()
+                except ExtractionTimeout as exc:
+                    raise ExtractionTimeout(
+                        f"camelot-py job on {report} timed out after {self.job_timeout}s."
+                    ) from exc
+                except Exception as exc:  # e.g. a MemoryError in a worker with a memory limit
+                    raise ExtractionError(f"camelot-py job on {report} failed: {exc!r}") from exc
                 logger.info("camelot - worker finished. \n%s \n%s", report, time.time())
                 method_extraction[str(opts)] = list(
                     map(
@@ -205,6 +509,12 @@ class CamelotExtractor(AbstractExtractor):
             ) as outfile:
                 json.dump(method_extraction, outfile, indent=4)
 
+    def wait(self, report: CbCReport, jobs: list[futures.Future]) -> None:
+        """Waits for the jobs of the report, or until one of them fails: the others are then cancelled."""
+        _, not_done = futures.wait(jobs, return_when=futures.FIRST_EXCEPTION)
+        for job in not_done:
+            job.cancel()
+
     def submit_jobs(self, report: CbCReport) -> list[futures.Future] | None:
         if not self.check_cache(report):
             file_path = os.path.join(self.pdf_repo_path, report.filename_of_source)
@@ -228,7 +538,11 @@ class CamelotExtractor(AbstractExtractor):
                 logger.info("submitting %s", option)
                 to_do.append(
                     self.executor.submit(
-                        camelot_extraction, pickled_camelot, fixed_options, option
+                        camelot_extraction,
+                        pickled_camelot,
+                        fixed_options,
+                        option,
+                        self.job_timeout,
                     )
                 )
             return to_do
@@ -252,7 +566,7 @@ class CamelotExtractor(AbstractExtractor):
                 k: list(
                     map(
                         lambda x: TableAcc(
-                            pd.DataFrame.from_dict(x["json_table"], dtype=str),
+                            as_raw_strings(pd.DataFrame.from_dict(x["json_table"], dtype=str)),
                             x["accuracy"],
                         ),
                         v,
@@ -292,26 +606,81 @@ class TableAcc:
         self.table = df
 
 
-def get_DataFrames(
+class PendingExtraction:
+    """The jobs submitted to extract the tables of a report (see `submit_extraction`). The tables are collected later, once needed: meanwhile, the jobs run in the executor."""
+
+    def __init__(
+        self,
+        report: CbCReport,
+        et_extractor: ExtractTableExtractor,
+        camelot_extractor: CamelotExtractor,
+        et_jobs: list[futures.Future] | None,
+        camelot_jobs: list[futures.Future] | None,
+        error: ExtractionError | None = None,
+    ) -> None:
+        self.report = report
+        self.et_extractor = et_extractor
+        self.camelot_extractor = camelot_extractor
+        self.et_jobs = et_jobs
+        self.camelot_jobs = camelot_jobs
+        # raised when collecting, as the camelot tables are written regardless
+        self.error = error
+
+    def done(self) -> bool:
+        return all(job.done() for job in (self.et_jobs or []) + (self.camelot_jobs or []))
+
+    def collect(self) -> list[pd.DataFrame]:
+        """Waits for the jobs and returns the tables from ExtractTable.com (see `get_DataFrames`)."""
+        try:
+            if self.error is not None:
+                raise self.error
+        finally:
+            try:
+                self.camelot_extractor.read_cache_write_intermediate_tables(
+                    self.report, self.camelot_jobs
+                )
+            except ExtractionError:
+                # the tables from ExtractTable.com are paid for: they are cached all the same
+                self.et_extractor.write_cache(self.report, self.et_jobs)
+                raise
+        return self.et_extractor.read_cache_write_intermediate_tables(self.report, self.et_jobs)
+
+
+def submit_extraction(
     key: str,
     report: CbCReport,
     pdf_repo_path,
     executor: futures.ProcessPoolExecutor,
     intermediate_files_dir="intermediate_files",
-) -> list[pd.DataFrame]:
-    """Returns tables from ExtractTable.com. Both camelot-py and ExtractTable.com CSV files are written to the intermediate_files_dir so that they can be edited by the operator in case automatic standardization is not possible."""
-
+    et_client: ExtractTableClient | None = None,
+    camelot_timeout: float | None = None,
+) -> PendingExtraction:
+    """Submits the camelot-py jobs (to `executor`, each interrupted after `camelot_timeout` seconds) and ExtractTable.com jobs (to `et_client`, by default one shared client per key) for the report, unless their results are cached, without waiting for them. The tables are returned by `PendingExtraction.collect`."""
     et_extractor = ExtractTableExtractor(
-        key, pdf_repo_path, intermediate_files_dir, executor
+        key, pdf_repo_path, intermediate_files_dir, executor, et_client
     )
     camelot_extractor = CamelotExtractor(
-        pdf_repo_path, intermediate_files_dir, executor
+        pdf_repo_path, intermediate_files_dir, executor, camelot_timeout
     )
     camelot_jobs = camelot_extractor.submit_jobs(report)
     try:
-        et_jobs = et_extractor.submit_jobs(report)
+        et_jobs, error = et_extractor.submit_jobs(report), None
     except ExtractionError as exc:
-        raise exc
-    finally:
-        camelot_extractor.read_cache_write_intermediate_tables(report, camelot_jobs)
-    return et_extractor.read_cache_write_intermediate_tables(report, et_jobs)
+        et_jobs, error = None, exc
+    return PendingExtraction(report, et_extractor, camelot_extractor, et_jobs, camelot_jobs, error)
+
+
+def get_DataFrames(
+    key: str,
+    report: CbCReport,
+    pdf_repo_path,
+    executor: futures.ProcessPoolExecutor,
+    intermediate_files_dir="intermediate_files",
+    et_client: ExtractTableClient | None = None,
+    camelot_timeout: float | None = None,
+) -> list[pd.DataFrame]:
+    """Returns tables from ExtractTable.com. Both camelot-py and ExtractTable.com CSV files are written to the intermediate_files_dir so that they can be edited by the operator in case automatic standardization is not possible.
+    Blocks until the jobs are done: see `submit_extraction` to submit them ahead of time."""
+    return submit_extraction(
+        key, report, pdf_repo_path, executor, intermediate_files_dir, et_client, camelot_timeout
+    ).collect()
@@ -0,0 +1,245 @@
+"""This module checks regex rules for patterns that may take (practically) forever to match - catastrophic backtracking. Regex rules are typed by the operator and a single pathological pattern, matched against a long garbage cell, could otherwise stall a whole batch of extractions.
+Python's `re` cannot be interrupted once matching has started, so patterns are checked before being used: statically, for shapes that often backtrack catastrophically (nested unbounded quantifiers, e.g. `(a+)+`, or overlapping alternatives under an unbounded quantifier, e.g. `(a|a)*`), and by matching them, in a separate process that is killed once the time budget is exceeded, against adversarial strings built from the pattern itself: for each unbounded quantifier, a string matching what precedes it, then a long run of what it repeats, then a character that makes the match fail. The static check is a heuristic, with false positives (`(?:\\d+,)*\\d+` is safe) and misses: only the probe is trusted to reject a pattern."""
+import itertools
+import multiprocessing
+import re
+
+try:  # python >= 3.11
+    from re import _constants as sre_constants
+    from re import _parser as sre_parse
+except ImportError:
+    import sre_constants
+    import sre_parse
+
+__all__ = ["regex_problem", "regex_warning", "adversarial_strings", "probe_regexes", "PROBE_TIME_BUDGET"]
+
+UNBOUNDED_REPEATS = {sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT}
+# possessive quantifiers and atomic groups (python >= 3.11) do not backtrack, but the characters they consume still matter
+ALL_REPEATS = UNBOUNDED_REPEATS | {getattr(sre_constants, "POSSESSIVE_REPEAT", sre_constants.MAX_REPEAT)}
+ATOMIC_GROUP = getattr(sre_constants, "ATOMIC_GROUP", None)
+PROBE_LENGTH = 5000
+# seconds, for probing suspicious patterns when no time budget is set
+PROBE_TIME_BUDGET = 1.0
+# strings tried against every pattern, on top of those built from the pattern
+PROBES = [
+    "a" * PROBE_LENGTH + "!",
+    " " * PROBE_LENGTH + "!",
+    "0" * PROBE_LENGTH + "!",
+    "a " * (PROBE_LENGTH // 2) + "!",
+    "ab" * (PROBE_LENGTH // 2) + "!",
+]
+# at most as many characters of a quantified subpattern are repeated one by one, and as many quantifiers are probed
+MAX_PROBE_CHARS = 8
+MAX_PROBED_REPEATS = 8
+# a character that makes the match fail is looked for among these
+FAILING_CHARS = "!#~\x00"
+# a character of each category, for character classes like \d
+CATEGORY_CHARS = {
+    sre_constants.CATEGORY_DIGIT: "0",
+    sre_constants.CATEGORY_SPACE: " ",
+    sre_constants.CATEGORY_NOT_SPACE: "a",
+    sre_constants.CATEGORY_WORD: "a",
+    sre_constants.CATEGORY_NOT_WORD: " ",
+    sre_constants.CATEGORY_LINEBREAK: "\n",
+}
+
+
+def _alphabet(items) -> list[str]:
+    """Characters a (parsed) pattern can consume, in order of appearance: the literals, the bounds of ranges and a character of each category. Classes matching any character but a few are represented by 'a'."""
+    chars = []
+    for op, av in items:
+        if op == sre_constants.LITERAL:
+            chars.append(chr(av))
+        elif op in (sre_constants.NOT_LITERAL, sre_constants.ANY):
+            chars.append("a" if av != ord("a") else "b")
+        elif op == sre_constants.IN:
+            if av and av[0][0] == sre_constants.NEGATE:
+                chars.append("a")
+                continue
+            for item_op, item_av in av:
+                if item_op == sre_constants.LITERAL:
+                    chars.append(chr(item_av))
+                elif item_op == sre_constants.RANGE:
+                    chars += [chr(item_av[0]), chr(item_av[1])]
+                elif item_op == sre_constants.CATEGORY:
+                    chars.append(CATEGORY_CHARS.get(item_av, "a"))
+        elif op in ALL_REPEATS:
+            chars += _alphabet(av[2])
+        elif op == sre_constants.SUBPATTERN:
+            chars += _alphabet(av[-1])
+        elif op == ATOMIC_GROUP:
+            chars += _alphabet(av)
+        elif op == sre_constants.BRANCH:
+            for alternative in av[1]:
+                chars += _alphabet(alternative)
+    return list(dict.fromkeys(chars))
+
+
+def _sample(items) -> str:
+    """A short string the (parsed) pattern may match, as far as can be told cheaply: the first alternative of each branch, the minimum number of repetitions, and nothing for assertions and backreferences."""
+    out = []
+    for op, av in items:
+        if op in (sre_constants.LITERAL, sre_constants.NOT_LITERAL, sre_constants.ANY, sre_constants.IN):
+            out += _alphabet([(op, av)])[:1]
+        elif op in ALL_REPEATS:
+            out.append(_sample(av[2]) * min(av[0], PROBE_LENGTH))
+        elif op == sre_constants.SUBPATTERN:
+            out.append(_sample(av[-1]))
+        elif op == ATOMIC_GROUP:
+            out.append(_sample(av))
+        elif op == sre_constants.BRANCH:
+            out.append(_sample(av[1][0]))
+        elif op == sre_constants.GROUPREF_EXISTS:
+            out.append(_sample(av[1]))
+    return "".join(out)
+
+
+def _unbounded_repeats(items, prefix=""):
+    """Yields (prefix, subpattern) for each unbounded quantifier (that may backtrack) of a parsed pattern: the subpattern it repeats and a string matching what precedes it."""
+    for op, av in items:
+        if op in UNBOUNDED_REPEATS and av[1] == sre_constants.MAXREPEAT:
+            yield prefix, av[2]
+        if op in ALL_REPEATS:
+            yield from _unbounded_repeats(av[2], prefix)
+        elif op == sre_constants.SUBPATTERN:
+            yield from _unbounded_repeats(av[-1], prefix)
+        elif op == ATOMIC_GROUP:
+            yield from _unbounded_repeats(av, prefix)
+        elif op == sre_constants.BRANCH:
+            for alternative in av[1]:
+                yield from _unbounded_repeats(alternative, prefix)
+        prefix += _sample([(op, av)])
+
+
+def adversarial_strings(pattern: str) -> list[str]:
+    """Strings on which the pattern is most likely to backtrack catastrophically, if it can: for each unbounded quantifier, a string matching what precedes it, then (PROBE_LENGTH characters of) each character the quantifier repeats, all of them in turn, or a sample of what it repeats, then a character that makes the match fail. PROBES are added."""
+    parsed = sre_parse.parse(pattern)
+    failing = next((c for c in FAILING_CHARS if c not in _alphabet(parsed)), FAILING_CHARS[0])
+    probes = []
+    for prefix, repeated in itertools.islice(_unbounded_repeats(parsed), MAX_PROBED_REPEATS):
+        chars = _alphabet(repeated)[:MAX_PROBE_CHARS]
+        for run in chars + ["".join(chars), _sample(repeated)]:
+            if run:
+                probes.append(prefix + run * max(PROBE_LENGTH // len(run), 1) + failing)
+    return list(dict.fromkeys(probes + PROBES))
+
+
+def _first_chars(items) -> set | None:
+    """Literal characters a (parsed) pattern can start with, None if unknown (e.g. a class, or an empty pattern)."""
+    if not items:
+        return None
+    op, av = items[0]
+    if op == sre_constants.LITERAL:
+        return {av}
+    if op == sre_constants.IN and all(item_op == sre_constants.LITERAL for item_op, _ in av):
+        return {item_av for _, item_av in av}
+    if op == sre_constants.SUBPATTERN:
+        return _first_chars(av[-1])
+    return None
+
+
+def _overlapping_branches(alternatives) -> bool:
+    """Whether two alternatives may start with the same character, as far as can be told cheaply."""
+    seen = set()
+    for alternative in alternatives:
+        first = _first_chars(alternative)
+        if first is None or first & seen:
+            return True
+        seen |= first
+    return False
+
+
+def _backtracking_shape(parsed, inside_unbounded_repeat=False) -> str | None:
+    for op, av in parsed:
+        if op in UNBOUNDED_REPEATS:
+            _, max_repeat, subpattern = av
+            unbounded = max_repeat == sre_constants.MAXREPEAT
+            if unbounded and inside_unbounded_repeat:
+                return "nested unbounded quantifiers"
+            shape = _backtracking_shape(subpattern, inside_unbounded_repeat or unbounded)
+            if shape:
+                return shape
+        elif op == sre_constants.SUBPATTERN:
+            shape = _backtracking_shape(av[-1], inside_unbounded_repeat)
+            if shape:
+                return shape
+        elif op == sre_constants.BRANCH:
+            if inside_unbounded_repeat and _overlapping_branches(av[1]):
+                return "overlapping alternatives under an unbounded quantifier"
+            for alternative in av[1]:
+                shape = _backtracking_shape(alternative, inside_unbounded_repeat)
+                if shape:
+                    return shape
+        elif op in (sre_constants.ASSERT, sre_constants.ASSERT_NOT):
+            shape = _backtracking_shape(av[1], inside_unbounded_repeat)
+            if shape:
+                return shape
+        elif op == sre_constants.GROUPREF_EXISTS:
+            for alternative in av[1:]:
+                shape = alternative is not None and _backtracking_shape(alternative, inside_unbounded_repeat)
+                if shape:
+                    return shape
+    return None
+
+
+def regex_problem(pattern: str) -> str | None:
+    """Returns why the pattern cannot be used as a regex rule (it does not compile), None otherwise."""
+    try:
+        re.compile(pattern)
+    except re.error as exc:
+        return f"invalid regex: {exc}"
+    return None
+
+
+def regex_warning(pattern: str) -> str | None:
+    """Returns why a valid pattern may backtrack catastrophically, None if it looks fine. Static check only, cheap enough to run on every regex rule; a suspicious pattern should be confirmed with `probe_regexes` before being rejected."""
+    # atomic groups and possessive quantifiers (python >= 3.11) are parsed into other opcodes - and do not backtrack.
+    shape = _backtracking_shape(sre_parse.parse(pattern))
+    return f"{shape} (possible catastrophic backtracking)" if shape else None
+
+
+def _probe_worker(connection, patterns) -> None:
+    """Matches each pattern against the probes, sending the index of each pattern once it is done."""
+    connection.send(None)  # started: the time budget does not include the start of the process.
+    for i, pattern in enumerate(patterns):
+        compiled = re.compile(pattern)
+        for probe in adversarial_strings(pattern):
+            compiled.match(probe)
+        connection.send(i)
+    connection.close()
+
+
+def probe_regexes(patterns: list[str], time_budget: float) -> dict[str, str]:
+    """Matches each pattern against its adversarial strings (see adversarial_strings) in a separate process, killing it whenever a pattern takes longer than `time_budget` seconds. Returns {pattern: reason} for the patterns over budget."""
+    over_budget = {}
+    remaining = list(patterns)
+    while remaining:
+        parent_connection, child_connection = multiprocessing.Pipe(duplex=False)
+        worker = multiprocessing.Process(
+            target=_probe_worker, args=(child_connection, remaining), daemon=True
+        )
+        worker.start()
+        child_connection.close()
+        nb_done = 0
+        try:
+            parent_connection.recv()
+            while nb_done < len(remaining):
+                if not parent_connection.poll(time_budget):
+                    over_budget[remaining[nb_done]] = (
+                        f"took more than {time_budget}s to match adversarial strings of about {PROBE_LENGTH} characters"
+                    )
+                    nb_done += 1
+                    break
+                try:
+                    parent_connection.recv()
+                except EOFError:  # the worker died (e.g. out of memory) while matching
+                    over_budget[remaining[nb_done]] = "matching crashed the process"
+                    nb_done += 1
+                    break
+                nb_done += 1
+        finally:
+            worker.kill()
+            worker.join()
+            parent_connection.close()
+        remaining = remaining[nb_done:]
+    return over_budget
@@ -0,0 +1,100 @@
+"""This module sizes the process pools that extract_all_reports runs its jobs in, from the cores and the memory available to the process: camelot-py jobs (CPU-heavy) and the standardization of reports (CPU, headless runs only). ExtractTable.com requests wait on the network in threads, and their number is a limit of the remote service rather than of this machine: see ExtractTableClient's `max_workers`.
+Process pools default to one worker per core, and are then shrunk until their workers fit in the available memory, each worker being budgeted the memory of its heaviest jobs. Sizes given explicitly are kept, with a warning if they do not fit."""
+import os
+
+from .log import logger
+
+__all__ = ["PoolSizes", "plan_pools", "available_memory", "available_cpus"]
+
+MiB = 2**20
+# peak memory of a worker, in bytes: camelot-py's lattice flavor renders the pages with ghostscript and detects lines on the image, several times the needs of the stream flavor
+CAMELOT_WORKER_MEMORY = 1024 * MiB
+STANDARDIZATION_WORKER_MEMORY = 256 * MiB
+# share of the available memory the workers may use, the rest being left to this process and to the system
+MEMORY_BUDGET = 0.8
+
+
+def available_cpus() -> int:
+    """Cores this process may run on (which can be fewer than the cores of the machine, e.g. in a container)."""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:  # not on Linux
+        return os.cpu_count() or 1
+
+
+def available_memory(meminfo_path="/proc/meminfo") -> int | None:
+    """Memory available for new processes without swapping, in bytes (MemAvailable), or None if unknown."""
+    try:
+        with open(meminfo_path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        return os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+class PoolSizes:
+    """Number of workers of each pool."""
+
+    def __init__(self, camelot: int, standardization: int) -> None:
+        self.camelot = camelot
+        self.standardization = standardization
+
+    def __repr__(self) -> str:
+        return f"PoolSizes(camelot={self.camelot}, standardization={self.standardization})"
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, PoolSizes) and vars(self) == vars(other)
+
+
+def plan_pools(
+    camelot_workers: int | None = None,
+    standardization_workers: int | None = None,
+    parallel_standardization=True,
+    camelot_worker_memory=CAMELOT_WORKER_MEMORY,
+    standardization_worker_memory=STANDARDIZATION_WORKER_MEMORY,
+    cpus: int | None = None,
+    memory: int | None = None,
+) -> PoolSizes:
+    """Sizes the pools: None (or 0) sizes a pool automatically. Process pools get one worker per core (`cpus`, by default those available); if their workers then need more than MEMORY_BUDGET of the available `memory` (by default read from /proc/meminfo), the automatically sized pools are shrunk, the one needing the most memory first, down to a single worker. Without `parallel_standardization`, reports are standardized in this process: no memory is budgeted for that pool."""
+    cpus = cpus or available_cpus()
+    memory = memory if memory is not None else available_memory()
+    sizes = {
+        "camelot": camelot_workers or cpus,
+        "standardization": (standardization_workers or cpus) if parallel_standardization else 1,
+    }
+    per_worker = {
+        "camelot": camelot_worker_memory,
+        "standardization": standardization_worker_memory if parallel_standardization else 0,
+    }
+    auto = {
+        "camelot": not camelot_workers,
+        "standardization": parallel_standardization and not standardization_workers,
+    }
+    if memory is not None:
+        budget = memory * MEMORY_BUDGET
+
+        def needed():
+            return sum(sizes[pool] * per_worker[pool] for pool in sizes)
+
+        # the largest of the pools sized automatically is shrunk first
+        while needed() > budget:
+            shrinkable = [pool for pool in sizes if auto[pool] and sizes[pool] > 1]
+            if not shrinkable:
+                break
+            sizes[max(shrinkable, key=lambda pool: sizes[pool] * per_worker[pool])] -= 1
+        if needed() > budget:
+            logger.warning(
+                "Worker pools may need %.1f GiB, %.1f GiB of memory available: consider fewer workers.",
+                needed() / 2**30,
+                memory / 2**30,
+            )
+    pools = PoolSizes(sizes["camelot"], sizes["standardization"])
+    logger.info(
+        "%s (%s cores, %s bytes of memory available)", pools, cpus, memory
+    )
+    return pools
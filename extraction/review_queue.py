@@ -0,0 +1,187 @@
+"""This module contains the class ReviewQueue, which collects the column and jurisdiction names that no rule applies to (the `_tocheck` names) across all the reports of a headless run, instead of prompting the operator report by report. Each name is queued once, with the number of times it was found, the reports it was found in and a few example contexts. The operator then resolves the whole queue in a single session (see `ReviewQueue.resolve`), and the next run re-standardizes only the reports in which the resolved names were found."""
+import json
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+from .cbc_report import CbCReport
+from .log import logger
+from .operator_prompts import prompt_common, prompt_text_col, prompt_text_jurisdiction
+from .rules import Rules
+
+__all__ = ["ReviewQueue"]
+
+# examples kept for each queued name, and their maximum length
+MAX_CONTEXTS = 3
+MAX_CONTEXT_LENGTH = 200
+# as named by `apply_rules_to_columns`: <name>_<position>_tocheck
+NON_STANDARD_COLUMN_RE = re.compile(r"^(.*)_\d+_tocheck$")
+TOCHECK = "_tocheck"
+KINDS = {"c": "column", "j": "jurisdiction"}
+
+
+def report_key(report: CbCReport) -> str:
+    return f"{report.group_name}_{report.end_of_year}"
+
+
+def _context(cells) -> str:
+    return " | ".join(cell for cell in map(str, cells) if cell != "nan")[:MAX_CONTEXT_LENGTH]
+
+
+class ReviewQueue:
+    """Deduplicated queue of the column and jurisdiction names left to check, written to (and read from) a JSON file. Each entry holds the kind of name (`column` or `jurisdiction`), the name, the number of times it was found in each report, a few example contexts (cells of the column or of the row) and whether the operator has resolved it."""
+
+    def __init__(self, path: str | None = None) -> None:
+        self.path = path
+        # (col_or_jur, name) -> entry
+        self._entries = {}
+        if path and os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for entry in json.load(f):
+                    col_or_jur = "c" if entry.pop("kind") == "column" else "j"
+                    entry.pop("count", None)
+                    self._entries[(col_or_jur, entry.pop("name"))] = entry
+
+    def __len__(self) -> int:
+        """Number of names left to resolve."""
+        return len(self.pending())
+
+    def _queue(self, col_or_jur, name, report: CbCReport, context: str) -> None:
+        key = report_key(report)
+        entry = self._entries.setdefault(
+            (col_or_jur, name), {"reports": {}, "contexts": [], "resolved": False}
+        )
+        entry["reports"][key] = entry["reports"].get(key, 0) + 1
+        # a name resolved before is found again: the rules written for it do not apply to this report
+        entry["resolved"] = False
+        if len(entry["contexts"]) < MAX_CONTEXTS:
+            entry["contexts"].append({"report": key, "context": context})
+
+    def add(self, df: pd.DataFrame, report: CbCReport) -> int:
+        """Queues the `_tocheck` column names and jurisdictions of the DataFrame (as named by the rules, before being trimmed). Returns the number of names found."""
+        nb_found = 0
+        for column_name, values in df.items():
+            found = NON_STANDARD_COLUMN_RE.match(str(column_name))
+            if found:
+                self._queue("c", found.group(1), report, _context(values.head(MAX_CONTEXTS * 3)))
+                nb_found += 1
+        if "jurisdiction" in df.columns:
+            jurisdictions = df["jurisdiction"].astype(str).to_numpy(dtype=object)
+            for position in np.flatnonzero([name.endswith(TOCHECK) for name in jurisdictions]):
+                self._queue(
+                    "j",
+                    jurisdictions[position][: -len(TOCHECK)],
+                    report,
+                    _context(df.iloc[position].drop("jurisdiction")),
+                )
+                nb_found += 1
+        return nb_found
+
+    def merge(self, other: "ReviewQueue") -> None:
+        """Adds what was queued in `other` (e.g. by a worker process standardizing reports in parallel)."""
+        for entry_key, other_entry in other._entries.items():
+            entry = self._entries.setdefault(
+                entry_key, {"reports": {}, "contexts": [], "resolved": False}
+            )
+            for key, count in other_entry["reports"].items():
+                entry["reports"][key] = entry["reports"].get(key, 0) + count
+            entry["contexts"] = (entry["contexts"] + other_entry["contexts"])[:MAX_CONTEXTS]
+            entry["resolved"] = entry["resolved"] and other_entry["resolved"]
+
+    def forget(self, report: CbCReport) -> None:
+        """Removes what was queued from the report (once it has been standardized again)."""
+        key = report_key(report)
+        for entry_key, entry in list(self._entries.items()):
+            if entry["reports"].pop(key, None) is None:
+                continue
+            entry["contexts"] = [c for c in entry["contexts"] if c["report"] != key]
+            if not entry["reports"]:
+                del self._entries[entry_key]
+
+    def pending(self) -> list[tuple[str, str, dict]]:
+        """(col_or_jur, name, entry) of the names left to resolve, the most frequent first."""
+        return sorted(
+            (
+                (col_or_jur, name, entry)
+                for (col_or_jur, name), entry in self._entries.items()
+                if not entry["resolved"]
+            ),
+            key=lambda item: -sum(item[2]["reports"].values()),
+        )
+
+    def reports_to_restandardize(self) -> set[str]:
+        """`<group_name>_<end_of_year>` of the reports with resolved names, whose standardized tables are outdated."""
+        return {
+            key
+            for entry in self._entries.values()
+            if entry["resolved"]
+            for key in entry["reports"]
+        }
+
+    def resolve(self, rules: Rules, reports: list[CbCReport]) -> int:
+        """Prompts the operator for each name left to resolve, the most frequent first, and writes the rules in `rules`. The scope chosen by the operator applies to all the reports the name was found in: a rule for all reports is written once, a rule for an MNC once per MNC and a one-time rule once per report. Names that rules already apply to (e.g. written meanwhile by other processes) are resolved without prompting. Stops if the operator quits. Returns the number of names resolved."""
+        reports_by_key = {report_key(report): report for report in reports}
+        nb_resolved = 0
+        for col_or_jur, name, entry in self.pending():
+            entry_reports = [
+                reports_by_key[key] for key in entry["reports"] if key in reports_by_key
+            ]
+            if not entry_reports:
+                logger.warning("%s %s: reports not found in the metadata.", KINDS[col_or_jur], name)
+                continue
+            if all(
+                rules.resolve_many(report, [name], col_or_jur)[name] for report in entry_reports
+            ):
+                entry["resolved"] = True
+                nb_resolved += 1
+                continue
+            filenames = ", ".join(entry["reports"])
+            context = f"\n    Found {sum(entry['reports'].values())} times, e.g.:\n" + "\n".join(
+                f"    {c['report']}: {c['context']}" for c in entry["contexts"]
+            )
+            if col_or_jur == "c":
+                options = dict(
+                    enumerate(["to_drop", name] + rules.get_std_colnames_from_rules())
+                )
+                prompt_text = prompt_text_col(name, filenames, options, context)
+            else:
+                options = dict(enumerate([name, "delete_row", "other"]))
+                prompt_text = prompt_text_jurisdiction(name, filenames, options, context)
+            mode, rule_source, sink, justification = prompt_common(rules, name, options, prompt_text)
+            if sink == "quit":
+                break
+            if mode == "!":
+                rules_reports = entry_reports[:1]
+            elif mode == "#":
+                rules_reports = list({report.group_name: report for report in entry_reports}.values())
+            else:
+                rules_reports = entry_reports
+            for report in rules_reports:
+                rules.write_new_rule(rule_source, mode, sink, justification, col_or_jur, report)
+            entry["resolved"] = True
+            nb_resolved += 1
+        return nb_resolved
+
+    def save(self, path: str | None = None) -> None:
+        """Writes the queue to a JSON file (by default, the one it was read from), the most frequent names first."""
+        path = path or self.path
+        entries = sorted(
+            self._entries.items(), key=lambda item: -sum(item[1]["reports"].values())
+        )
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(
+                [
+                    {
+                        "kind": KINDS[col_or_jur],
+                        "name": name,
+                        "count": sum(entry["reports"].values()),
+                        **entry,
+                    }
+                    for (col_or_jur, name), entry in entries
+                ],
+                f,
+                indent=4,
+                ensure_ascii=False,
+            )
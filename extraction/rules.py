@@ -1,60 +1,385 @@
 """This module contains the class Rules. The rules are stored in the disk as a JSON file, and are loaded into the Rules object before the extraction process begins. The rules are used to determine which columns and row are to be extracted from a given CbC report and which names should be used."""
+import copy
+import csv
 import json
+import os
 import re
+import shutil
+import tempfile
+import time
 
 from .cbc_report import CbCReport
 from .utils import partition
 from .exceptions import RulesError
+from .log import logger
+from .regex_guard import PROBE_TIME_BUDGET, probe_regexes, regex_problem, regex_warning
+from .rules_store import RulesStore
 
 __all__ = ["Rules"]
+
+IRS_COLUMNS = [
+    "unrelated_revenues",
+    "related_revenues",
+    "total_revenues",
+    "profit_before_tax",
+    "tax_paid",
+    "tax_accrued",
+    "stated_capital",
+    "accumulated_earnings",
+    "employees",
+    "tangible_assets",
+]
+REGEX_RULE_RE = re.compile(r"_regex_(.*)")
+# backreferences, named groups, conditionals and global inline flags change meaning (or fail to compile) once the regex is embedded in an alternation.
+NOT_COMBINABLE_RE = re.compile(r"\\\d|\(\?P[<=]|\(\?\(|^\(\?[aiLmsux]+\)")
+
+
+def combine_regex_rules(regex_rules: list[tuple[re.Pattern, str]]) -> list[tuple[re.Pattern, dict]]:
+    """Merges consecutive regex rules into single alternations, `(rule_1)|(rule_2)|...`. Alternatives are tried left to right, so the first rule (in order of priority) that matches is the one that fires - as when trying the rules one by one.
+    Returns a list of (pattern, {index of the rule's outermost group: sink}). Rules that cannot be safely embedded are kept as patterns of their own."""
+    matchers = []
+    run = []
+
+    def flush():
+        if len(run) == 1:
+            matchers.append((run[0][0], {0: run[0][1]}))
+        elif run:
+            group_to_sink = {}
+            group_index = 1
+            for compiled, sink in run:
+                group_to_sink[group_index] = sink
+                group_index += compiled.groups + 1
+            matchers.append(
+                (
+                    re.compile("|".join(f"({compiled.pattern})" for compiled, _ in run)),
+                    group_to_sink,
+                )
+            )
+        run.clear()
+
+    for compiled, sink in regex_rules:
+        if NOT_COMBINABLE_RE.search(compiled.pattern):
+            flush()
+            matchers.append((compiled, {0: sink}))
+        else:
+            run.append((compiled, sink))
+    flush()
+    return matchers
+
+
+def _no_rules() -> dict:
+    return {"column_rules": {"default": {}}, "jurisdiction_rules": {"default": {}}}
+
+
+class _RuleView:
+    """The rules in effect for one (group_name, end_of_year), split into strict rules and precompiled regex rules (in order of priority).
+    `origins` maps the source of each rule to the (mnc, scope) it was taken from."""
+    def __init__(self, rules_in_effect: dict):
+        self.origins = {k: origin for k, (_, origin) in rules_in_effect.items()}
+        strict, regex = partition(
+            lambda x: REGEX_RULE_RE.search(x[0]), rules_in_effect.items()
+        )
+        self.strict = {k: sink for k, (sink, _) in strict}
+        regex = list(regex)
+        self.regex_sources = [k for k, _ in regex]
+        self.regex = [
+            (re.compile(REGEX_RULE_RE.search(k).group(1)), sink) for k, (sink, _) in regex
+        ]
+        self.regex_matchers = combine_regex_rules(self.regex)
+
+    def match_regex(self, source: str):
+        """Returns the sink of the first regex rule matching the source, None if no rule applies."""
+        for pattern, group_to_sink in self.regex_matchers:
+            match = pattern.match(source)
+            if match:
+                # in an alternation, the outermost group of the matching rule is the last one to close
+                return group_to_sink[match.lastindex if len(group_to_sink) > 1 else 0]
+        return None
+
+
+class RuleStats:
+    """Usage of a single rule: number of hits, last report it applied to and the time spent matching it (regex rules only)."""
+    __slots__ = ("hits", "last_matched_report", "match_time")
+
+    def __init__(self) -> None:
+        self.hits = 0
+        self.last_matched_report = ""
+        self.match_time = 0.0
+
+
 class Rules:
     """Class representing all the rules for the extraction of (usually) multiple CbC reports. Rules exist along 2 axes: rules for column names vs for jurisdiction codes; regex rules vs strict rules. When prompted due to unknown name, the operator sets the scope of a rule being created: it may apply to all reports, to all reports of a given MNC, or to a given report. This handles queries to the rules (of the form "given this CbCR report and the source, what is the applicable sink?"), and can write the rules to a file."""
-    def __init__(self, rules : str):
+    def __init__(
+        self,
+        rules : str | None,
+        store : str | None = None,
+        record_stats : bool = False,
+        regex_time_budget : float | None = None,
+    ):
+        """`rules` is a JSON string or the path of a JSON rules file. If the path of a SQLite `store` is given, rules are read from (and new rules written to) the store, which can be shared by concurrent extraction processes; the rules of `rules` (which may be None) that are not in the store yet are then added to it, and those that differ from the store's are reported (the store's are used).
+        If `record_stats`, hits and matching times are recorded for each rule (see `export_rule_stats_to_csv`).
+        Invalid regex rules are skipped (see `skipped_rules`). Regex rules that look prone to catastrophic backtracking are tried against adversarial strings when loaded, and skipped only if a match takes longer than the `regex_time_budget` (in seconds, PROBE_TIME_BUDGET if None); with a `regex_time_budget`, every regex rule is tried. While extracting, a rule that takes longer than the budget to match a name is reported in `slow_matches` and skipped from then on."""
+        self._store = RulesStore(store) if store else None
         try:
-            try:
-                self._all = json.loads(rules)
-            except json.decoder.JSONDecodeError as exc:
-                with open(rules, mode="r", encoding="utf-8") as infile:
-                    self._all = json.load(infile)
+            if rules is None and self._store is not None:
+                from_file = _no_rules()
+            else:
+                try:
+                    from_file = json.loads(rules)
+                except json.decoder.JSONDecodeError as exc:
+                    with open(rules, mode="r", encoding="utf-8") as infile:
+                        from_file = json.load(infile)
+            # with a store, the rules are loaded from the store (see `refresh`), in the order they were written to it
+            self._all = from_file if self._store is None else _no_rules()
             self._column = self._all["column_rules"]
             self._jurisdiction = self._all["jurisdiction_rules"]
+            file_rules = list(self.__iterate_rules(from_file))
         except FileNotFoundError as exc:
             raise RulesError("Rules file not found") from exc
         except KeyError as exc:
             raise RulesError("Rules file malformed") from exc
+        # (col_or_jur, group_name, end_of_year) -> _RuleView
+        self._views = {}
+        self.record_stats = record_stats
+        # (rule_type, mnc, scope, source) -> RuleStats
+        self._stats = {}
+        # total time spent in lookups, in seconds (only if record_stats)
+        self.lookup_time = {"strict": 0.0, "regex": 0.0}
+        self.regex_time_budget = regex_time_budget
+        # (rule_type, mnc, scope, source) -> reason
+        self.skipped_rules = {}
+        # (rule_type, mnc, scope, source) -> time of its slowest match over the time budget, in seconds
+        self.slow_matches = {}
+        # snapshots (see `snapshot`) cannot be written to
+        self.read_only = False
+        self.__seed_std_colnames()
+        if self._store is None:
+            self.__check_regex_rules(self.__iterate_rules())
+            return
+        nb_inserted = self._store.insert_new(file_rules)
+        if nb_inserted:
+            logger.info("%s rules added to the rules store from the rules file.", nb_inserted)
+        self.refresh()
+        for rule_type, mnc, scope, source, rule in file_rules:
+            in_store = self.__get_rule(rule_type, mnc, scope, source)
+            if in_store != rule:
+                logger.warning(
+                    "Rule %s differs in the rules file (%r) and in the rules store (%r): the store's is used.",
+                    (rule_type, mnc, scope, source),
+                    rule,
+                    in_store,
+                )
     @property
     def column(self):
         return self._column
 
     def write(self, rules_file):
-        with open(rules_file, "w", encoding="utf-8") as json_file:
-            json.dump(self._all, json_file, indent=4)
+        """Writes the rules to a JSON file (with the rules from other processes, if backed by a store). The file is replaced at once, so that processes writing it concurrently cannot interleave their writes, nor leave it half-written."""
+        if self._store is not None:
+            self.refresh()
+            if os.path.abspath(rules_file) == os.path.abspath(self._store.path):
+                return  # every rule has already been committed to the store
+        directory = os.path.dirname(os.path.abspath(rules_file))
+        fd, tmp_path = tempfile.mkstemp(prefix=".rules-", suffix=".json", dir=directory)
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as json_file:
+                json.dump(self._all, json_file, indent=4)
+            if os.path.exists(rules_file):
+                shutil.copymode(rules_file, tmp_path)
+            else:
+                os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, rules_file)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def snapshot(self) -> "Rules":
+        """Read-only copy of the rules in effect (including the rules from other processes, if backed by a store), for worker processes: rules can be looked up but not written, and usage stats are not recorded."""
+        self.refresh()
+        snapshot = copy.deepcopy(self)
+        snapshot.read_only = True
+        snapshot.record_stats = False
+        return snapshot
+
+    def __getstate__(self) -> dict:
+        """Rules copied or sent to another process are detached from the store (an open SQLite connection)."""
+        state = self.__dict__.copy()
+        state["_store"] = None
+        return state
+
+    def refresh(self) -> None:
+        """Loads the rules written to the store (by this or other processes) since the last refresh. Does nothing if the rules are not backed by a store."""
+        if self._store is None:
+            return
+        changes = self._store.changes()
+        for rule_type, mnc, scope, source, rule in changes:
+            col_or_jur = "c" if rule_type == "column_rules" else "j"
+            self.__set_rule(col_or_jur, mnc, scope, source, rule)
+        self.__check_regex_rules(changes)
+
+    def regex_rule_problem(self, pattern: str) -> str | None:
+        """Returns why the regex should not be used as a rule (invalid, or too slow to match adversarial strings), None if it can be used."""
+        problem = regex_problem(pattern)
+        if problem:
+            return problem
+        warning = regex_warning(pattern)
+        if warning:
+            logger.warning("Regex %r: %s, probing it.", pattern, warning)
+        if warning or self.regex_time_budget:
+            return probe_regexes([pattern], self.regex_time_budget or PROBE_TIME_BUDGET).get(pattern)
+        return None
+
+    def __check_regex_rules(self, rules) -> None:
+        """Skips the regex rules (given as (rule_type, mnc, scope, source, rule)) that are invalid, or too slow to match adversarial strings. Only the rules that look prone to catastrophic backtracking are probed, unless a time budget is set."""
+        to_probe = {}
+        for rule_type, mnc, scope, source, _ in rules:
+            found = REGEX_RULE_RE.search(source)
+            if not found:
+                continue
+            problem = regex_problem(found.group(1))
+            if problem:
+                self.__skip_rule((rule_type, mnc, scope, source), problem)
+                continue
+            warning = regex_warning(found.group(1))
+            if warning:
+                logger.warning("Regex rule %s: %s, probing it.", (rule_type, mnc, scope, source), warning)
+            if warning or self.regex_time_budget:
+                to_probe.setdefault(found.group(1), []).append((rule_type, mnc, scope, source))
+        if to_probe:
+            over_budget = probe_regexes(list(to_probe), self.regex_time_budget or PROBE_TIME_BUDGET)
+            for pattern, problem in over_budget.items():
+                for key in to_probe[pattern]:
+                    self.__skip_rule(key, problem)
+
+    def __skip_rule(self, key, reason) -> None:
+        logger.warning("Skipping rule %s: %s", key, reason)
+        self.skipped_rules[key] = reason
+        self.__invalidate_views("c" if key[0] == "column_rules" else "j", key[1], key[2])
+
+    def __iterate_rules(self, all_rules: dict | None = None):
+        """Yields all rules (of `all_rules`, in the format of the rules file, if given) as (rule_type, mnc, scope, source, rule), as stored by RulesStore."""
+        all_rules = self._all if all_rules is None else all_rules
+        for rule_type in ["column_rules", "jurisdiction_rules"]:
+            for mnc, mnc_rules in all_rules[rule_type].items():
+                if mnc == "default":
+                    for source, rule in mnc_rules.items():
+                        yield (rule_type, mnc, "", source, rule)
+                    continue
+                for scope, scope_rules in mnc_rules.items():
+                    for source, rule in scope_rules.items():
+                        yield (rule_type, mnc, scope, source, rule)
+
+    def __get_rule(self, rule_type, mnc, scope, source):
+        """The rule as in the rule book, None if there is none."""
+        rules = self._all[rule_type].get(mnc, {})
+        return (rules if mnc == "default" else rules.get(scope, {})).get(source)
 
     def get_sink_from_strict(self, report: CbCReport, source: str, col_or_jur):
         """col is 'c', jur is 'j'.
         if sink not found, return None"""
         try:
-            return self.__get_rules(col_or_jur, "s", report).get(source)
+            view = self.__get_view(col_or_jur, report)
+            if not self.record_stats:
+                return view.strict.get(source)
+            t0 = time.perf_counter()
+            sink = view.strict.get(source)
+            self.lookup_time["strict"] += time.perf_counter() - t0
         except KeyError:
             return None
+        if sink is not None:
+            stats = self.__get_stats(col_or_jur, view, source)
+            stats.hits += 1
+            stats.last_matched_report = f"{report.group_name}_{report.end_of_year}"
+        return sink
 
     def get_sink_from_regex(self, report: CbCReport, source: str, col_or_jur):
         """if not applicable, return None"""
-        for source_rule, sink in self.__get_rules(col_or_jur, "r", report).items():
-            source_rule_compiled = re.compile(source_rule)
-            if re.match(source_rule_compiled, source):
+        view = self.__get_view(col_or_jur, report)
+        if not self.record_stats:
+            if not self.regex_time_budget:
+                return view.match_regex(source)
+            t0 = time.perf_counter()
+            sink = view.match_regex(source)
+            if time.perf_counter() - t0 > self.regex_time_budget:
+                self.__find_slow_rules(col_or_jur, view, source)
+            return sink
+        # rules are tried one by one (not with the combined matcher) so that time can be attributed to each rule.
+        for (source_rule_compiled, sink), source_rule in zip(view.regex, view.regex_sources):
+            t0 = time.perf_counter()
+            match = source_rule_compiled.match(source)
+            elapsed = time.perf_counter() - t0
+            stats = self.__get_stats(col_or_jur, view, source_rule)
+            stats.match_time += elapsed
+            self.lookup_time["regex"] += elapsed
+            if self.regex_time_budget and elapsed > self.regex_time_budget:
+                self.__disable_slow_rule(self.__rule_key(col_or_jur, view, source_rule), elapsed, source)
+            if match:
+                stats.hits += 1
+                stats.last_matched_report = f"{report.group_name}_{report.end_of_year}"
                 return sink
         return None
 
-    def __get_rules(self, col_or_jur, strict_or_regex, report: CbCReport):
+    def __find_slow_rules(self, col_or_jur, view: "_RuleView", source) -> None:
+        """The combined regex rules took longer than the time budget to match the source: times each rule on it, and disables those over budget."""
+        for (source_rule_compiled, _), source_rule in zip(view.regex, view.regex_sources):
+            t0 = time.perf_counter()
+            source_rule_compiled.match(source)
+            elapsed = time.perf_counter() - t0
+            if elapsed > self.regex_time_budget:
+                self.__disable_slow_rule(self.__rule_key(col_or_jur, view, source_rule), elapsed, source)
+
+    def __disable_slow_rule(self, key, elapsed, source) -> None:
+        """Skips, from now on, a regex rule that took longer than the time budget to match the source: the match being over, its result is still used."""
+        logger.warning(
+            "Regex rule %s took %.3fs to match %r... (%s characters)", key, elapsed, source[:50], len(source)
+        )
+        self.slow_matches[key] = max(elapsed, self.slow_matches.get(key, 0.0))
+        self.__skip_rule(key, f"took {elapsed:.3f}s to match a {len(source)} characters long name, over the time budget")
+
+    @staticmethod
+    def __rule_key(col_or_jur, view: "_RuleView", source) -> tuple:
+        mnc, scope = view.origins[source]
+        return ("column_rules" if col_or_jur == "c" else "jurisdiction_rules", mnc, scope, source)
+
+    def __get_stats(self, col_or_jur, view: "_RuleView", source) -> RuleStats:
+        key = self.__rule_key(col_or_jur, view, source)
+        try:
+            return self._stats[key]
+        except KeyError:
+            stats = self._stats[key] = RuleStats()
+            return stats
+
+    def resolve_many(self, report: CbCReport, names, col_or_jur) -> dict:
+        """Resolves each distinct name once: strict rules first, then (for columns) names that already are standard column names, then regex rules.
+        Returns {name : sink}, with None as the sink of names no rule applies to."""
+        resolved = {}
+        for name in dict.fromkeys(names):
+            sink = self.get_sink_from_strict(report, name, col_or_jur)
+            if (not sink) and (col_or_jur == "c") and self.is_std_colname(name.lower()):
+                sink = name.lower()
+            if not sink:
+                sink = self.get_sink_from_regex(report, name, col_or_jur)
+            resolved[name] = sink
+        return resolved
+
+    def __get_view(self, col_or_jur, report: CbCReport) -> "_RuleView":
+        """Returns the rules in effect for the report, building them only if no cached view exists.
+        Views are dropped by `write_new_rule` when a rule is written to a scope they depend on."""
+        key = (col_or_jur, report.group_name, report.end_of_year)
+        try:
+            return self._views[key]
+        except KeyError:
+            view = self._views[key] = _RuleView(self.__get_rules(col_or_jur, report))
+            return view
+
+    def __get_rules(self, col_or_jur, report: CbCReport) -> dict:
         """
         col_or_jur = `c` for columns, `j` for jurisdictions
-        strict_or_regex = `s` for strict, `r` for regex
         gets sink from objects with justifications
-        returns {regex_in_effect : X,
-                strict_in_effect : Z}
+        returns {source_in_effect : (sink, (mnc, scope) the rule comes from)}, regex rules still carrying the `_regex_` prefix.
         """
         rule_book = self._column if col_or_jur == "c" else self._jurisdiction
+        rule_type = "column_rules" if col_or_jur == "c" else "jurisdiction_rules"
         mnc = report.group_name
         year = report.end_of_year
 
@@ -69,23 +394,33 @@ class Rules:
             mne_rules = dict()
         try:
             # this prioritizes year, then mne then default.
-            rules_in_effect = {**default_all_files_rules, **mne_rules, **year_rules}
-            for k, v in rules_in_effect.items():
-                if isinstance(v, dict):
-                    rules_in_effect[k] = v["sink"]
-            strict, regex = partition(
-                lambda x: re.search(r"_regex_(.*)", x[0]), rules_in_effect.items()
-            )
-            regex_dict = dict(
-                (re.search(r"_regex_(.*)", x[0]).group(1), x[1]) for x in regex
-            )
-            return dict(strict) if strict_or_regex == "s" else regex_dict
-
+            rules_in_effect = {}
+            for origin, scope_rules in [
+                (("default", ""), default_all_files_rules),
+                ((mnc, "default"), mne_rules),
+                ((mnc, year), year_rules),
+            ]:
+                for k, v in scope_rules.items():
+                    if (rule_type, *origin, k) in self.skipped_rules:
+                        continue
+                    rules_in_effect[k] = (v["sink"] if isinstance(v, dict) else v, origin)
+            return rules_in_effect
         except Exception as excep:
             raise ValueError("Couldn't unify MNC rules. Fix 'rules.json'.") from excep
 
-    def get_std_colnames_from_rules(self):
-        # design decision: just return the IRS std columns?
+    def __invalidate_views(self, col_or_jur, mnc, scope) -> None:
+        """Drops the cached views that may be affected by a rule written in the given scope."""
+        if mnc == "default":
+            stale = [k for k in self._views if k[0] == col_or_jur]
+        elif scope == "default":
+            stale = [k for k in self._views if k[:2] == (col_or_jur, mnc)]
+        else:
+            stale = [(col_or_jur, mnc, scope)]
+        for key in stale:
+            self._views.pop(key, None)
+
+    def __seed_std_colnames(self) -> None:
+        """Collects the sinks of all column rules (and the IRS columns) - the standard column names."""
         def iterate_multidimensional(my_dict: dict):
             out = []
             for k, v in my_dict.items():
@@ -96,51 +431,62 @@ class Rules:
                     out.append(v)
             return out
 
-        IRS_columns = [
-            "unrelated_revenues",
-            "related_revenues",
-            "total_revenues",
-            "profit_before_tax",
-            "tax_paid",
-            "tax_accrued",
-            "stated_capital",
-            "accumulated_earnings",
-            "employees",
-            "tangible_assets",
-        ]
-        temp = set(IRS_columns + iterate_multidimensional(self._column))
-        temp.discard("to_drop")
-        out = list(temp)
-        out.sort()
-        return out
+        self._std_colnames = set(IRS_COLUMNS + iterate_multidimensional(self._column))
+        self._std_colnames.discard("to_drop")
+        self._std_colnames_sorted = None
+
+    def __add_std_colname(self, sink) -> None:
+        if sink != "to_drop" and sink not in self._std_colnames:
+            self._std_colnames.add(sink)
+            self._std_colnames_sorted = None
+
+    def is_std_colname(self, name: str) -> bool:
+        return name in self._std_colnames
+
+    def get_std_colnames_from_rules(self):
+        # design decision: just return the IRS std columns?
+        if self._std_colnames_sorted is None:
+            self._std_colnames_sorted = sorted(self._std_colnames)
+        return list(self._std_colnames_sorted)
 
     def write_new_rule(
         self, source, mode, sink, justification, col_or_jur: str, report: CbCReport
     ):
         """Note that column names would not be shown to operator if any rule applied. thus no overwriting possible."""
-        rule_set = self._column if col_or_jur == "c" else self._jurisdiction
+        if self.read_only:
+            raise RulesError(f"Rule for {source} not written: rules are a read-only snapshot.")
         company = report.group_name
         year = report.end_of_year
         pair = {"sink": sink, "justification": justification}
         if mode == "!":
             # overwriting.. should warn first
-            rule_set["default"][source] = pair
+            mnc, scope = "default", ""
         elif mode == "#":
-            try:
-                rule_set[company]["default"][source] = pair
-            except KeyError:
-                try:
-                    rule_set[company]["default"] = {source: pair}
-                except KeyError:
-                    rule_set[company] = {"default": {source: pair}}
+            mnc, scope = company, "default"
         elif mode == ".":
-            try:
-                rule_set[company][year][source] = pair
-            except KeyError:
-                try:
-                    rule_set[company][year] = {source: pair}
-                except KeyError:
-                    rule_set[company] = {year: {source: pair}}
+            mnc, scope = company, year
+        else:
+            return
+        found = REGEX_RULE_RE.search(source)
+        if found:
+            problem = self.regex_rule_problem(found.group(1))
+            if problem:
+                raise RulesError(f"Regex rule {source} not written: {problem}")
+        self.__set_rule(col_or_jur, mnc, scope, source, pair)
+        if self._store is not None:
+            rule_type = "column_rules" if col_or_jur == "c" else "jurisdiction_rules"
+            self._store.upsert(rule_type, mnc, scope, source, pair)
+
+    def __set_rule(self, col_or_jur, mnc, scope, source, rule) -> None:
+        """Writes a rule to the rule book and drops what was derived from the rules it may affect. `mnc` is 'default' for rules applicable to every report; `scope` is then ignored."""
+        rule_set = self._column if col_or_jur == "c" else self._jurisdiction
+        if mnc == "default":
+            rule_set.setdefault("default", {})[source] = rule
+        else:
+            rule_set.setdefault(mnc, {}).setdefault(scope, {})[source] = rule
+        self.__invalidate_views(col_or_jur, mnc, scope)
+        if col_or_jur == "c":
+            self.__add_std_colname(rule["sink"] if isinstance(rule, dict) else rule)
 
     def export_justifications_to_csv(self, path : str) -> None:
         """Exports all justifications to a csv file. These are collected from the rules.json file - which is automatically updated when the operator is prompted due to unknown column or jurisdiction names."""
@@ -162,3 +508,25 @@ class Rules:
         header = "type_of_rule, mnc, report_end_of_year, column_name_found, column_name_assigned, justification\n"
         with open(path, "w", encoding="utf-8") as f:
             f.write(header + "\n".join(extract_objects(self._all)))
+
+    def export_rule_stats_to_csv(self, path : str) -> None:
+        """Exports, for every rule, the number of times it applied, the last report it applied to and the time spent matching it (regex rules). Rules that never applied are included, with 0 hits. Requires `record_stats`."""
+        with open(path, "w", encoding="utf-8", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(
+                ["type_of_rule", "mnc", "report_end_of_year", "source", "sink", "hits", "last_matched_report", "match_time_s"]
+            )
+            for rule_type, mnc, scope, source, rule in self.__iterate_rules():
+                stats = self._stats.get((rule_type, mnc, scope, source), RuleStats())
+                writer.writerow(
+                    [
+                        rule_type,
+                        mnc,
+                        scope,
+                        source,
+                        rule["sink"] if isinstance(rule, dict) else rule,
+                        stats.hits,
+                        stats.last_matched_report,
+                        stats.match_time,
+                    ]
+                )
@@ -0,0 +1,100 @@
+"""This module contains the class RulesStore, a SQLite backend for the rules that can be shared by multiple extraction processes running concurrently. Each rule is upserted on its own (instead of rewriting the whole rules file) and each process can fetch only the rules written by the others since it last looked. The JSON rules file remains the format for review and diffing (see `Rules.write`)."""
+import json
+import sqlite3
+
+__all__ = ["RulesStore"]
+
+
+class RulesStore:
+    """Rules kept in a SQLite database in WAL mode, so that readers never block the (serialized) writers.
+    A rule is located as in the JSON rules file: rule type (`column_rules` or `jurisdiction_rules`), MNC (`default` for rules applicable to all reports), scope (`default` or the end of year; empty for rules applicable to all reports) and source. Every write gets a version number higher than all previous ones, which is what allows for cheap reloads of the changed rules."""
+
+    def __init__(self, path: str, timeout: float = 60) -> None:
+        self.path = path
+        # autocommit mode: transactions are explicit (see `upsert_many`).
+        self._connection = sqlite3.connect(path, timeout=timeout, isolation_level=None)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(
+            """CREATE TABLE IF NOT EXISTS rules (
+                id INTEGER PRIMARY KEY,
+                rule_type TEXT NOT NULL,
+                mnc TEXT NOT NULL,
+                scope TEXT NOT NULL,
+                source TEXT NOT NULL,
+                rule TEXT NOT NULL,
+                version INTEGER NOT NULL,
+                UNIQUE (rule_type, mnc, scope, source)
+            )"""
+        )
+        self._connection.execute(
+            "CREATE INDEX IF NOT EXISTS rules_by_version ON rules (version)"
+        )
+        self.last_version = 0
+
+    def insert_new(self, rules) -> int:
+        """Inserts the rules, given as (rule_type, mnc, scope, source, rule) tuples, that are not in the store yet, leaving the others as they are, in a single transaction. Returns the number of rules inserted."""
+        cursor = self._connection.cursor()
+        cursor.execute("BEGIN IMMEDIATE")
+        try:
+            (version,) = cursor.execute(
+                "SELECT COALESCE(MAX(version), 0) + 1 FROM rules"
+            ).fetchone()
+            cursor.executemany(
+                """INSERT OR IGNORE INTO rules (rule_type, mnc, scope, source, rule, version)
+                VALUES (?, ?, ?, ?, ?, ?)""",
+                [
+                    (rule_type, mnc, scope, source, json.dumps(rule), version)
+                    for rule_type, mnc, scope, source, rule in rules
+                ],
+            )
+            nb_inserted = cursor.rowcount
+        except Exception:
+            cursor.execute("ROLLBACK")
+            raise
+        cursor.execute("COMMIT")
+        return nb_inserted
+
+    def upsert(self, rule_type: str, mnc: str, scope: str, source: str, rule) -> None:
+        self.upsert_many([(rule_type, mnc, scope, source, rule)])
+
+    def upsert_many(self, rules) -> None:
+        """Inserts (or overwrites) the rules, given as (rule_type, mnc, scope, source, rule) tuples, in a single transaction."""
+        cursor = self._connection.cursor()
+        # IMMEDIATE takes the write lock right away, so versions are handed out in commit order.
+        cursor.execute("BEGIN IMMEDIATE")
+        try:
+            (version,) = cursor.execute(
+                "SELECT COALESCE(MAX(version), 0) + 1 FROM rules"
+            ).fetchone()
+            cursor.executemany(
+                """INSERT INTO rules (rule_type, mnc, scope, source, rule, version)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT (rule_type, mnc, scope, source)
+                DO UPDATE SET rule = excluded.rule, version = excluded.version""",
+                [
+                    (rule_type, mnc, scope, source, json.dumps(rule), version)
+                    for rule_type, mnc, scope, source, rule in rules
+                ],
+            )
+        except Exception:
+            cursor.execute("ROLLBACK")
+            raise
+        cursor.execute("COMMIT")
+
+    def changes(self) -> list[tuple]:
+        """Returns the rules written (by any process) since the last call, as (rule_type, mnc, scope, source, rule) tuples.
+        Rules come in the order they were first inserted - the order of the JSON rules file, which sets the priority among regex rules."""
+        rows = self._connection.execute(
+            """SELECT rule_type, mnc, scope, source, rule, version FROM rules
+            WHERE version > ? ORDER BY id""",
+            (self.last_version,),
+        ).fetchall()
+        if rows:
+            self.last_version = max(row[-1] for row in rows)
+        return [
+            (rule_type, mnc, scope, source, json.loads(rule))
+            for rule_type, mnc, scope, source, rule, _ in rows
+        ]
+
+    def close(self) -> None:
+        self._connection.close()
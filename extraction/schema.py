@@ -0,0 +1,113 @@
+"""This module declares the dtypes of the standardized tables. The report's metadata (group name, parent entity, end of year, currency, sectors...) is the same for all the rows of a report and jurisdictions repeat across reports: they are categoricals, so that each distinct string is stored once. Integer columns use the smallest nullable integer dtype that holds their values.
+Raw extracted tables (before standardization) hold strings only: they are stored in RAW_STRING_DTYPE, backed by pyarrow (one buffer of characters per column instead of one Python object per cell). pyarrow is in the requirements; without it, RAW_STRING_DTYPE falls back to pandas' own string dtype, which holds the same values."""
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+__all__ = [
+    "apply_output_schema",
+    "read_standardized_csv",
+    "concat_standardized",
+    "repeat_category",
+    "as_raw_strings",
+    "RAW_STRING_DTYPE",
+]
+
+try:
+    import pyarrow  # noqa: F401
+except ImportError:  # e.g. an environment not installed from the requirements
+    RAW_STRING_DTYPE = pd.StringDtype("python")
+else:
+    RAW_STRING_DTYPE = pd.StringDtype("pyarrow")
+
+CATEGORICAL_COLUMNS = [
+    "group_name",
+    "parent_entity",
+    "end_of_year",
+    "currency",
+    "parent_entity_jurisdiction",
+    "parent_entity_nace2_core_code",
+    "parent_entity_nace2_main",
+    "parent_entity_bvd_sector",
+    "jurisdiction",
+]
+# dtypes when reading standardized tables back (numeric columns are made compact once read). Jurisdictions are read as strings, as rules may still be applied to them.
+READ_DTYPES = {
+    **{column: "category" for column in CATEGORICAL_COLUMNS if column != "jurisdiction"},
+    "jurisdiction": "str",
+}
+NULLABLE_INTEGER_DTYPES = ["Int8", "Int16", "Int32", "Int64"]
+
+
+def repeat_category(value, n: int) -> pd.Categorical:
+    """`value` repeated n times, as a categorical: n small codes instead of n references to the value."""
+    return pd.Categorical.from_codes(np.zeros(n, dtype=np.int8), categories=[value])
+
+
+def as_raw_strings(df: pd.DataFrame) -> pd.DataFrame:
+    """An extracted table with all its cells as strings, in RAW_STRING_DTYPE. Missing cells are "nan", as with `astype(str)`."""
+    return df.fillna("nan").astype(RAW_STRING_DTYPE)
+
+
+def compact_integers(values: pd.Series, integral_floats=False) -> pd.Series:
+    """Integer columns (and float columns with integral values only, if `integral_floats`) in the smallest nullable integer dtype that holds their values. Other columns are returned as they are."""
+    if pd.api.types.is_integer_dtype(values.dtype):
+        pass
+    elif integral_floats and pd.api.types.is_float_dtype(values.dtype):
+        finite = values.dropna().to_numpy(dtype="float64")
+        if not (
+            np.isfinite(finite).all()
+            and (finite == np.round(finite)).all()
+            and (np.abs(finite) < 2**63).all()
+        ):
+            return values
+    else:
+        return values
+    if values.isna().all():
+        return values.astype("Int8")
+    low, high = values.min(), values.max()
+    for dtype in NULLABLE_INTEGER_DTYPES:
+        info = np.iinfo(dtype.lower())
+        if info.min <= low and high <= info.max:
+            return values.astype(dtype)
+    return values
+
+
+def apply_output_schema(
+    df: pd.DataFrame, integral_floats=False, categorical_columns=CATEGORICAL_COLUMNS
+) -> None:
+    """In-place. Metadata and jurisdiction columns become categoricals and integer columns are made compact (see `compact_integers`)."""
+    for column in df.columns:
+        if column in categorical_columns:
+            if not isinstance(df[column].dtype, pd.CategoricalDtype):
+                df[column] = df[column].astype("category")
+        else:
+            df[column] = compact_integers(df[column], integral_floats)
+
+
+def read_standardized_csv(path: str) -> pd.DataFrame:
+    """Reads a standardized table (as written by `extract_all_reports`) with the declared dtypes. CSV has no nullable integers: float columns with integral values only are read as integers."""
+    df = pd.read_csv(path, dtype=READ_DTYPES)
+    apply_output_schema(
+        df,
+        integral_floats=True,
+        categorical_columns=[column for column, dtype in READ_DTYPES.items() if dtype == "category"],
+    )
+    return df
+
+
+def concat_standardized(dfs: list[pd.DataFrame]) -> pd.DataFrame:
+    """Concatenates standardized tables, keeping categorical columns categorical (categories are united) and integer columns compact."""
+    dfs = [df.copy(deep=False) for df in dfs]
+    for column in CATEGORICAL_COLUMNS:
+        with_column = [df for df in dfs if column in df.columns]
+        if not with_column:
+            continue
+        categories = union_categoricals(
+            [pd.Categorical(df[column]) for df in with_column], ignore_order=True
+        ).categories
+        for df in with_column:
+            df[column] = pd.Categorical(df[column], categories=categories)
+    out = pd.concat(dfs, ignore_index=True)
+    apply_output_schema(out)
+    return out
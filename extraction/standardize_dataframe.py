@@ -1,6 +1,5 @@
-import functools
-import itertools
 import re
+from collections.abc import Iterator
 from itertools import filterfalse
 
 import numpy as np
@@ -8,19 +7,24 @@ import pandas as pd
 from .cbc_report import CbCReport
 from .exceptions import IncompatibleTables, NoCbCReportFound, StandardizationError
 from .log import logger
+from .numeric_cells import (
+    parse_numeric_column,
+    percentages_to_numbers,
+    percentages_to_rationals,
+    scale_column,
+)
+from .operator_prompts import prompt_common, prompt_text_col, prompt_text_jurisdiction
+from .review_queue import ReviewQueue
 from .rules import Rules
+from .schema import apply_output_schema, repeat_category
+from .table_profile import CbCR_terms_counts, TableProfile, country_mask
 from .utils import (
-    CBCR_TERMS,
-    CONTRY_TO_ISO3166_MAPPING,
-    DOUBLE_DIGITS,
-    ETR_FORMAT_RE,
     EXCHANGE_RATES,
     ISO3166_ALPHA3,
-    NOT_NUMERIC_CHARS_RE,
-    PERCENTAGE_FORMAT_RE,
+    MONTHLY_RATES,
     YEAR_REGEX,
-    jurisdiction_to_iso3166,
-    neatify,
+    jurisdictions_to_iso3166,
+    neatify_series,
 )
 
 
@@ -36,177 +40,149 @@ def trim_dataframe(df: pd.DataFrame):
 def apply_rules_to_rows(df: pd.DataFrame, report: CbCReport, rules: Rules) -> None:
     """In-place. Applies strict rules, then regex rules and allows ISO3166-1 alpha-3 codes. Otherwise the jurisdiction name is appended with `_tocheck`"""
     try:
-        df.jurisdiction = df.jurisdiction.apply(jurisdiction_to_iso3166)
+        df.jurisdiction = jurisdictions_to_iso3166(df.jurisdiction)
     except AttributeError as exc:
         raise StandardizationError("jurisdiction column not found") from exc
     old_new_correspondence = {}
-    for jur_name in df["jurisdiction"]:
-        sink = rules.get_sink_from_strict(report, jur_name, "j")
+    for jur_name, sink in rules.resolve_many(report, df["jurisdiction"], "j").items():
         if sink:
             old_new_correspondence[jur_name] = sink
-        else:
-            sink = rules.get_sink_from_regex(report, jur_name, "j")
-            if sink:
-                old_new_correspondence[jur_name] = sink
-        if (jur_name not in ISO3166_ALPHA3) and not sink:
+        elif jur_name not in ISO3166_ALPHA3:
             old_new_correspondence[jur_name] = f"{jur_name}_tocheck"
     df.jurisdiction = df["jurisdiction"].map(lambda x: old_new_correspondence.get(x, x))
 
 
+def _lazy_chunks(
+    smtg: str | pd.Series | pd.DataFrame, stop_at
+) -> Iterator[str | pd.Series | pd.DataFrame]:
+    """With `stop_at`, DataFrames are counted column by column so that counting can stop early."""
+    if stop_at and isinstance(smtg, pd.DataFrame):
+        for _, column in smtg.items():
+            yield column
+    else:
+        yield smtg
+
+
 def count_countries(
     smtg: str | pd.Series | pd.DataFrame, include_continents=False, stop_at=None
 ) -> int:
-    """Lazily (by column) count the number of countries in a string, Series or DataFrame."""
+    """Lazily (by column) count the number of countries in a string, Series or DataFrame. The count stops at `stop_at`."""
     total = 0
-    if isinstance(smtg, pd.DataFrame):
-        iterator = itertools.chain.from_iterable((column for _, column in smtg.items()))
-    elif isinstance(smtg, pd.Series):
-        iterator = smtg
-    else:
-        iterator = [smtg]
-    for cell in iterator:
-        if (
-            cell.upper() in ISO3166_ALPHA3
-            or (
-                cell.upper() in ["AFRICA", "EUROPE", "AMERICA", "ASIA", "NORTH AMERICA"]
-                if include_continents
-                else False
-            )
-            or CONTRY_TO_ISO3166_MAPPING.get(neatify(cell), "")
-        ):
-            total += 1
+    for chunk in _lazy_chunks(smtg, stop_at):
+        total += int(country_mask(chunk, include_continents).sum())
         if stop_at and total >= stop_at:
-            break
+            return stop_at
     return total
 
 
 def count_CbCR_terms(
     smtg: str | pd.Series | pd.DataFrame, stop_at=None, casefold=True
 ) -> int:
-    """Lazily (by row) count the number of CBCR terms in a string."""
-    pattern = "|".join(
-        r"\b{}".format(word) for word in CBCR_TERMS
-    )  # no break after word (to account for superscripts)
+    """Lazily (by column) count the number of CBCR terms in a string, Series or DataFrame. The count stops at `stop_at`."""
     counter = 0
-    if isinstance(smtg, pd.DataFrame):
-        iterator = itertools.chain.from_iterable((row for _, row in smtg.iterrows()))
-    elif isinstance(smtg, pd.Series):
-        iterator = smtg
-    else:
-        iterator = [smtg]
-    for cell in iterator:
-        if casefold:
-            cell = cell.casefold()
-        for _ in re.finditer(pattern, str(cell)):
-            counter += 1
-            if stop_at and counter >= stop_at:
-                break
+    for chunk in _lazy_chunks(smtg, stop_at):
+        counter += int(CbCR_terms_counts(chunk, casefold).sum())
+        if stop_at and counter >= stop_at:
+            return stop_at
     return counter
 
 
-def unify_CbCR_tables(dfs: list[pd.DataFrame], report: CbCReport) -> pd.DataFrame:
+def unify_CbCR_tables(
+    dfs: list[pd.DataFrame], report: CbCReport, return_profile=False
+) -> pd.DataFrame | tuple[pd.DataFrame, TableProfile]:
     """Attempts to concatenate the potentially multiple tables that comprise the report.
     Before doing so, it will attempt to have observations as rows.
-    The head of the table will be set as the Index of the Dataframe."""
+    The head of the table will be set as the Index of the Dataframe.
+    With `return_profile`, the TableProfile of the concatenated table (built from the profiles of the tables) is returned along with it."""
 
-    def untangle_df_head(df: pd.DataFrame, report: CbCReport) -> pd.DataFrame:
-        """Takes the column names out of the table area and puts them as such. Fails if anonymous columns"""
+    def untangle_df_head(
+        df: pd.DataFrame, profile: TableProfile, report: CbCReport
+    ) -> tuple[pd.DataFrame, int]:
+        """Takes the column names out of the table area and puts them as such. Fails if anonymous columns. Returns the table and the position of its first row of data."""
         # if more than 2 cells have numbers 2 digits, assume it is within the table
         # TODO: better filtering
-        header_last_index = -1
         # it CAN be that first row is already data - tables in second pages or so.
-        index = 0
-        for index, (_, row) in enumerate(df.iterrows()):
-            if (
-                row.map(lambda x: int(bool(DOUBLE_DIGITS.search(x)))).sum()
-                >= report.min_nb_cols
-            ):
-                break
-            header_last_index = index
+        index = profile.first_row_with_numbers(report.min_nb_cols)
+        if index is None:  # only the last row is kept, as data
+            index = max(len(df) - 1, 0)
+            has_head = len(df) > 0
+        else:
+            has_head = index > 0
 
         out_df = df.iloc[index:]  # from index on (inclusively) there is data
-        if (
-            header_last_index != -1
-        ):  # no row appears to contain colnames - which can be fine!
-            neat_colnames = []
-            for _, cells in df.iloc[:index].items():
-                # separate cells with spaces
-                single_cell = " ".join(filter(lambda x: x != "nan", cells))
-                # remove non-word chars and uniform whitespace
-                neat_col_name = neatify(single_cell)
-                neat_colnames.append(neat_col_name)
-            out_df.columns = neat_colnames
-        return out_df
-
-    def not_CbCR_table(df: pd.DataFrame, report: CbCReport) -> bool:
+        if has_head:  # no row appears to contain colnames - which can be fine!
+            # separate cells with spaces: "a b c" is "a " + "b " + "c " without the last space
+            head = df.iloc[:index].to_numpy(dtype=object)
+            with_spaces = np.where(head != "nan", head + " ", "")
+            single_cells = (
+                pd.Series(with_spaces.sum(axis=0), dtype=object).str[:-1]
+                if index
+                else pd.Series("", index=range(df.shape[1]), dtype=object)
+            )
+            # remove non-word chars and uniform whitespace
+            out_df.columns = neatify_series(single_cells).tolist()
+        return out_df, index
+
+    def not_CbCR_table(df: pd.DataFrame, profile: TableProfile, report: CbCReport) -> bool:
         """Identifies if a table is unlikely to a CbCR table, due to being too small, having too few countries or too few CbCR terms."""
         nb_rows, nb_cols = df.shape
         too_small = (
             True if nb_cols < report.min_nb_cols else False
         )  # could add rows but nb_jurisdictions is a good enough proxy?
-        total_country_cells = count_countries(
-            df, include_continents=True, stop_at=report.min_nb_jurs_per_table
-        )
-        nb_cbcr_terms = count_CbCR_terms(df, stop_at=report.min_nb_terms)
         too_few_countries = (
-            True if total_country_cells < report.min_nb_jurs_per_table else False
+            True if profile.nb_countries < report.min_nb_jurs_per_table else False
         )
-        too_few_CbCR_terms = True if nb_cbcr_terms < report.min_nb_terms else False
+        too_few_CbCR_terms = True if profile.nb_terms < report.min_nb_terms else False
         logger.info(
             "nb_countries: %s \nnb_CbCR_terms: %s \nnv_rows: %s \nnb_cols: %s",
-            total_country_cells,
-            nb_cbcr_terms,
+            profile.nb_countries,
+            profile.nb_terms,
             nb_rows,
             nb_cols,
         )
         return too_small or too_few_CbCR_terms or too_few_countries
 
-    def orient_tables(dfs: list[pd.DataFrame], report: CbCReport) -> list[pd.DataFrame]:
-        """Rotates the tables if they have observations as columns instead of rows."""
-
-        def is_transposed(df: pd.DataFrame, report: CbCReport) -> bool:
-            for _, row in df.items():
-                if (
-                    count_countries(
-                        row,
-                        include_continents=True,
-                        stop_at=report.min_nb_jurs_per_table,
-                    )
-                    >= report.min_nb_jurs_per_table
-                ):
-                    return False
-            for _, row in df.iterrows():
-                # if count_CbCR_terms(column) >= report.min_nb_cols:
-                #     return False
-                if (
-                    count_countries(
-                        row,
-                        include_continents=True,
-                        stop_at=report.min_nb_jurs_per_table,
-                    )
-                    >= report.min_nb_jurs_per_table
-                ):
-                    return True
+    def orient_tables(
+        dfs: list[pd.DataFrame], profiles: list[TableProfile], report: CbCReport
+    ) -> tuple[list[pd.DataFrame], list[TableProfile]]:
+        """Rotates the tables (and their profiles) if they have observations as columns instead of rows."""
+
+        def is_transposed(profile: TableProfile, report: CbCReport) -> bool:
+            if profile.columns_with_countries(report.min_nb_jurs_per_table).size:
+                return False
+            if profile.rows_with_countries(report.min_nb_jurs_per_table).size:
+                return True
             raise NoCbCReportFound("\nCan't tell whether transposed.\n")
 
         try:
-            if is_transposed(dfs[0], report):
+            if is_transposed(profiles[0], report):
                 logger.info("TRANSPOSing!")
-                return list(map(pd.DataFrame.transpose, dfs))
+                return (
+                    list(map(pd.DataFrame.transpose, dfs)),
+                    list(map(TableProfile.transpose, profiles)),
+                )
             else:
                 logger.info("no transposition.")
-                return dfs
+                return dfs, profiles
         except IndexError as exc:
             raise NoCbCReportFound("No tables to unify after CbCR filtering") from exc
 
     if not dfs:
         raise NoCbCReportFound("No tables to unify - must have not passed CbCR test")
     else:
-        cbcr_tables = list(
-            filterfalse(lambda table: not_CbCR_table(table, report=report), dfs)
-        )
-        dfs_oriented = orient_tables(cbcr_tables, report)
-        untangled_dfs = list(map(lambda x: untangle_df_head(x, report), dfs_oriented))
+        # each table is scanned once: all the decisions below are taken from the profiles
+        cbcr_tables, cbcr_profiles = [], []
+        for table in dfs:
+            profile = TableProfile.of(table)
+            if not not_CbCR_table(table, profile, report=report):
+                cbcr_tables.append(table)
+                cbcr_profiles.append(profile)
+        dfs_oriented, profiles_oriented = orient_tables(cbcr_tables, cbcr_profiles, report)
+        untangled_dfs, untangled_profiles = [], []
+        for df, profile in zip(dfs_oriented, profiles_oriented):
+            untangled_df, first_data_row = untangle_df_head(df, profile, report)
+            untangled_dfs.append(untangled_df)
+            untangled_profiles.append(profile.rows_from(first_data_row))
         for df in untangled_dfs:
             try:
                 df.columns = untangled_dfs[0].columns
@@ -217,52 +193,46 @@ def unify_CbCR_tables(dfs: list[pd.DataFrame], report: CbCReport) -> pd.DataFram
 
         # ignore_index = TRUE >> do not use the index values along the concatenation axis. The resulting axis will be labeled 0, …, n - 1.
         # this ignore_index param is important for the handling of percentages. More importantly, it makes sense.
-        return pd.concat(untangled_dfs, ignore_index=True)
+        unified_df = pd.concat(untangled_dfs, ignore_index=True)
+        if return_profile:
+            return unified_df, TableProfile.concat(untangled_profiles)
+        return unified_df
 
 
 def standardize_dataframe(
-    operator_wont_intervene: bool, df: pd.DataFrame, report: CbCReport, rules: Rules
+    operator_wont_intervene: bool,
+    df: pd.DataFrame,
+    report: CbCReport,
+    rules: Rules,
+    profile: TableProfile | None = None,
+    review_queue: ReviewQueue | None = None,
 ) -> bool:
     """Standardizes the DataFrame in-place. Makes column names and jurisdiction codes standard (jurisdictions according to ISO3166) and adds metadata to the DataFrames (company name, time interval covered, company's sectors and HQ country, etc.). Returns a flag indicating whether the operator may be further prompted to intervene.
-    When standardization requires the operator's input, the function blocks and prompts the user."""
+    When standardization requires the operator's input, the function blocks and prompts the user. `profile` is the TableProfile of the DataFrame, as returned by `unify_CbCR_tables`; it is computed when needed otherwise.
+    With a `review_queue`, the operator is never prompted: names that no rule applies to are added to the queue (see `ReviewQueue.add`) and keep their `_tocheck` flag."""
 
     def apply_rules_to_columns(df: pd.DataFrame, report: CbCReport, rules: Rules):
         """Tries to standardize names of the columns. Works in-place."""
         # jurisdiction will be automatically assigned so no problem with calling df.jurisdiction before user's intervention
         def find_jurisdiction_location() -> int:
             """finds index of column with jurisdictions. Raises an error if there are multiple columns with jurisdictions or if there are no columns with jurisdictions."""
-            pos = -1
-            for i, (_, values) in enumerate(df.items()):
-                if (
-                    count_countries(
-                        values,
-                        include_continents=True,
-                        stop_at=report.min_nb_jurs_per_table,
-                    )
-                    >= report.min_nb_jurs_per_table
-                ):
-                    if pos != -1:
-                        raise StandardizationError("Multiple columns w/ jurisdictions.")
-                    pos = i
-            if pos == -1:
+            positions = (profile or TableProfile.of(df)).columns_with_countries(
+                report.min_nb_jurs_per_table
+            )
+            if len(positions) > 1:
+                raise StandardizationError("Multiple columns w/ jurisdictions.")
+            if len(positions) == 0:
                 raise StandardizationError("No column w/ enough country names.")
-            else:
-                return pos
+            return int(positions[0])
 
         columns_to_be = []
-        std_colnames_from_rules = rules.get_std_colnames_from_rules()
         column_names = df.columns
+        # strict rules, then already std column names, then regex rules
+        std_names = rules.resolve_many(report, column_names, "c")
         for i, column_name in enumerate(
             column_names
         ):  # enumerate so that we can distinguish between columns with the same name (e.g. empty string)
-            # 1st priority: a strict rule that applies to the column name
-            std_name = rules.get_sink_from_strict(report, column_name, "c")
-            # 2nd priority: an already std column name
-            if (not std_name) and (column_name.lower() in std_colnames_from_rules):
-                std_name = column_name.lower()
-            # 3rd priority: a regex rule that applies to the column name
-            if not std_name:
-                std_name = rules.get_sink_from_regex(report, column_name, "c")
+            std_name = std_names[column_name]
 
             # important to do it here as the to_drop may come from the rules
             if std_name == "to_drop":
@@ -324,87 +294,6 @@ def standardize_dataframe(
             df["jurisdiction"] = df["jurisdiction"].map(lambda x: jur_subs.get(x, x))
             logger.debug(df.head())
 
-        def prompt_common(source, default_options, prompt_text):
-            """
-            rule_set will be changed while this function runs.()
-            """
-            while True:
-                answer = input(prompt_text)
-                if answer.casefold() == "r":
-                    source = input(
-                        "Write your source regex (as you would in python):\n"
-                    )
-                    source = f"_regex_{source}"
-                    sink = input("Write your sink:\n")
-                    mode = input("Write the mode for the rule ('!','#' or '.'):\n")
-                elif answer.casefold() == "q":
-                    return ("", "quit", "")
-                else:
-                    try:
-                        match = re.match(r"(.*?)([!#\.])(.*)", answer)
-                        mode = match.group(2) if match.group(2) else ""
-                        choice = match.group(1)
-                        justification = (
-                            match.group(3) if match.group(3) else "<no justification>"
-                        )
-                    except AttributeError:
-                        continue
-                    sink = default_options[int(choice)] if choice.isdigit() else choice
-                confirm = input(
-                    f'Assign "{source}" to "{sink}" in mode {mode}? Justification: "{justification}".\n(y/n)'
-                )
-                if (confirm in ["y", "Y"]) and (mode in ["#", ".", "!"]):
-                    return (mode, sink, justification)
-
-        def prompt_text_col(odd_name, filename, col_dict: dict):
-            substring = "\n".join([f"{n} -> {name}" for n, name in col_dict.items()])
-            return f"""
-    Unknown column name found. Select a standard column name.
-    Instructions:
-    "q" to stop updating rules for the whole iteration.
-    "0" to delete this column.
-    "1" to leave as is.
-    "r" to create regex rule.
-    To assign new standard column:
-    Write the column name in snake_case (recommended) or choose a number from the list.
-    Then, append one of the following:
-        "!" to your option to make it a rule for every CbCR report. eg. 1!
-        "#" to make it a rule at the MNC level. eg: 2#
-        "." to make it a one-time rule. eg: 3.
-    Optionally, write a justification for the rule after the !/#/.  
-    Finalize by pressing ENTER.
-
-    Unknown column name: {odd_name}
-    File: {filename}
-    Default options:
-    {substring}
-    """
-
-        def prompt_text_jurisdiction(new_name, filename, jurisdiction_dict: dict):
-            substring = "\n\n".join(
-                [f"{n} -> {name}" for n, name in jurisdiction_dict.items()]
-            )
-            return f"""Select a standard jurisdiction name or press enter to leave it as is.
-    Instructions:
-
-    Write "r" to create a regex rule.
-    Choose "0" to keep jurisdiction name as is.
-    Choose "1" to delete this row.
-    Choose "2" for "other" - the chosen default for this DB.
-    To assign new jurisdiction name, write its ISO 3166-1 alpha-3 code (recommended).
-    Append "!" to your option to make it a rule for every CbCR report. eg. 1!
-    Append "#" to make it a rule at the MNC level. eg: 2#
-    Append "." to make it a one-time rule. eg: 3.
-    Optionally, write a justification for the rule after the !/#/.  
-    Write Q to stop updating rules for the whole iteration.
-    Then, press ENTER.
-
-    Unidentified jurisdiction name: {new_name}
-    File: {filename}
-    Options:
-    {substring}
-    """
-
         human_bored = False
         col_subs = {}
         jur_subs = {}
@@ -419,8 +308,10 @@ def standardize_dataframe(
             prompt_text = prompt_text_col(
                 source, f"{report.group_name}_{report.end_of_year}", col_dict
             )
-            mode, sink, justification = prompt_common(source, col_dict, prompt_text)
-            rules.write_new_rule(source, mode, sink, justification, "c", report)
+            mode, rule_source, sink, justification = prompt_common(
+                rules, source, col_dict, prompt_text
+            )
+            rules.write_new_rule(rule_source, mode, sink, justification, "c", report)
             if sink == "quit":
                 human_bored = True
                 return (col_subs, jur_subs, human_bored)
@@ -435,10 +326,10 @@ def standardize_dataframe(
             prompt_text = prompt_text_jurisdiction(
                 source, f"{report.group_name}_{report.end_of_year}", jurisdiction_dict
             )
-            mode, sink, justification = prompt_common(
-                source, jurisdiction_dict, prompt_text
+            mode, rule_source, sink, justification = prompt_common(
+                rules, source, jurisdiction_dict, prompt_text
             )
-            rules.write_new_rule(source, mode, sink, justification, "j", report)
+            rules.write_new_rule(rule_source, mode, sink, justification, "j", report)
             if sink == "quit":
                 human_bored = True
                 break
@@ -453,53 +344,26 @@ def standardize_dataframe(
         Adds report metadata (multinational's name, time-frame, sectoral info, currency, etc.)."""
 
         def handle_etr(df: pd.DataFrame):
-            def percentage_to_rational(x):
-                return float(
-                    ETR_FORMAT_RE.search(
-                        re.sub(",", ".", NOT_NUMERIC_CHARS_RE.sub("", str(x)))
-                    ).group(1)
-                    / 100
-                )
-
             try:
-                df.effective_tax_rate = df.effective_tax_rate.apply(
-                    percentage_to_rational
-                )
-            except (KeyError, AttributeError, TypeError) as exception:
+                df.effective_tax_rate = percentages_to_rationals(df.effective_tax_rate)
+            except (KeyError, AttributeError) as exception:
                 # debug
                 logger.warning(exception, exc_info=True)
-            except Exception as exception:
-                logger.error(exception, exc_info=True)
-                raise ValueError(f"{exception} from handle ETR") from exception
 
         def handle_percentages(df: pd.DataFrame):
-            def percentage_to_number(x):
-                try:
-                    z = (
-                        float(
-                            PERCENTAGE_FORMAT_RE.search(
-                                re.sub(",", ".", NOT_NUMERIC_CHARS_RE.sub("", str(x)))
-                            ).group(1)
-                        )
-                        / 100
-                    )
-                except AttributeError:
-                    z = -1
-                return z
-
             try:
                 totals = df["total_revenues"]
             except KeyError:
                 logger.info("No total_revenue column")
             else:
                 try:
-                    percentages = df["unrelated_revenues"].apply(percentage_to_number)
+                    percentages = percentages_to_numbers(df["unrelated_revenues"])
                     if any(percentages > 0):
                         df["unrelated_revenues"] = totals * percentages
                 except (KeyError) as e:
                     logger.warning(e, exc_info=True)
                 try:
-                    percentages = df["related_revenues"].apply(percentage_to_number)
+                    percentages = percentages_to_numbers(df["related_revenues"])
                     if any(percentages > 0):
                         df["related_revenues"] = totals * percentages
                 except (KeyError) as e:
@@ -507,56 +371,14 @@ def standardize_dataframe(
 
         def cell_basic_conversion(df: pd.DataFrame):
             """This works inplace
-            Takes out commas, replaces parenthesis by a minus sign and transforms strings into numbers.
-
-            come back to this and do it better
+            Takes out commas, replaces parenthesis by a minus sign and transforms strings into numbers (see `numeric_cells`).
             """
-
-            def clean_commas_dots_space(x):
-                m = re.match(
-                    r"(.*?)([\., ]\d{3})([\., ]\d{3})?([\., ]\d{3})?([\., ]\d{3})?(.*)",
-                    x,
-                )
-                if m:
-                    return "".join(
-                        [
-                            re.sub("[,. ]", "", x)
-                            for x in m.groups()[:-1]
-                            if isinstance(x, str)
-                        ]
-                        + [m.groups()[-1]]
-                    )
-                return x
-
-            def replace_brackets(x):
-                m = re.match(r"\((.*)\)", x)  # no-lint
-                if m:
-                    return "-" + m.group(1)
-                return x
-
-            def compose(*functions):
-                """this is composition as normal in mathematics, not R's pipe! compose(f,g) means `f . g `"""
-                return functools.reduce(
-                    lambda f, g: lambda x: f(g(x)), functions, lambda x: x
-                )
-
-            eliminate_non_numeric_chars = compose(
-                replace_brackets,
-                lambda x: re.sub(r"<s>.*?</s>", "", x),
-                clean_commas_dots_space,
-                lambda x: re.sub(r",", r".", x),
-                lambda x: "" if x == "-" else x,
-                lambda x: NOT_NUMERIC_CHARS_RE.sub("", x),
-            )
-
             safe_to_coerce = pd.DataFrame(df).drop(
                 ["jurisdiction", "commentary", "main_activities"],
                 axis="columns",
                 errors="ignore",
             )
-            newdf = safe_to_coerce.applymap(eliminate_non_numeric_chars).apply(
-                pd.to_numeric, errors="ignore"
-            )
+            newdf = safe_to_coerce.apply(parse_numeric_column)
             df[newdf.columns] = newdf
             logger.debug(df)
 
@@ -577,7 +399,7 @@ def standardize_dataframe(
 
         for column_name in report.columns_to_flip:
             try:
-                df[column_name] = df[column_name].apply(lambda x: -1 * x)
+                df[column_name] = -df[column_name]
             except KeyError as exc:
                 raise StandardizationError(
                     f"No {column_name} column found but present in metadata file."
@@ -587,36 +409,44 @@ def standardize_dataframe(
         df_to_multiply = df.select_dtypes(include=numerics).drop(
             ["employees", "effective_tax_rate"], axis="columns", errors="ignore"
         )
-        df[df_to_multiply.columns] = df_to_multiply.applymap(lambda x: report.unit_multiplier * x)
+        df[df_to_multiply.columns] = df_to_multiply.apply(
+            scale_column, multiplier=report.unit_multiplier
+        )
         # df.sort_index(axis=1, inplace=True)
-        df.insert(0, "currency", np.repeat(report.currency, len(df)))
+        df.insert(0, "currency", repeat_category(report.currency, len(df)))
         # retrofit years as end_of_year (legacy metadata may just show `2020` instead of `2020.12.31`).
         end_of_year = (
             report.end_of_year + ".12.31"
             if YEAR_REGEX.match(report.end_of_year)
             else report.end_of_year
         )
+        if report.months_in_period == 12:
+            multiplier_to_euro = EXCHANGE_RATES.rate(report.currency, end_of_year)
+        else:
+            multiplier_to_euro = MONTHLY_RATES.average(
+                report.currency, end_of_year, report.months_in_period
+            )
         df.insert(
             1,
             "multiplier_to_euro",
-            np.repeat(float(EXCHANGE_RATES[(report.currency, end_of_year)]), len(df)),
+            np.repeat(multiplier_to_euro, len(df)),
         )
 
         if report.parent_jurisdiction:
-            df.insert(1, "parent_entity_jurisdiction", np.repeat(report.parent_jurisdiction, len(df)))
+            df.insert(1, "parent_entity_jurisdiction", repeat_category(report.parent_jurisdiction, len(df)))
         if report.bvd_sector:
-            df.insert(2, "parent_entity_bvd_sector", np.repeat(report.bvd_sector, len(df)))
+            df.insert(2, "parent_entity_bvd_sector", repeat_category(report.bvd_sector, len(df)))
         if report.nace2_main:
             df.insert(
-                2, "parent_entity_nace2_main", np.repeat(f"{report.nace2_main}", len(df))
+                2, "parent_entity_nace2_main", repeat_category(f"{report.nace2_main}", len(df))
             )
         if report.nace2_core_code:
             df.insert(
-                2, "parent_entity_nace2_core_code", np.repeat(report.nace2_core_code, len(df))
+                2, "parent_entity_nace2_core_code", repeat_category(report.nace2_core_code, len(df))
             )
-        df.insert(0, "end_of_year", np.repeat(end_of_year, len(df)))
-        df.insert(0, "parent_entity", np.repeat(str.strip(report.parent_entity_name), len(df)))
-        df.insert(0, "group_name", np.repeat(report.group_name, len(df)))
+        df.insert(0, "end_of_year", repeat_category(end_of_year, len(df)))
+        df.insert(0, "parent_entity", repeat_category(str.strip(report.parent_entity_name), len(df)))
+        df.insert(0, "group_name", repeat_category(report.group_name, len(df)))
         df.drop(  # cleaner database - this was a hot fix, can be improved and dealt with sooner
             [
                 "statutory_tax_rate",
@@ -632,8 +462,11 @@ def standardize_dataframe(
 
     apply_rules_to_columns(df, report, rules)
     apply_rules_to_rows(df, report, rules)
-    if not operator_wont_intervene:
+    if review_queue is not None:
+        review_queue.add(df, report)
+    elif not operator_wont_intervene:
         operator_wont_intervene = get_new_rules_from_operator(df, report, rules)
     trim_dataframe(df)
     tidy_data(df, report)
+    apply_output_schema(df)
     return operator_wont_intervene
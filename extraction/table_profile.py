@@ -0,0 +1,114 @@
+"""This module contains the class TableProfile, which holds what the steps classifying an extracted table (is it a CbC report? is it transposed? where are the jurisdictions?) need to know about its cells, so that each table is scanned only once."""
+import numpy as np
+import pandas as pd
+
+from .utils import (
+    CBCR_TERMS_RE,
+    CONTINENTS,
+    CONTRY_TO_ISO3166_MAPPING,
+    DOUBLE_DIGITS,
+    ISO3166_ALPHA3,
+    neatify,
+)
+
+__all__ = ["TableProfile", "country_mask", "CbCR_terms_counts", "double_digits_mask"]
+
+
+def _cells(smtg: str | pd.Series | pd.DataFrame) -> np.ndarray:
+    if isinstance(smtg, (pd.DataFrame, pd.Series)):
+        return smtg.to_numpy(dtype=object)
+    return np.array([smtg], dtype=object)
+
+
+def _map_uniques(cells: np.ndarray, function, dtype) -> np.ndarray:
+    """Applies `function` to the distinct values of the cells only, and broadcasts the results back to the shape of the cells."""
+    codes, uniques = pd.factorize(cells.ravel(), use_na_sentinel=False)
+    return np.fromiter(map(function, uniques), dtype=dtype, count=len(uniques))[codes].reshape(
+        cells.shape
+    )
+
+
+def country_mask(smtg: str | pd.Series | pd.DataFrame, include_continents=False) -> np.ndarray:
+    """Boolean array, of the shape of the Series or DataFrame, flagging the cells with a country (ISO3166-1 alpha-3 code or known country name)."""
+
+    def is_country(cell: str) -> bool:
+        return bool(
+            cell.upper() in ISO3166_ALPHA3
+            or (cell.upper() in CONTINENTS if include_continents else False)
+            or CONTRY_TO_ISO3166_MAPPING.get(neatify(cell), "")
+        )
+
+    return _map_uniques(_cells(smtg), is_country, bool)
+
+
+def CbCR_terms_counts(smtg: str | pd.Series | pd.DataFrame, casefold=True) -> np.ndarray:
+    """Integer array, of the shape of the Series or DataFrame, with the number of CBCR terms in each cell."""
+
+    def count_terms(cell: str) -> int:
+        if casefold:
+            cell = cell.casefold()
+        return len(CBCR_TERMS_RE.findall(str(cell)))
+
+    return _map_uniques(_cells(smtg), count_terms, np.int64)
+
+
+def double_digits_mask(smtg: str | pd.Series | pd.DataFrame) -> np.ndarray:
+    """Boolean array, of the shape of the Series or DataFrame, flagging the cells with (at least) two consecutive digits."""
+    return _map_uniques(_cells(smtg), lambda cell: bool(DOUBLE_DIGITS.search(cell)), bool)
+
+
+class TableProfile:
+    """Cells of a table holding a country (or a continent) or a number (two digits or more) and number of CbCR terms in each cell, with their aggregates by row and by column. Profiles follow the table through transposition, removal of the head and concatenation, without scanning the cells again."""
+
+    def __init__(self, countries: np.ndarray, terms: np.ndarray, double_digits: np.ndarray) -> None:
+        self.countries = countries
+        self.terms = terms
+        self.double_digits = double_digits
+        self.countries_per_row = countries.sum(axis=1)
+        self.countries_per_column = countries.sum(axis=0)
+        self.nb_countries = int(self.countries_per_column.sum())
+        self.nb_terms = int(terms.sum())
+        self.double_digits_per_row = double_digits.sum(axis=1)
+
+    @classmethod
+    def of(cls, df: pd.DataFrame) -> "TableProfile":
+        return cls(
+            country_mask(df, include_continents=True),
+            CbCR_terms_counts(df),
+            double_digits_mask(df),
+        )
+
+    @classmethod
+    def concat(cls, profiles: list["TableProfile"]) -> "TableProfile":
+        """Profile of the tables concatenated vertically."""
+        return cls(
+            np.vstack([profile.countries for profile in profiles]),
+            np.vstack([profile.terms for profile in profiles]),
+            np.vstack([profile.double_digits for profile in profiles]),
+        )
+
+    @property
+    def shape(self) -> tuple[int, int]:
+        return self.countries.shape
+
+    def transpose(self) -> "TableProfile":
+        return TableProfile(self.countries.T, self.terms.T, self.double_digits.T)
+
+    def rows_from(self, index: int) -> "TableProfile":
+        """Profile of `df.iloc[index:]`."""
+        return TableProfile(
+            self.countries[index:], self.terms[index:], self.double_digits[index:]
+        )
+
+    def columns_with_countries(self, min_nb_countries: int) -> np.ndarray:
+        """Positions of the columns with at least `min_nb_countries` countries."""
+        return np.flatnonzero(self.countries_per_column >= min_nb_countries)
+
+    def rows_with_countries(self, min_nb_countries: int) -> np.ndarray:
+        """Positions of the rows with at least `min_nb_countries` countries."""
+        return np.flatnonzero(self.countries_per_row >= min_nb_countries)
+
+    def first_row_with_numbers(self, min_nb_numbers: int) -> int | None:
+        """Position of the first row with at least `min_nb_numbers` cells with two digits or more, None if there is none."""
+        rows = self.double_digits_per_row >= min_nb_numbers
+        return int(rows.argmax()) if rows.any() else None
@@ -1,22 +1,26 @@
 import csv
+import functools
+import json
 import re
+from importlib.metadata import version
 from itertools import filterfalse, tee
 from pkgutil import get_data
 
+import numpy as np
 import pandas as pd
 import pycountry
+from .exchange_rates import ExchangeRates, MonthlyRates
 from .log import logger
 
 pd.set_option("display.max_columns", None)
 
 
-EXCHANGE_RATES = dict(
-    ((row[0], row[1]), row[3])
-    for row in csv.reader(
-        get_data(__package__, "configuration/rolling_avg_rate.csv")
-        .decode("utf-8")
-        .splitlines()
-    )
+EXCHANGE_RATES = ExchangeRates.from_csv(
+    get_data(__package__, "configuration/rolling_avg_rate.csv").decode("utf-8")
+)
+# for reporting periods other than 12 months
+MONTHLY_RATES = MonthlyRates.from_csv(
+    get_data(__package__, "configuration/monthly_rates.csv").decode("utf-8")
 )
 
 CONTRY_TO_ISO3166_MAPPING = dict(
@@ -35,6 +39,7 @@ ISO3166_ALPHA3.add("XKX")  # Kosovo
 # Regexes compilation
 
 STAND_ALONE_CHAR_RE = re.compile(r"(\s\S\s*$)|(\smn\s*$)")
+MULTIPLE_SPACES_RE = re.compile(r" +")
 CHARS_TO_PURGE_FROM_COLUMN_NAMES_RE = re.compile(r"[^a-zA-Z ']")
 NOT_NUMERIC_CHARS_RE = re.compile(r"[^0-9\(\)\-\.%,]")
 PERCENTAGE_FORMAT_RE = re.compile(r"(\d+[.,]?\d*)\w?%")
@@ -56,6 +61,9 @@ ENGLISH_COLUMN_TERMS = [
 ]
 ITALIAN_COLUMN_TERMS = ["imposte", "pagate", "reddito", "utile"]
 CBCR_TERMS = ENGLISH_COLUMN_TERMS + ITALIAN_COLUMN_TERMS
+# no break after word (to account for superscripts)
+CBCR_TERMS_RE = re.compile("|".join(r"\b{}".format(word) for word in CBCR_TERMS))
+CONTINENTS = ["AFRICA", "EUROPE", "AMERICA", "ASIA", "NORTH AMERICA"]
 YEAR_REGEX = re.compile(r"^\d{4}$")
 DOUBLE_DIGITS = re.compile(r"\d{2}")
 
@@ -68,15 +76,27 @@ def partition(pred, iterable):
 
 
 def jurisdiction_to_iso3166(z):
-    x = neatify(z)
+    return _jurisdiction_to_iso3166(z, neatify(z))
+
+
+def jurisdictions_to_iso3166(values: pd.Series) -> pd.Series:
+    """`jurisdiction_to_iso3166` applied to a Series, resolving each distinct value once."""
+    uniques = pd.Series(values.unique(), dtype=object)
+    codes = dict(zip(uniques, map(_jurisdiction_to_iso3166, uniques, neatify_series(uniques))))
+    return values.map(codes)
+
+
+def _jurisdiction_to_iso3166(z, x):
+    """x is `neatify(z)`."""
     if x.upper() in ISO3166_ALPHA3:
         return x.upper()
     c = CONTRY_TO_ISO3166_MAPPING.get(x, "")
     # dont allow empty lines or they get assigned GBR.
     if x and not c and (z.upper() not in ISO3166_ALPHA3):
         try:
-            logger.debug(my_search_fuzzy(pycountry.countries, x))
-            c = my_search_fuzzy(pycountry.countries, x)[0][0]
+            matches = search_country_fuzzy(x)
+            logger.debug(matches)
+            c = matches[0][0]
         except LookupError:
             # don't bother if fails, more attempts to ensue.
             pass
@@ -84,6 +104,7 @@ def jurisdiction_to_iso3166(z):
     return c if c else (x if x else "<empty>")
 
 
+@functools.lru_cache(maxsize=2**16)
 def neatify(arg):
 
     """Returns a string with all non-[ascii-alphanumeric] characters removed, and all words lowercased."""
@@ -94,6 +115,19 @@ def neatify(arg):
     ).casefold()
 
 
+def neatify_series(values: pd.Series | np.ndarray) -> pd.Series:
+    """Vectorized `neatify` (through the pandas str accessor)."""
+    return (
+        pd.Series(values, dtype=object)
+        .str.replace(CHARS_TO_PURGE_FROM_COLUMN_NAMES_RE, " ", regex=True)
+        .str.replace(STAND_ALONE_CHAR_RE, " ", regex=True)
+        # only spaces are left as whitespace: same as " ".join(x.split())
+        .str.replace(MULTIPLE_SPACES_RE, " ", regex=True)
+        .str.strip()
+        .str.casefold()
+    )
+
+
 def my_search_fuzzy(self, query):
     """
     copied from github of pycountry but ignores subdivisions and cuts through uninteresting things to us.
@@ -146,3 +180,97 @@ def my_search_fuzzy(self, query):
         for x in sorted(results.items(), key=lambda x: (-x[1], x[0]))
     ]
     return results
+
+
+class CountryNameIndex:
+    """Same results as `my_search_fuzzy(pycountry.countries, query)`, but the normalized country names are computed once and indexed by trigram, so that only the countries whose names may contain the query are scanned."""
+
+    def __init__(self, countries=pycountry.countries) -> None:
+        self.countries = countries
+        # (alpha_3, [normalized name, official_name and comment - in the order they are tried])
+        self.entries = []
+        # trigram -> indices of the entries with a name containing it
+        self.trigrams = {}
+        for i, candidate in enumerate(countries):
+            names = [
+                pycountry.remove_accents(v.lower())
+                for v in [
+                    candidate._fields.get("name"),
+                    candidate._fields.get("official_name"),
+                    candidate._fields.get("comment"),
+                ]
+                if v is not None
+            ]
+            self.entries.append((candidate.alpha_3, names))
+            for name in names:
+                for j in range(len(name) - 2):
+                    self.trigrams.setdefault(name[j : j + 3], set()).add(i)
+
+    def candidates(self, query: str):
+        if len(query) < 3:
+            return range(len(self.entries))
+        postings = [self.trigrams.get(query[j : j + 3], set()) for j in range(len(query) - 2)]
+        return sorted(set.intersection(*postings))
+
+    def search(self, query: str) -> list[tuple[str, int]]:
+        """See `my_search_fuzzy`."""
+        query = pycountry.remove_accents(query.strip().lower())
+        if query in ["africa", "america", "europe"]:
+            return [(query, 51)]
+        results = {}
+        try:
+            alpha_3 = self.countries.lookup(query).alpha_3
+            results[alpha_3] = results.get(alpha_3, 0) + 50
+        except LookupError:
+            pass
+        for i in self.candidates(query):
+            alpha_3, names = self.entries[i]
+            for v in names:
+                if query in v:
+                    results[alpha_3] = results.get(alpha_3, 0) + max([5, 30 - (2 * v.find(query))])
+                    break
+        if not results:
+            raise LookupError(query)
+        return sorted(results.items(), key=lambda x: (-x[1], x[0]))
+
+
+_COUNTRY_NAME_INDEX = None
+# query -> results of the fuzzy search (None if nothing was found); see `load_country_memo`.
+COUNTRY_MEMO = {}
+
+
+def search_country_fuzzy(query: str) -> list[tuple[str, int]]:
+    """Memoized and indexed equivalent of `my_search_fuzzy(pycountry.countries, query)`. Raises LookupError if no country matches."""
+    global _COUNTRY_NAME_INDEX
+    try:
+        results = COUNTRY_MEMO[query]
+    except KeyError:
+        if _COUNTRY_NAME_INDEX is None:
+            _COUNTRY_NAME_INDEX = CountryNameIndex()
+        try:
+            results = _COUNTRY_NAME_INDEX.search(query)
+        except LookupError:
+            results = None
+        COUNTRY_MEMO[query] = results
+    if results is None:
+        raise LookupError(query)
+    return results
+
+
+def load_country_memo(path: str) -> None:
+    """Loads the results of previous fuzzy country searches, unless they were made with another version of pycountry."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            memo = json.load(f)
+    except (FileNotFoundError, json.decoder.JSONDecodeError):
+        return
+    if memo.get("pycountry") == version("pycountry"):
+        for query, results in memo["results"].items():
+            COUNTRY_MEMO.setdefault(
+                query, None if results is None else [tuple(r) for r in results]
+            )
+
+
+def save_country_memo(path: str) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"pycountry": version("pycountry"), "results": COUNTRY_MEMO}, f)
@@ -0,0 +1,218 @@
+"""Local stand-ins for the remote services called by the extraction, to test and benchmark offline: the ExtractTable.com API (ExtractTableStandIn) and the monthly_average endpoint of the XE API (XEStandIn). Both are HTTP servers answering from their own thread, and can simulate latency and transient failures.
+Run from the root of the repository: python tests/stand_ins.py extracttable --port 8000 --tables <cache file>
+or: python tests/stand_ins.py xe --port 8000 --recorded <dir>
+then: python -m extraction.configuration.exchange_rates_from_XE_api --url http://localhost:8000/v1/monthly_average/ --api_id x --api_key x"""
+import argparse
+import itertools
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from extraction.configuration.exchange_rates_from_XE_api import MONTHLY_RATES_PATH, read_monthly_rates
+
+__all__ = [
+    "StandIn",
+    "ExtractTableStandIn",
+    "XEStandIn",
+    "table_json",
+    "responses_from_monthly_rates",
+    "load_recorded",
+]
+
+
+class StandIn(ThreadingHTTPServer):
+    """HTTP server answering every request with `respond`, a (status, JSON body) pair. `failures` requests (among the first ones) are answered with a 503, and every response waits `latency` seconds.
+    Records the number of requests and the largest number of requests in flight at once."""
+
+    daemon_threads = True
+
+    def __init__(self, port=0, latency=0.0, failures=0) -> None:
+        super().__init__(("127.0.0.1", port), _Handler)
+        self.latency = latency
+        self.failures = failures
+        self.nb_requests = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    def respond(self, handler: BaseHTTPRequestHandler) -> tuple[int, dict]:
+        raise NotImplementedError
+
+    def answer(self, handler: "_Handler") -> None:
+        with self._lock:
+            self.nb_requests += 1
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            fail = self.failures > 0
+            if fail:
+                self.failures -= 1
+        try:
+            time.sleep(self.latency)
+            handler.send_json(*((503, {"Message": "Service unavailable."}) if fail else self.respond(handler)))
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def start(self) -> None:
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.server.answer(self)
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self.server.answer(self)
+
+    def send_json(self, status, body):
+        content = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def table_json(table: dict) -> dict:
+    """A table as cached ({column: {row: cell}}) to the TableJson of ExtractTable.com ({row: {column: cell}})."""
+    out = {}
+    for column, cells in table.items():
+        for row, cell in cells.items():
+            out.setdefault(str(row), {})[str(column)] = cell
+    return out
+
+
+class ExtractTableStandIn(StandIn):
+    """Stand-in for ExtractTable.com, answering POST /trigger with the tables (a list of {column: {row: cell}}, e.g. those of a file of the ExtractTable.com cache) and GET /result?JobId=<id> with the job's status. With `polls`, triggers are answered, as ExtractTable.com does for PDFs, with a job that is still processing for the first `polls` GET /result. Requests with another x-api-key than `api_key` are answered with a 403.
+    Also records the times of the triggers."""
+
+    def __init__(self, tables: list[dict], api_key="key", port=0, latency=0.0, failures=0, polls=0) -> None:
+        super().__init__(port, latency, failures)
+        self.response = {"JobStatus": "Success", "Tables": [{"TableJson": table_json(t)} for t in tables]}
+        self.api_key = api_key
+        self.polls = polls
+        self.trigger_times = []
+        # job id -> polls left
+        self.jobs = {}
+        self._job_ids = itertools.count()
+
+    @property
+    def trigger_url(self) -> str:
+        return f"{self.base_url}/trigger"
+
+    @property
+    def result_url(self) -> str:
+        return f"{self.base_url}/result"
+
+    def respond(self, handler):
+        url = urlparse(handler.path)
+        if handler.headers.get("x-api-key") != self.api_key:
+            return 403, {"Message": "Invalid API Key"}
+        if handler.command == "POST" and url.path == "/trigger":
+            with self._lock:
+                self.trigger_times.append(time.monotonic())
+                if not self.polls:
+                    return 200, self.response
+                job_id = str(next(self._job_ids))
+                self.jobs[job_id] = self.polls
+            return 202, {"JobId": job_id, "JobStatus": "Processing"}
+        job_id = parse_qs(url.query).get("JobId", [None])[0]
+        with self._lock:
+            if url.path != "/result" or job_id not in self.jobs:
+                return 404, {"Message": "Unknown JobId."}
+            if self.jobs[job_id] > 1:
+                self.jobs[job_id] -= 1
+                return 200, {"JobId": job_id, "JobStatus": "Processing"}
+        return 200, {"JobId": job_id, **self.response}
+
+
+def responses_from_monthly_rates(monthly_rates: pd.DataFrame) -> dict:
+    """{(currency, year): response} as the XE API would send them for the months of monthly_rates."""
+    responses = {}
+    for row in monthly_rates.itertuples(index=False):
+        year, month, _ = row.end_of_month.split(".")
+        response = responses.setdefault(
+            (row[0], int(year)),
+            {"from": row[0], "amount": 1.0, "year": int(year), "to": {row.to: []}},
+        )
+        response["to"][row.to].append(
+            {"monthlyAverage": row.average_rate, "month": int(month), "daysInMonth": row.number_of_days}
+        )
+    return responses
+
+
+def load_recorded(record_dir) -> dict:
+    """{(currency, year): response} of the responses recorded by exchange_rates_from_XE_api.py (--record_to)."""
+    responses = {}
+    for filename in os.listdir(record_dir):
+        if filename.endswith(".json"):
+            with open(os.path.join(record_dir, filename), "r", encoding="utf-8") as f:
+                response = json.load(f)
+            responses[(response["from"], int(response["year"]))] = response
+    return responses
+
+
+class XEStandIn(StandIn):
+    """Stand-in for the XE API, answering GET <anything>?from=<currency>&to=EUR&year=<year> with the response of `responses` ({(currency, year): response}, see responses_from_monthly_rates and load_recorded)."""
+
+    def __init__(self, responses: dict, port=0, latency=0.0, failures=0) -> None:
+        super().__init__(port, latency, failures)
+        self.responses = responses
+
+    @property
+    def url(self) -> str:
+        return f"{self.base_url}/v1/monthly_average/"
+
+    def respond(self, handler):
+        query = parse_qs(urlparse(handler.path).query)
+        try:
+            return 200, self.responses[(query["from"][0], int(query["year"][0]))]
+        except (KeyError, ValueError):
+            return 404, {"message": "No rates recorded."}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds")
+    parser.add_argument("--failures", type=int, default=0, help="number of requests answered with a 503")
+    services = parser.add_subparsers(dest="service", required=True)
+    extracttable = services.add_parser("extracttable", help="ExtractTable.com")
+    extracttable.add_argument("--tables", required=True, help="a file of the ExtractTable.com cache, whose tables are served")
+    extracttable.add_argument("--api_key", default="key")
+    extracttable.add_argument("--polls", type=int, default=0, help="number of polls before a job is done")
+    xe = services.add_parser("xe", help="the monthly_average endpoint of the XE API")
+    xe.add_argument("--recorded", help="directory of responses recorded with --record_to")
+    xe.add_argument("--monthly_rates", default=MONTHLY_RATES_PATH, help="rates served when no response is recorded")
+    args = parser.parse_args()
+    if args.service == "extracttable":
+        with open(args.tables, "r", encoding="utf-8") as f:
+            tables = list(json.load(f).values())
+        server = ExtractTableStandIn(tables, args.api_key, args.port, args.latency, args.failures, args.polls)
+        print(f"Serving {len(tables)} tables at {server.trigger_url} and {server.result_url}")
+    else:
+        responses = responses_from_monthly_rates(read_monthly_rates(args.monthly_rates))
+        if args.recorded:
+            responses.update(load_recorded(args.recorded))
+        server = XEStandIn(responses, args.port, args.latency, args.failures)
+        print(f"Serving {len(responses)} responses at {server.url}")
+    server.serve_forever()
@@ -0,0 +1,29 @@
+import os.path
+import sys
+import unittest
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from extraction.concat_extracted.concat_extracted import add_euro_columns
+from extraction.utils import EXCHANGE_RATES
+
+
+class TestAddEuroColumns(unittest.TestCase):
+    def test_converted_with_the_multiplier_of_each_row(self):
+        df = pd.DataFrame(
+            {
+                "currency": pd.Categorical(["USD", "USD", "XXX", "EUR"]),
+                "end_of_year": ["2020.12.31", "2019.12.31", "2020.12.31", "2020.12.31"],
+                # e.g. a 6-month period, averaged over its months
+                "multiplier_to_euro": [0.5, np.nan, np.nan, 1.0],
+                "total_revenues": ["10", "10", "10", "4"],
+                "employees": ["1", "2", "3", "4"],
+            }
+        )
+        with self.assertLogs(level="ERROR"):  # no rates for XXX
+            add_euro_columns(df)
+        expected = [5.0, 10 * EXCHANGE_RATES.rate("USD", "2019.12.31"), np.nan, 4.0]
+        np.testing.assert_allclose(df["total_revenues_eur"], expected)
+        self.assertNotIn("employees_eur", df.columns)
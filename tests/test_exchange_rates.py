@@ -0,0 +1,83 @@
+import io
+import os.path
+import sys
+import unittest
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from extraction import StandardizationError
+from extraction.exchange_rates import ExchangeRates, MonthlyRates
+
+RATES = """from,end_of_year,total_days,rolling_12_months_avg_rate
+EUR,2020.12.31,366,1.0
+USD,2020.11.30,366,0.88
+USD,2020.12.31,366,0.87
+USD,2021.01.31,365,0.86
+GBP,2020.12.31,366,1.12
+"""
+
+MONTHLY_RATES = """from,to,end_of_month,average_rate,number_of_days
+USD,EUR,2020.01.31,0.90,31
+USD,EUR,2020.02.29,0.92,29
+USD,EUR,2020.03.31,0.91,31
+USD,EUR,2020.04.30,0.92,30
+USD,EUR,2020.05.31,0.91,31
+"""
+
+
+class TestExchangeRates(unittest.TestCase):
+    def setUp(self):
+        self.rates = ExchangeRates.from_csv(RATES)
+
+    def test_exact_month_end(self):
+        self.assertEqual(self.rates.rate("USD", "2020.12.31"), 0.87)
+
+    def test_as_of_preceding_month_end(self):
+        self.assertEqual(self.rates.rate("USD", "2020.12.30"), 0.88)
+        self.assertEqual(self.rates.rate("USD", "2021.02.15"), 0.86)
+
+    def test_missing_rates(self):
+        self.assertRaises(StandardizationError, self.rates.rate, "JPY", "2020.12.31")
+        self.assertRaises(StandardizationError, self.rates.rate, "USD", "2020.10.31")
+        self.assertRaises(StandardizationError, self.rates.rate, "USD", "2021.03.31")
+
+    def test_convert_columns(self):
+        converted = self.rates.convert(
+            pd.Series([100, 10, 1000]),
+            pd.Series(["USD", "GBP", "EUR"]),
+            pd.Series(["2020.12.31", "2020.12.31", "2020.12.31"]),
+        )
+        np.testing.assert_allclose(converted, [87.0, 11.2, 1000.0])
+
+
+class TestMonthlyRates(unittest.TestCase):
+    def setUp(self):
+        self.monthly = pd.read_csv(io.StringIO(MONTHLY_RATES), dtype={"end_of_month": str})
+
+    def test_average_over_any_period(self):
+        rates = MonthlyRates(self.monthly)
+        self.assertAlmostEqual(
+            rates.average("USD", "2020.03.31", months=3),
+            (0.90 * 31 + 0.92 * 29 + 0.91 * 31) / 91,
+        )
+        self.assertAlmostEqual(rates.average("USD", "2020.05.31", months=1), 0.91)
+        self.assertRaises(StandardizationError, rates.average, "USD", "2020.03.31", 4)
+
+    def test_incremental_append(self):
+        rates = MonthlyRates(self.monthly.iloc[:2])
+        rates.append(self.monthly.iloc[2:])
+        pd.testing.assert_frame_equal(
+            rates.rolling_averages(3), MonthlyRates(self.monthly).rolling_averages(3)
+        )
+        shuffled = MonthlyRates(self.monthly.iloc[[4, 0, 2]])
+        shuffled.append(self.monthly.iloc[[3, 1]])
+        pd.testing.assert_frame_equal(
+            shuffled.rolling_averages(3), MonthlyRates(self.monthly).rolling_averages(3)
+        )
+
+    def test_gaps_not_averaged(self):
+        rates = MonthlyRates(self.monthly.drop(index=2))
+        self.assertEqual(len(rates.rolling_averages(3)), 0)
+        self.assertRaises(StandardizationError, rates.average, "USD", "2020.04.30", 3)
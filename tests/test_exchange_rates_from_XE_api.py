@@ -0,0 +1,59 @@
+import os.path
+import sys
+import tempfile
+import unittest
+
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from extraction.configuration.exchange_rates_from_XE_api import (
+    read_monthly_rates,
+    update_monthly_rates,
+)
+from tests.stand_ins import XEStandIn, responses_from_monthly_rates
+
+MONTHLY_RATES_PATH = os.path.join(
+    os.path.dirname(__file__), "..", "extraction", "configuration", "monthly_rates.csv"
+)
+
+
+class TestXEFetcher(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, "monthly_rates.csv")
+        all_rates = read_monthly_rates(MONTHLY_RATES_PATH)
+        self.expected = all_rates[
+            all_rates["from"].isin(["USD", "GBP"])
+            & all_rates["end_of_month"].str[:4].isin(["2020", "2021", "2022"])
+        ].reset_index(drop=True)
+        self.server = XEStandIn(responses_from_monthly_rates(self.expected), failures=3)
+        self.server.start()
+
+    def tearDown(self):
+        self.server.stop()
+        self.tmp_dir.cleanup()
+
+    def update(self):
+        return update_monthly_rates(
+            ("id", "key"),
+            monthly_rates_path=self.path,
+            url=self.server.url,
+            currencies=["USD", "GBP"],
+            years=range(2020, 2023),
+            max_workers=4,
+            backoff_factor=0,
+        )
+
+    def test_appends_missing_months_only(self):
+        # 2021 is missing for USD, and GBP altogether
+        usd = self.expected[self.expected["from"] == "USD"]
+        usd[~usd["end_of_month"].str.startswith("2021")].to_csv(self.path, index=False)
+        self.assertEqual(self.update(), 12 + 3 * 12)
+        self.assertEqual(self.server.nb_requests, 3 + 1 + 3)  # 3 retried failures
+        fetched = read_monthly_rates(self.path).sort_values(["from", "end_of_month"])
+        pd.testing.assert_frame_equal(
+            fetched.reset_index(drop=True),
+            self.expected.sort_values(["from", "end_of_month"]).reset_index(drop=True),
+        )
+        self.assertEqual(self.update(), 0)
+        self.assertEqual(self.server.nb_requests, 3 + 1 + 3)
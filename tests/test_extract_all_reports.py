@@ -0,0 +1,246 @@
+import json
+import os.path
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from extraction import (
+    ExtractionTimeout,
+    StandardizationError,
+    ReviewQueue,
+    Rules,
+    extract_all_reports,
+    get_reports_from_metadata,
+)
+from extraction.extract_all_reports import _standardize_report
+from extraction.schema import as_raw_strings
+
+RULES = """{"column_rules": {"default": {}}, "jurisdiction_rules": {"default": {}}}"""
+TABLE = pd.DataFrame(
+    [
+        ["Jurisdiction", "Revenues", "Income tax paid"],
+        ["France", "1,234", "12"],
+        ["Germany", "56", "3"],
+    ]
+)
+
+
+# stand-ins for _standardize_report, in the worker processes: these are spawned, and the patches of the tests do not apply there
+def failing_standardize_report(*args):
+    with mock.patch(
+        "extraction.extract_all_reports.standardize_dataframe", side_effect=StandardizationError("failed")
+    ):
+        return _standardize_report(*args)
+
+
+def buggy_standardize_report(report, *args):
+    if report.group_name == "b":
+        raise KeyError("bug")
+    return _standardize_report(report, *args)
+
+
+class FakePendingExtraction:
+    def __init__(self, events, report, times_out=()) -> None:
+        self.events = events
+        self.report = report
+        self.times_out = times_out
+        events.append(("submit", report.group_name))
+
+    def collect(self):
+        self.events.append(("collect", self.report.group_name))
+        if self.report.group_name in self.times_out:
+            raise ExtractionTimeout(f"camelot-py job on {self.report} timed out.")
+        return [as_raw_strings(TABLE)]
+
+
+class TestExtractAllReports(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.names = ["a", "b", "c", "d"]
+        self.reports = get_reports_from_metadata(
+            json.dumps(
+                {
+                    name: {
+                        "2020.12.31": {
+                            "unit": "1",
+                            "currency": "EUR",
+                            "pages": [1],
+                            "filename": f"{name if name != 'c' else 'b'}.pdf",
+                            "to_extract": "yes",
+                            "columns_to_flip": [],
+                        },
+                        "default": {"parent_entity_name": name},
+                    }
+                    for name in self.names
+                }
+            )
+        )
+        self.dirs = {
+            name: os.path.join(self.tmp_dir.name, name)
+            for name in ["pdfs", "intervened", "intermediate", "outputs"]
+        }
+        for directory in self.dirs.values():
+            os.makedirs(directory)
+        for name in ["a", "b", "d"]:
+            open(os.path.join(self.dirs["pdfs"], f"{name}.pdf"), "w").close()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_extracts_ahead_in_order(self):
+        events = []
+        with mock.patch(
+            "extraction.extract_all_reports.submit_extraction",
+            lambda key, report, *args: FakePendingExtraction(events, report),
+        ), mock.patch(
+            "extraction.extract_all_reports.get_DataFrames",
+            lambda key, report, *args, **kwargs: FakePendingExtraction(events, report).collect(),
+        ):
+            not_extracted = extract_all_reports(
+                self.reports,
+                Rules(RULES),
+                self.dirs["pdfs"],
+                self.dirs["intervened"],
+                self.dirs["intermediate"],
+                self.dirs["outputs"],
+                quiet=True,
+                operator_wont_intervene=True,
+                prefetch=2,
+                standardization_workers=1,
+            )
+        self.assertEqual(not_extracted, set())
+        # c shares b's PDF: it is only submitted once b is collected
+        self.assertEqual(
+            events,
+            [
+                ("submit", "a"),
+                ("submit", "b"),
+                ("collect", "a"),
+                ("submit", "d"),
+                ("collect", "b"),
+                ("submit", "c"),
+                ("collect", "c"),
+                ("collect", "d"),
+            ],
+        )
+        self.assertEqual(len(os.listdir(self.dirs["outputs"])), 4)
+
+    def test_timed_out_report_fails(self):
+        events = []
+        with mock.patch(
+            "extraction.extract_all_reports.submit_extraction",
+            lambda key, report, *args: FakePendingExtraction(events, report, times_out=["b"]),
+        ):
+            not_extracted = extract_all_reports(
+                self.reports,
+                Rules(RULES),
+                self.dirs["pdfs"],
+                self.dirs["intervened"],
+                self.dirs["intermediate"],
+                self.dirs["outputs"],
+                quiet=True,
+                operator_wont_intervene=True,
+                standardization_workers=1,
+            )
+        self.assertEqual([report.group_name for report in not_extracted], ["b"])
+        self.assertEqual(len(os.listdir(self.dirs["outputs"])), 3)
+
+    def test_parallel_standardization(self):
+        for name in self.names:
+            TABLE.to_csv(
+                os.path.join(self.dirs["intervened"], f"{name}_2020.12.31.csv"), index=False, header=False
+            )
+        outputs, queues = [], []
+        for workers in [1, 2]:
+            review_queue = ReviewQueue()
+            not_extracted = extract_all_reports(
+                self.reports,
+                Rules(RULES),
+                self.dirs["pdfs"],
+                self.dirs["intervened"],
+                self.dirs["intermediate"],
+                self.dirs["outputs"],
+                force_rewrite=True,
+                quiet=True,
+                review_queue=review_queue,
+                standardization_workers=workers,
+            )
+            self.assertEqual(not_extracted, set())
+            outputs.append(
+                {
+                    filename: open(os.path.join(self.dirs["outputs"], filename)).read()
+                    for filename in sorted(os.listdir(self.dirs["outputs"]))
+                }
+            )
+            queues.append(review_queue.pending())
+        self.assertEqual(len(outputs[1]), 4)
+        self.assertEqual(outputs[1], outputs[0])
+        self.assertEqual(queues[1], queues[0])
+        self.assertEqual(
+            [(col_or_jur, name, sum(entry["reports"].values())) for col_or_jur, name, entry in queues[1]],
+            [("c", "revenues", 4), ("c", "income tax paid", 4)],
+        )
+
+    def test_failed_standardization_keeps_queued_names(self):
+        for name in self.names:
+            TABLE.to_csv(
+                os.path.join(self.dirs["intervened"], f"{name}_2020.12.31.csv"), index=False, header=False
+            )
+        for workers in [1, 2]:
+            review_queue = ReviewQueue()
+
+            def run():
+                return extract_all_reports(
+                    self.reports,
+                    Rules(RULES),
+                    self.dirs["pdfs"],
+                    self.dirs["intervened"],
+                    self.dirs["intermediate"],
+                    self.dirs["outputs"],
+                    force_rewrite=True,
+                    quiet=True,
+                    review_queue=review_queue,
+                    standardization_workers=workers,
+                )
+
+            run()
+            queued = review_queue.pending()
+            with mock.patch(
+                "extraction.extract_all_reports.standardize_dataframe",
+                side_effect=StandardizationError("failed"),
+            ), mock.patch("extraction.extract_all_reports._standardize_report", failing_standardize_report):
+                not_extracted = run()
+            self.assertEqual(len(not_extracted), 4)
+            self.assertEqual(review_queue.pending(), queued)
+
+    def test_parallel_standardization_failures_and_country_memo(self):
+        table = pd.concat([TABLE, pd.DataFrame([["Itly", "7", "1"]])], ignore_index=True)
+        for name in self.names:
+            table.to_csv(
+                os.path.join(self.dirs["intervened"], f"{name}_2020.12.31.csv"), index=False, header=False
+            )
+        with mock.patch(
+            "extraction.extract_all_reports._standardize_report", buggy_standardize_report
+        ), mock.patch.dict(
+            "extraction.utils.COUNTRY_MEMO", clear=True
+        ):
+            not_extracted = extract_all_reports(
+                self.reports,
+                Rules(RULES),
+                self.dirs["pdfs"],
+                self.dirs["intervened"],
+                self.dirs["intermediate"],
+                self.dirs["outputs"],
+                quiet=True,
+                review_queue=ReviewQueue(),
+                standardization_workers=2,
+            )
+        self.assertEqual([report.group_name for report in not_extracted], ["b"])
+        self.assertEqual(len(os.listdir(self.dirs["outputs"])), 3)
+        # fuzzy matches made in the workers are saved
+        with open(os.path.join(self.dirs["intermediate"], "country_fuzzy_matches.json")) as f:
+            self.assertIn("itly", json.load(f)["results"])
@@ -0,0 +1,113 @@
+import os.path
+import sys
+import tempfile
+import time
+import unittest
+
+import pandas as pd
+from PyPDF2 import PdfWriter
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from extraction import ExtractionError, get_reports_from_metadata
+from extraction.extracttable_client import ExtractTableClient
+from tests.stand_ins import ExtractTableStandIn
+from extraction.pdf_to_dataframe import ExtractTableExtractor
+
+ROWS = [["Jurisdiction", "Revenues"], ["France", "1,234"], ["Germany", "56"]]
+METADATA = """
+{
+    "eni": {
+        "2020.12.31": {"unit": "1", "currency": "EUR", "pages": [2, 3], "filename": "eni.pdf", "to_extract": "yes"},
+        "default": {"parent_entity_name": "ENI SPA"}
+    }
+}"""
+
+
+class TestExtractTableClient(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.pdf_path = os.path.join(self.tmp_dir.name, "eni.pdf")
+        writer = PdfWriter()
+        for _ in range(3):
+            writer.add_blank_page(width=200, height=200)
+        with open(self.pdf_path, "wb") as f:
+            writer.write(f)
+        self.server = None
+
+    def tearDown(self):
+        if self.server is not None:
+            self.server.stop()
+        self.tmp_dir.cleanup()
+
+    def serve(self, **kwargs):
+        self.server = ExtractTableStandIn([pd.DataFrame(ROWS).to_dict()], **kwargs)
+        self.server.start()
+
+    def client(self, api_key="key", **kwargs):
+        return ExtractTableClient(
+            api_key,
+            backoff_factor=0,
+            poll_interval=0.01,
+            trigger_url=self.server.trigger_url,
+            result_url=self.server.result_url,
+            **kwargs,
+        )
+
+    def test_polls_and_retries(self):
+        self.serve(failures=2, polls=3)
+        with self.client() as client:
+            tables = client.submit(self.pdf_path, [2, 3]).result()
+        self.assertEqual([pd.DataFrame(table).values.tolist() for table in tables], [ROWS])
+        self.assertEqual(self.server.nb_requests, 2 + 1 + 3)
+        self.assertEqual(client.credits_spent, 2)
+
+    def test_bounded_concurrency(self):
+        self.serve(latency=0.05)
+        with self.client(max_workers=4) as client:
+            jobs = [client.submit(self.pdf_path, [1]) for _ in range(12)]
+            self.assertTrue(all(len(job.result()) == 1 for job in jobs))
+        self.assertEqual(self.server.max_in_flight, 4)
+
+    def test_paced_by_credits(self):
+        self.serve()
+        with self.client(credits_per_second=40) as client:
+            for job in [client.submit(self.pdf_path, [1, 2]) for _ in range(5)]:
+                job.result()
+        gaps = [b - a for a, b in zip(self.server.trigger_times, self.server.trigger_times[1:])]
+        self.assertGreater(min(gaps), 2 / 40 * 0.9)
+
+    def test_max_credits(self):
+        self.serve()
+        with self.client(max_credits=3) as client:
+            with self.assertRaises(ExtractionError):
+                client.submit(self.pdf_path, [4]).result()
+            client.submit(self.pdf_path, [1, 2]).result()
+            with self.assertRaises(ExtractionError):
+                client.submit(self.pdf_path, [1, 2]).result()
+        self.assertEqual(client.credits_spent, 2)
+        self.assertEqual(len(self.server.trigger_times), 1)
+
+    def test_errors(self):
+        self.serve(latency=0.5)
+        with self.client(api_key="wrong") as client, self.assertRaisesRegex(ExtractionError, "403"):
+            client.process_file(self.pdf_path, [1])
+        self.assertEqual(client.credits_spent, 0)  # failed jobs are not charged
+        with self.client(timeout=0.1, retries=0) as client, self.assertRaises(ExtractionError):
+            client.process_file(self.pdf_path, [1])
+        with self.client() as client, self.assertRaisesRegex(ExtractionError, "only 3 pages"):
+            client.process_file(self.pdf_path, [4])
+
+    def test_extractor(self):
+        self.serve(polls=1)
+        (report,) = get_reports_from_metadata(METADATA)
+        intermediate_dir = os.path.join(self.tmp_dir.name, "intermediate")
+        with self.client() as client:
+            # no process pool: the job runs in the client's threads
+            extractor = ExtractTableExtractor("key", self.tmp_dir.name, intermediate_dir, None, client)
+            start = time.monotonic()
+            jobs = extractor.submit_jobs(report)
+            self.assertLess(time.monotonic() - start, 0.5)
+            dfs = extractor.read_cache_write_intermediate_tables(report, jobs)
+            self.assertIsNone(extractor.submit_jobs(report))  # cached
+        self.assertEqual([df.values.tolist() for df in dfs], [ROWS])
+        self.assertEqual(self.server.nb_requests, 2)
@@ -0,0 +1,59 @@
+import json
+import os.path
+import sys
+import unittest
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from extraction.numeric_cells import (
+    clean_numeric_strings,
+    parse_numeric_column,
+    percentages_to_numbers,
+    percentages_to_rationals,
+    scale_column,
+)
+
+CORPUS_PATH = os.path.join(os.path.dirname(__file__), "data", "numeric_cells.json")
+
+
+class TestNumericCells(unittest.TestCase):
+    def test_recorded_corpus(self):
+        with open(CORPUS_PATH, "r", encoding="utf-8") as f:
+            cells = json.load(f)["cells"]
+        raw, expected = zip(*cells)
+        self.assertEqual(clean_numeric_strings(pd.Series(raw, dtype=object)).tolist(), list(expected))
+
+    def test_separator_in_cells(self):
+        self.assertEqual(
+            clean_numeric_strings(pd.Series(["1\x1f234", "(5)", ""])).tolist(), ["1234", "-5", ""]
+        )
+
+    def test_parse_column(self):
+        np.testing.assert_array_equal(
+            parse_numeric_column(pd.Series(["1,234", "(5)", "-", "12,5", "1.234.567,8"])),
+            [1234, -5, np.nan, 12.5, 1234567.8],
+        )
+        self.assertEqual(
+            parse_numeric_column(pd.Series(["1,234", "12%"])).tolist(), ["1234", "12%"]
+        )
+
+    def test_percentages(self):
+        np.testing.assert_allclose(
+            percentages_to_numbers(pd.Series(["12,5%", "1234", "nan", 1.5], dtype=object)),
+            [0.125, -1, -1, -1],
+        )
+        np.testing.assert_allclose(
+            percentages_to_rationals(pd.Series(["12,5%", "abc", 25.0], dtype=object)),
+            [0.125, np.nan, 0.25],
+        )
+
+    def test_scale_column(self):
+        scaled = scale_column(pd.Series([10**6, -2], dtype="int32"), 1000)
+        self.assertEqual(scaled.dtype, "int64")
+        self.assertEqual(scaled.tolist(), [10**9, -2000])
+        with self.assertLogs(level="WARNING"):
+            scaled = scale_column(pd.Series([10**15, 2]), 10**6)
+        self.assertEqual(scaled.dtype, "float64")
+        self.assertEqual(scaled.tolist(), [1e21, 2e6])
@@ -0,0 +1,168 @@
+import os.path
+import sys
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+import dill as pickle
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from extraction import ExtractionError, ExtractionTimeout, get_reports_from_metadata
+from extraction.pdf_to_dataframe import CamelotExtractor, camelot_executor, camelot_extraction
+
+METADATA = """
+{
+    "eni": {
+        "2020.12.31": {"unit": "1", "currency": "EUR", "pages": [3], "filename": "eni.pdf", "to_extract": "yes"},
+        "default": {"parent_entity_name": "ENI SPA"}
+    }
+}"""
+
+
+def slow_read_pdf(seconds):
+    time.sleep(seconds)
+    return []
+
+
+def crashing_read_pdf():
+    os._exit(1)
+
+
+def greedy_read_pdf(nb_bytes):
+    bytearray(nb_bytes)
+    return []
+
+
+def greedy_slow_read_pdf(nb_bytes, seconds):
+    data = b"x" * nb_bytes
+    time.sleep(seconds)
+    return [len(data)]
+
+
+def address_space() -> int:
+    with open("/proc/self/status") as f:
+        return next(int(line.split()[1]) * 1024 for line in f if line.startswith("VmSize:"))
+
+
+def resident_memory() -> int:
+    with open("/proc/self/status") as f:
+        return next(int(line.split()[1]) * 1024 for line in f if line.startswith("VmRSS:"))
+
+
+class TestCamelotJobs(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        (self.report,) = get_reports_from_metadata(METADATA)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def extractor(self, executor, job_timeout=None):
+        return CamelotExtractor(self.tmp_dir.name, self.tmp_dir.name, executor, job_timeout)
+
+    def submit(self, executor, read_pdf, timeout=None, **options):
+        return executor.submit(camelot_extraction, pickle.dumps(read_pdf), {}, options, timeout)
+
+    def test_timeout(self):
+        with camelot_executor(1) as executor:
+            extractor = self.extractor(executor, job_timeout=0.5)
+            jobs = [
+                self.submit(executor, slow_read_pdf, 0.5, seconds=0.1),
+                self.submit(executor, slow_read_pdf, 0.5, seconds=30),
+            ]
+            start = time.monotonic()
+            with self.assertRaises(ExtractionTimeout):
+                extractor.write_cache(self.report, jobs)
+            self.assertLess(time.monotonic() - start, 5)
+            self.assertFalse(extractor.check_cache(self.report))
+            # the worker is free for the next report
+            extractor.write_cache(
+                self.report, [self.submit(executor, slow_read_pdf, 0.5, seconds=0.1)]
+            )
+            self.assertTrue(extractor.check_cache(self.report))
+
+    def test_stuck_job_is_killed(self):
+        start = time.monotonic()
+        with mock.patch("extraction.pdf_to_dataframe.TIMEOUT_GRACE", 0), camelot_executor(
+            1, job_timeout=0.3
+        ) as executor:
+            extractor = self.extractor(executor, job_timeout=0.3)
+            # not interrupted by the worker, as if stuck in C code
+            jobs = [
+                self.submit(executor, slow_read_pdf, None, seconds=30),
+                self.submit(executor, slow_read_pdf, None, seconds=0),
+            ]
+            # the jobs of the next report, queued behind
+            next_jobs = [self.submit(executor, slow_read_pdf, None, seconds=0) for _ in range(3)]
+            with self.assertRaises(ExtractionTimeout):
+                extractor.write_cache(self.report, jobs)
+            self.assertLess(time.monotonic() - start, 3)
+            self.assertTrue(jobs[1].cancelled())
+            # run by a new worker
+            extractor.write_cache(self.report, next_jobs)
+            self.assertTrue(extractor.check_cache(self.report))
+        self.assertLess(time.monotonic() - start, 5)
+
+    def test_broken_pool_is_replaced(self):
+        with camelot_executor(1) as executor:
+            extractor = self.extractor(executor)
+            crashing = self.submit(executor, crashing_read_pdf)
+            others = [self.submit(executor, slow_read_pdf, seconds=0) for _ in range(3)]
+            with self.assertRaisesRegex(ExtractionError, "BrokenProcessPool"):
+                extractor.write_cache(self.report, [crashing])
+            extractor.write_cache(self.report, others)
+            self.assertTrue(extractor.check_cache(self.report))
+
+    def test_cancelled_running_job_is_killed(self):
+        start = time.monotonic()
+        with camelot_executor(1) as executor:
+            job = self.submit(executor, slow_read_pdf, None, seconds=30)
+            time.sleep(1)
+            self.assertTrue(job.cancel())
+            # the worker is free for the next job
+            self.submit(executor, slow_read_pdf, None, seconds=0).result(timeout=10)
+        self.assertLess(time.monotonic() - start, 10)
+
+    def test_rss_limit(self):
+        start = time.monotonic()
+        with camelot_executor(1, rss_limit=resident_memory() + 128 * 2**20) as executor:
+            extractor = self.extractor(executor)
+            with self.assertRaisesRegex(ExtractionError, "RSS limit"):
+                extractor.write_cache(
+                    self.report, [self.submit(executor, greedy_slow_read_pdf, nb_bytes=512 * 2**20, seconds=30)]
+                )
+            self.assertLess(time.monotonic() - start, 10)
+            # the worker was replaced
+            extractor.write_cache(self.report, [self.submit(executor, slow_read_pdf, seconds=0)])
+            self.assertTrue(extractor.check_cache(self.report))
+
+    def test_interrupted_run_does_not_wait(self):
+        start = time.monotonic()
+        with self.assertRaises(KeyError), camelot_executor(1) as executor:
+            job = self.submit(executor, slow_read_pdf, None, seconds=30)
+            time.sleep(1)
+            raise KeyError("interrupted")
+        self.assertLess(time.monotonic() - start, 3)
+        self.assertTrue(job.cancelled())
+
+    def test_memory_limit(self):
+        limit = address_space() + 256 * 2**20
+        with camelot_executor(1, memory_limit=limit) as executor:
+            extractor = self.extractor(executor)
+            with self.assertRaisesRegex(ExtractionError, "MemoryError"):
+                extractor.write_cache(
+                    self.report, [self.submit(executor, greedy_read_pdf, nb_bytes=2**30)]
+                )
+            # the worker survived
+            extractor.write_cache(
+                self.report, [self.submit(executor, greedy_read_pdf, nb_bytes=2**20)]
+            )
+
+    def test_workers_are_recycled(self):
+        with camelot_executor(1, max_tasks_per_child=2) as executor:
+            pids = [
+                executor.submit(camelot_extraction, pickle.dumps(os.getpid), {}, {}).result()[1]
+                for _ in range(4)
+            ]
+        self.assertEqual(len(set(pids)), 2)
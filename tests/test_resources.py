@@ -0,0 +1,43 @@
+import os.path
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from extraction.resources import PoolSizes, available_memory, plan_pools
+
+GiB = 2**30
+
+
+class TestPlanPools(unittest.TestCase):
+    def test_one_worker_per_core(self):
+        self.assertEqual(plan_pools(cpus=8, memory=64 * GiB), PoolSizes(8, 8))
+        # not headless: reports are standardized in this process
+        self.assertEqual(
+            plan_pools(cpus=8, memory=64 * GiB, parallel_standardization=False), PoolSizes(8, 1)
+        )
+
+    def test_capped_by_memory(self):
+        # 64 camelot workers would need 64 GiB: the heaviest pool is shrunk first
+        self.assertEqual(plan_pools(cpus=64, memory=40 * GiB), PoolSizes(16, 64))
+        self.assertEqual(
+            plan_pools(cpus=64, memory=10 * GiB, parallel_standardization=False), PoolSizes(8, 1)
+        )
+        self.assertEqual(plan_pools(cpus=64, memory=GiB // 2), PoolSizes(1, 1))
+
+    def test_explicit_sizes_are_kept(self):
+        with self.assertLogs(level="WARNING"):
+            pools = plan_pools(camelot_workers=12, cpus=64, memory=8 * GiB)
+        self.assertEqual(pools, PoolSizes(12, 1))
+        # unknown memory: no cap
+        with mock.patch("extraction.resources.available_memory", return_value=None):
+            self.assertEqual(plan_pools(cpus=64).camelot, 64)
+
+    def test_available_memory(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "meminfo")
+            with open(path, "w") as f:
+                f.write("MemTotal:       16314856 kB\nMemFree:         1117284 kB\nMemAvailable:    8157428 kB\n")
+            self.assertEqual(available_memory(path), 8157428 * 1024)
+            self.assertGreater(available_memory(os.path.join(tmp_dir, "missing")), 0)
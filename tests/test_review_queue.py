@@ -0,0 +1,97 @@
+import os.path
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from extraction import ReviewQueue, Rules, get_reports_from_metadata
+
+METADATA = """
+{
+    "bp": {
+        "2019.12.31": {"unit": "1", "currency": "USD", "pages": [29], "filename": "bp_2019.pdf"},
+        "2020.12.31": {"unit": "1", "currency": "USD", "pages": [29], "filename": "bp_2020.pdf"},
+        "default": {"parent_entity_name": "BP PLC"}
+    },
+    "eni": {
+        "2020.12.31": {"unit": "1", "currency": "EUR", "pages": [3], "filename": "eni_2020.pdf"},
+        "default": {"parent_entity_name": "ENI SPA"}
+    }
+}"""
+NO_RULES = """{"column_rules": {"default": {}}, "jurisdiction_rules": {"default": {}}}"""
+
+
+def standardized(jurisdictions, odd_column="royalties"):
+    """A table as left by the rules, before being trimmed."""
+    return pd.DataFrame(
+        {
+            "jurisdiction": jurisdictions,
+            f"{odd_column}_1_tocheck": ["1,234"] * len(jurisdictions),
+            "tax_paid": ["12"] * len(jurisdictions),
+        }
+    )
+
+
+class TestReviewQueue(unittest.TestCase):
+    def setUp(self):
+        self.bp_2019, self.bp_2020, self.eni = get_reports_from_metadata(METADATA)
+        self.queue = ReviewQueue()
+        self.queue.add(standardized(["FRA", "rest of world_tocheck", "rest of world_tocheck"]), self.bp_2019)
+        self.queue.add(standardized(["rest of world_tocheck", "ITA"]), self.bp_2020)
+        self.queue.add(standardized(["ITA", "total_tocheck"], odd_column="rents"), self.eni)
+
+    def test_deduplicated_with_counts(self):
+        pending = self.queue.pending()
+        self.assertEqual(len(self.queue), 4)
+        self.assertEqual(pending[0][:2], ("j", "rest of world"))
+        self.assertEqual(
+            pending[0][2]["reports"], {"bp_2019.12.31": 2, "bp_2020.12.31": 1}
+        )
+        self.assertEqual(pending[0][2]["contexts"][0]["context"], "1,234 | 12")
+        self.assertEqual(pending[1][:2], ("c", "royalties"))
+
+    def test_save_and_load(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "queue.json")
+            self.queue.save(path)
+            loaded = ReviewQueue(path)
+        self.assertEqual(loaded.pending(), self.queue.pending())
+
+    def test_resolve_and_restandardize(self):
+        rules = Rules(NO_RULES)
+        # rest of world -> other for bp only, royalties -> tax_accrued everywhere, then quit
+        answers = ["2#", "y", "tax_accrued!", "y", "q"]
+        with mock.patch("builtins.input", side_effect=answers), mock.patch("builtins.print"):
+            self.assertEqual(self.queue.resolve(rules, [self.bp_2019, self.bp_2020, self.eni]), 2)
+        self.assertEqual(len(self.queue), 2)
+        self.assertEqual(rules.get_sink_from_strict(self.bp_2019, "rest of world", "j"), "other")
+        self.assertIsNone(rules.get_sink_from_strict(self.eni, "rest of world", "j"))
+        self.assertEqual(rules.get_sink_from_strict(self.eni, "royalties", "c"), "tax_accrued")
+        self.assertEqual(
+            self.queue.reports_to_restandardize(), {"bp_2019.12.31", "bp_2020.12.31"}
+        )
+        # once standardized again with the new rules, the reports leave the queue
+        for report in [self.bp_2019, self.bp_2020]:
+            self.queue.forget(report)
+            self.queue.add(standardized(["FRA"], odd_column="rents"), report)
+        self.assertEqual(self.queue.reports_to_restandardize(), set())
+        self.assertEqual(
+            [(col_or_jur, name, entry["reports"]) for col_or_jur, name, entry in self.queue.pending()],
+            [
+                ("c", "rents", {"eni_2020.12.31": 1, "bp_2019.12.31": 1, "bp_2020.12.31": 1}),
+                ("j", "total", {"eni_2020.12.31": 1}),
+            ],
+        )
+
+    def test_resolve_with_regex_rule(self):
+        rules = Rules(NO_RULES)
+        # "rest of world" -> other through a regex rule for every report, then quit
+        answers = ["r", "^rest of", "other", "!", "", "y", "q"]
+        with mock.patch("builtins.input", side_effect=answers), mock.patch("builtins.print"):
+            self.assertEqual(self.queue.resolve(rules, [self.bp_2019, self.bp_2020, self.eni]), 1)
+        self.assertIsNone(rules.get_sink_from_strict(self.bp_2019, "rest of world", "j"))
+        self.assertEqual(rules.get_sink_from_regex(self.eni, "rest of the world", "j"), "other")
+        self.assertEqual(self.queue.reports_to_restandardize(), {"bp_2019.12.31", "bp_2020.12.31"})
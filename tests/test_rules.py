@@ -1,5 +1,7 @@
+import csv
 import os.path
 import sys
+import tempfile
 import unittest
 
 sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
@@ -34,8 +36,7 @@ class TestRules(unittest.TestCase):
     }
     }"""
         )
-        self.rules = Rules(
-            """{
+        self.rules_json = """{
     "column_rules": {
         "default": {
             "corporate income taxes accrued": "tax_paid",
@@ -75,7 +76,7 @@ class TestRules(unittest.TestCase):
         }
     }
 }"""
-    )
+        self.rules = Rules(self.rules_json)
 
     def test_strict_sink(self):
         bp_report = self.reports[0]
@@ -96,6 +97,138 @@ class TestRules(unittest.TestCase):
         )
         self.assertEqual(sink, None)
 
+    def test_new_rule_invalidates_cached_view(self):
+        bp_report = self.reports[0]
+        self.assertEqual(self.rules.get_sink_from_strict(bp_report, "foo", "c"), None)
+        self.rules.write_new_rule("foo", "#", "tax_paid", "", "c", bp_report)
+        self.assertEqual(
+            self.rules.get_sink_from_strict(bp_report, "foo", "c"), "tax_paid"
+        )
+        self.rules.write_new_rule("_regex_^foo.*", "!", "bar", "", "c", bp_report)
+        self.assertEqual(self.rules.get_sink_from_regex(bp_report, "foox", "c"), "bar")
+
+    def test_regex_rules_first_match_wins(self):
+        bp_report = self.reports[0]
+        rules = Rules(
+            """{
+    "column_rules": {"default": {}},
+    "jurisdiction_rules": {
+        "default": {
+            "_regex_(a)(b)x": "first",
+            "_regex_(a)\\\\1": "backreference",
+            "_regex_a.*": "catch_all",
+            "_regex_b.*": "default_b"
+        },
+        "bp": {
+            "default": {"_regex_b.*": "mnc_b", "_regex_(c)|(d)": "c_or_d"}
+        }
+    }
+}"""
+        )
+        self.assertEqual(rules.get_sink_from_regex(bp_report, "abx", "j"), "first")
+        self.assertEqual(rules.get_sink_from_regex(bp_report, "aa", "j"), "backreference")
+        self.assertEqual(rules.get_sink_from_regex(bp_report, "ab", "j"), "catch_all")
+        self.assertEqual(rules.get_sink_from_regex(bp_report, "bb", "j"), "mnc_b")
+        self.assertEqual(rules.get_sink_from_regex(bp_report, "d", "j"), "c_or_d")
+        self.assertEqual(rules.get_sink_from_regex(bp_report, "e", "j"), None)
+
+    def test_resolve_many(self):
+        bp_report = self.reports[0]
+        resolved = self.rules.resolve_many(
+            bp_report,
+            ["tangible assets", "total x", "tax_paid", "unknown", "tangible assets"],
+            "c",
+        )
+        self.assertEqual(
+            resolved,
+            {
+                "tangible assets": "tangible_assets",
+                "total x": "foobar",
+                "tax_paid": "tax_paid",
+                "unknown": None,
+            },
+        )
+
+    def test_std_colnames_updated_by_new_rule(self):
+        bp_report = self.reports[0]
+        std_colnames = self.rules.get_std_colnames_from_rules()
+        self.assertIn("tax_accrued", std_colnames)
+        self.assertIn("foobar", std_colnames)
+        self.assertNotIn("new_sink", std_colnames)
+        self.rules.write_new_rule("foo", ".", "new_sink", "", "c", bp_report)
+        self.rules.write_new_rule("bar", ".", "to_drop", "", "c", bp_report)
+        std_colnames = self.rules.get_std_colnames_from_rules()
+        self.assertIn("new_sink", std_colnames)
+        self.assertNotIn("to_drop", std_colnames)
+        self.assertEqual(std_colnames, sorted(std_colnames))
+
+    def test_rule_stats(self):
+        bp_report = self.reports[0]
+        rules = Rules(self.rules_json, record_stats=True)
+        rules.get_sink_from_strict(bp_report, "tangible assets", "c")
+        rules.get_sink_from_strict(bp_report, "tangible assets", "c")
+        rules.get_sink_from_regex(bp_report, "totalioio", "c")
+        rules.get_sink_from_regex(bp_report, " totalx", "c")
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "stats.csv")
+            rules.export_rule_stats_to_csv(path)
+            with open(path, encoding="utf-8") as f:
+                stats = {row["source"]: row for row in csv.DictReader(f)}
+        self.assertEqual(stats["tangible assets"]["hits"], "2")
+        self.assertEqual(stats["tangible assets"]["last_matched_report"], "bp_2020.12.31")
+        self.assertEqual(stats["_regex_^total.*"]["hits"], "1")
+        self.assertGreater(float(stats["_regex_^total.*"]["match_time_s"]), 0)
+        self.assertEqual(stats["corporate taxes accrued"]["hits"], "0")
+
+    def test_pathological_regex_rules_skipped(self):
+        bp_report = self.reports[0]
+        with self.assertLogs(level="WARNING") as logs:
+            rules = Rules(
+                r"""{
+    "column_rules": {"default": {"_regex_^(a+)+$": "slow", "_regex_^a.*": "fine", "_regex_^(?:\\d+,)*\\d+$": "numbers"}},
+    "jurisdiction_rules": {"default": {"_regex_(": "invalid"}}
+}""",
+                regex_time_budget=0.2,
+            )
+        self.assertEqual(
+            set(rules.skipped_rules),
+            {("column_rules", "default", "", "_regex_^(a+)+$"), ("jurisdiction_rules", "default", "", "_regex_(")},
+        )
+        # suspicious, but fast enough once probed
+        self.assertTrue(any("_regex_^(?:" in line for line in logs.output))
+        self.assertEqual(rules.get_sink_from_regex(bp_report, "1,234", "c"), "numbers")
+        self.assertEqual(rules.get_sink_from_regex(bp_report, "a" * 30 + "!", "c"), "fine")
+        self.assertEqual(rules.get_sink_from_regex(bp_report, "(", "j"), None)
+        # probed with strings built from their own characters
+        for pattern in ["(a|a)*b", "(x*)*y", "^([A-Z]+\\s?)+$", "^(x+x+)+y$", "^Total: (\\w+\\s?)+$"]:
+            self.assertRaises(
+                RulesError, rules.write_new_rule, f"_regex_{pattern}", "!", "slow", "", "c", bp_report
+            )
+        # nested, but no match can backtrack for long
+        rules.write_new_rule("_regex_^(\\d+\\s)*total$", "!", "total", "", "c", bp_report)
+        self.assertEqual(rules.get_sink_from_regex(bp_report, "1 2 total", "c"), "total")
+
+    def test_regex_time_budget(self):
+        bp_report = self.reports[0]
+        rules = Rules(self.rules_json, regex_time_budget=0.5)
+        self.assertEqual(rules.skipped_rules, {})
+        self.assertIsNotNone(rules.regex_rule_problem(".*a.*a.*a.*a.*b"))
+        # slow matches while extracting are reported, and their rule is skipped from then on
+        key = ("column_rules", "default", "", "_regex_^total.*")
+        rules.regex_time_budget = 1e-9
+        with self.assertLogs(level="WARNING"):
+            self.assertEqual(rules.get_sink_from_regex(bp_report, "totalioio", "c"), "foobar")
+        self.assertIn(key, rules.slow_matches)
+        self.assertIn(key, rules.skipped_rules)
+        self.assertIsNone(rules.get_sink_from_regex(bp_report, "totalioio", "c"))
+        # same when rules are tried one by one to record their stats
+        rules = Rules(self.rules_json, record_stats=True, regex_time_budget=0.5)
+        rules.regex_time_budget = 1e-9
+        with self.assertLogs(level="WARNING"):
+            self.assertEqual(rules.get_sink_from_regex(bp_report, "totalioio", "c"), "foobar")
+        self.assertIn(key, rules.skipped_rules)
+        self.assertIsNone(rules.get_sink_from_regex(bp_report, "totalioio", "c"))
+
     def test_Rules__init__(self):
         self.assertRaises(RulesError, Rules, "foo")
     
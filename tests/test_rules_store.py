@@ -0,0 +1,147 @@
+import json
+import multiprocessing
+import os.path
+import pickle
+import sys
+import tempfile
+import unittest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from extraction import get_reports_from_metadata, Rules, RulesError
+
+METADATA = """
+{
+    "bp": {
+        "2020.12.31": {
+            "columns_to_flip": [],
+            "unit": "1",
+            "currency": "USD",
+            "pages": [29],
+            "filename": "2020_BP_CbCR_29-32.pdf",
+            "to_extract": "yes"
+        },
+        "default": {"parent_entity_name": "BP PLC"}
+    }
+}"""
+RULES = """{
+    "column_rules": {
+        "default": {
+            "_regex_^total.*": "foobar",
+            "corporate income taxes accrued": "tax_paid"
+        },
+        "bp": {"default": {"corporate income taxes accrued": "tax_accrued"}}
+    },
+    "jurisdiction_rules": {"default": {}}
+}"""
+
+
+def write_rules(store_path, worker, nb_rules):
+    report = get_reports_from_metadata(METADATA)[0]
+    rules = Rules(None, store=store_path)
+    for i in range(nb_rules):
+        rules.write_new_rule(f"col {worker} {i}", "!", f"sink_{worker}_{i}", "", "c", report)
+
+
+def export_rules(store_path, json_path, nb_exports):
+    rules = Rules(None, store=store_path)
+    for _ in range(nb_exports):
+        rules.write(json_path)
+
+
+class TestRulesStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.store_path = os.path.join(self.tmp_dir.name, "rules.sqlite")
+        self.report = get_reports_from_metadata(METADATA)[0]
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_seeded_from_json(self):
+        Rules(RULES, store=self.store_path)
+        rules = Rules(None, store=self.store_path)
+        self.assertEqual(
+            rules.get_sink_from_strict(self.report, "corporate income taxes accrued", "c"),
+            "tax_accrued",
+        )
+        self.assertEqual(rules.get_sink_from_regex(self.report, "totals", "c"), "foobar")
+
+    def test_rules_file_merged_into_store(self):
+        Rules(RULES, store=self.store_path)
+        edited = json.loads(RULES)
+        edited["column_rules"]["default"]["foo"] = "tax_paid"
+        edited["column_rules"]["default"]["corporate income taxes accrued"] = "tax_accrued"
+        with self.assertLogs(level="WARNING") as logs:
+            rules = Rules(json.dumps(edited), store=self.store_path)
+        # added by hand to the rules file: kept
+        self.assertEqual(rules.get_sink_from_strict(self.report, "foo", "c"), "tax_paid")
+        self.assertEqual(
+            Rules(None, store=self.store_path).get_sink_from_strict(self.report, "foo", "c"), "tax_paid"
+        )
+        # edited by hand: reported, the store's is used
+        self.assertTrue(any("corporate income taxes accrued" in line for line in logs.output))
+        json_path = os.path.join(self.tmp_dir.name, "rules.json")
+        rules.write(json_path)
+        with open(json_path, encoding="utf-8") as f:
+            exported = json.load(f)
+        self.assertEqual(exported["column_rules"]["default"]["corporate income taxes accrued"], "tax_paid")
+        self.assertEqual(exported["column_rules"]["default"]["foo"], "tax_paid")
+
+    def test_concurrent_exports(self):
+        Rules(RULES, store=self.store_path)
+        json_path = os.path.join(self.tmp_dir.name, "rules.json")
+        processes = [
+            multiprocessing.Process(target=export_rules, args=(self.store_path, json_path, 20))
+            for _ in range(4)
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        with open(json_path, encoding="utf-8") as f:
+            self.assertEqual(json.load(f), json.loads(RULES))
+        # no temporary file left behind
+        self.assertEqual([f for f in os.listdir(self.tmp_dir.name) if f.endswith(".json")], ["rules.json"])
+
+    def test_refresh_gets_rules_from_other_writers(self):
+        first = Rules(RULES, store=self.store_path)
+        second = Rules(None, store=self.store_path)
+        first.write_new_rule("foo", "#", "tax_paid", "std", "c", self.report)
+        self.assertEqual(second.get_sink_from_strict(self.report, "foo", "c"), None)
+        second.refresh()
+        self.assertEqual(second.get_sink_from_strict(self.report, "foo", "c"), "tax_paid")
+        self.assertIn("tax_paid", second.get_std_colnames_from_rules())
+
+    def test_concurrent_writers(self):
+        Rules(RULES, store=self.store_path)
+        processes = [
+            multiprocessing.Process(target=write_rules, args=(self.store_path, worker, 25))
+            for worker in range(4)
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        json_path = os.path.join(self.tmp_dir.name, "rules.json")
+        Rules(None, store=self.store_path).write(json_path)
+        with open(json_path, encoding="utf-8") as f:
+            exported = json.load(f)
+        self.assertEqual(len(exported["column_rules"]["default"]), 2 + 4 * 25)
+        self.assertEqual(
+            exported["column_rules"]["bp"]["default"]["corporate income taxes accrued"],
+            "tax_accrued",
+        )
+
+    def test_snapshot(self):
+        rules = Rules(RULES, store=self.store_path)
+        other = Rules(None, store=self.store_path)
+        other.write_new_rule("foo", "!", "tax_paid", "std", "c", self.report)
+        # sent to another process, without the store
+        snapshot = pickle.loads(pickle.dumps(rules.snapshot()))
+        self.assertEqual(snapshot.get_sink_from_strict(self.report, "foo", "c"), "tax_paid")
+        self.assertEqual(snapshot.get_sink_from_regex(self.report, "totals", "c"), "foobar")
+        self.assertRaises(
+            RulesError, snapshot.write_new_rule, "bar", "!", "tax_paid", "std", "c", self.report
+        )
+        rules.write_new_rule("bar", "!", "tax_paid", "std", "c", self.report)
+        self.assertEqual(snapshot.get_sink_from_strict(self.report, "bar", "c"), None)
@@ -0,0 +1,80 @@
+import os.path
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from extraction.schema import (
+    RAW_STRING_DTYPE,
+    apply_output_schema,
+    as_raw_strings,
+    concat_standardized,
+    read_standardized_csv,
+    repeat_category,
+)
+
+
+def standardized(group_name, jurisdictions, employees, tax_paid):
+    return pd.DataFrame(
+        {
+            "group_name": repeat_category(group_name, len(jurisdictions)),
+            "end_of_year": repeat_category("2020.12.31", len(jurisdictions)),
+            "jurisdiction": jurisdictions,
+            "employees": employees,
+            "tax_paid": tax_paid,
+        }
+    )
+
+
+class TestSchema(unittest.TestCase):
+    def test_apply_output_schema(self):
+        df = standardized("bp", ["FRA", "DEU"], [10, 20000], [1.5, np.nan])
+        apply_output_schema(df)
+        self.assertEqual(df["jurisdiction"].dtype, "category")
+        self.assertEqual(df["employees"].dtype, "Int16")
+        self.assertEqual(df["tax_paid"].dtype, "float64")
+
+    def test_concat_unites_categories(self):
+        first = standardized("bp", ["FRA", "DEU"], [10, 20], [1.5, np.nan])
+        second = standardized("eni", ["ITA", "FRA"], [10, 2**40], [1.0, 2.0])
+        apply_output_schema(first)
+        apply_output_schema(second)
+        out = concat_standardized([first, second])
+        self.assertEqual(out["group_name"].dtype, "category")
+        self.assertEqual(out["group_name"].tolist(), ["bp", "bp", "eni", "eni"])
+        self.assertEqual(set(out["jurisdiction"].cat.categories), {"FRA", "DEU", "ITA"})
+        self.assertEqual(out["employees"].dtype, "Int64")
+
+    def test_read_back(self):
+        df = standardized("bp", ["FRA", "DEU"], [10.0, np.nan], [1.5, np.nan])
+        df["parent_entity_nace2_core_code"] = ["0610", "0610"]
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "bp_2020.12.31.csv")
+            df.to_csv(path, index=False)
+            read = read_standardized_csv(path)
+        self.assertEqual(read["end_of_year"].dtype, "category")
+        self.assertEqual(read["parent_entity_nace2_core_code"].tolist(), ["0610", "0610"])
+        self.assertEqual(read["jurisdiction"].dtype, object)
+        self.assertEqual(read["employees"].dtype, "Int8")
+        self.assertTrue(read["employees"].isna()[1])
+        self.assertEqual(read["tax_paid"].dtype, "float64")
+
+    def test_raw_strings(self):
+        raw = pd.DataFrame([["France", 1.0, np.nan], [np.nan, 2.5, "(3)"]])
+        df = as_raw_strings(raw)
+        self.assertTrue((df.dtypes == RAW_STRING_DTYPE).all())
+        self.assertEqual(df.to_numpy(dtype=object).tolist(), raw.astype(str).to_numpy().tolist())
+
+    def test_raw_strings_backed_by_pyarrow(self):
+        # pyarrow is in the requirements: fails, rather than being skipped, without it
+        self.assertEqual(RAW_STRING_DTYPE.storage, "pyarrow")
+        df = as_raw_strings(pd.DataFrame([["France", "1,234"], ["Germany", "(56)"]]))
+        self.assertEqual(df[1].array.__class__.__name__, "ArrowStringArray")
+        # one buffer of characters per column instead of one Python object per cell
+        objects = pd.DataFrame([["France", "1,234"], ["Germany", "(56)"]] * 1000, dtype=object)
+        self.assertLess(
+            as_raw_strings(objects).memory_usage(deep=True).sum(), objects.memory_usage(deep=True).sum() / 3
+        )
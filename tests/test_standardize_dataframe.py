@@ -0,0 +1,118 @@
+import os.path
+import sys
+import unittest
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from extraction import get_reports_from_metadata
+from extraction.schema import RAW_STRING_DTYPE, as_raw_strings
+from extraction.standardize_dataframe import (
+    CbCR_terms_counts,
+    count_CbCR_terms,
+    count_countries,
+    country_mask,
+    unify_CbCR_tables,
+)
+
+METADATA = """
+{
+    "bp": {
+        "2020.12.31": {
+            "columns_to_flip": [],
+            "unit": "1",
+            "currency": "USD",
+            "pages": [29],
+            "filename": "2020_BP_CbCR_29-32.pdf",
+            "to_extract": "yes"
+        },
+        "default": {"parent_entity_name": "BP PLC"}
+    }
+}"""
+
+TABLE = pd.DataFrame(
+    [
+        ["Jurisdiction", "Revenues unrelated party", "Income tax paid"],
+        ["France", "1,234", "12"],
+        ["FRA", "(5)", "3"],
+        ["Europe", "7", "related party 8"],
+        ["Other", "nan", "-"],
+    ]
+)
+
+
+class TestCounts(unittest.TestCase):
+    def test_country_mask(self):
+        np.testing.assert_array_equal(
+            country_mask(TABLE[0]), [False, True, True, False, False]
+        )
+        np.testing.assert_array_equal(
+            country_mask(TABLE[0], include_continents=True), [False, True, True, True, False]
+        )
+        self.assertEqual(country_mask(TABLE).shape, TABLE.shape)
+
+    def test_count_countries(self):
+        self.assertEqual(count_countries(TABLE), 2)
+        self.assertEqual(count_countries(TABLE, include_continents=True), 3)
+        self.assertEqual(count_countries(TABLE, include_continents=True, stop_at=2), 2)
+        self.assertEqual(count_countries("france"), 1)
+
+    def test_count_CbCR_terms(self):
+        np.testing.assert_array_equal(CbCR_terms_counts(TABLE.iloc[0]), [0, 3, 2])
+        self.assertEqual(count_CbCR_terms(TABLE), 7)
+        self.assertEqual(count_CbCR_terms(TABLE, stop_at=4), 4)
+        self.assertEqual(count_CbCR_terms(TABLE, stop_at=10), 7)
+        self.assertEqual(count_CbCR_terms("Profit (loss) before income tax"), 3)
+        self.assertEqual(count_CbCR_terms("PROFIT", casefold=False), 0)
+
+
+class TestUnifyTables(unittest.TestCase):
+    def setUp(self):
+        self.report = get_reports_from_metadata(METADATA)[0]
+
+    def test_multi_row_head(self):
+        table = pd.DataFrame(
+            [
+                ["nan", "Revenues", "Income tax", "x"],
+                ["", "unrelated", "paid (€)", ""],
+                ["Jurisdiction", "party", "nan", "y"],
+                ["France", "1,234", "12", "10"],
+                ["Germany", "56", "3", "20"],
+            ]
+        )
+        unified, profile = unify_CbCR_tables(
+            [table, table.iloc[[0, 3, 4]]], self.report, return_profile=True
+        )
+        self.assertEqual(
+            unified.columns.tolist(),
+            ["jurisdiction", "revenues unrelated party", "income tax paid", "x"],
+        )
+        self.assertEqual(unified["jurisdiction"].tolist(), ["France", "Germany"] * 2)
+        self.assertEqual(profile.shape, unified.shape)
+        self.assertEqual(profile.nb_countries, 4)
+
+    def test_transposed_table(self):
+        table = pd.DataFrame(
+            [
+                ["Jurisdiction", "France", "Germany"],
+                ["Revenues", "1,234", "56"],
+                ["Income tax paid", "12", "13"],
+            ]
+        )
+        unified = unify_CbCR_tables([table], self.report)
+        self.assertEqual(unified.columns.tolist(), ["jurisdiction", "revenues", "income tax paid"])
+        self.assertEqual(unified["jurisdiction"].tolist(), ["France", "Germany"])
+
+    def test_raw_strings(self):
+        table = pd.DataFrame(
+            [
+                ["Jurisdiction", "Revenues", "Income tax paid"],
+                ["France", "1,234", "12"],
+                ["Germany", "56", np.nan],
+            ]
+        )
+        expected = unify_CbCR_tables([table.astype(str)], self.report)
+        unified = unify_CbCR_tables([as_raw_strings(table)], self.report)
+        self.assertTrue((unified.dtypes == RAW_STRING_DTYPE).all())
+        pd.testing.assert_frame_equal(unified.astype(object), expected)
@@ -0,0 +1,49 @@
+import os.path
+import sys
+import unittest
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from extraction.table_profile import TableProfile
+
+TABLE = pd.DataFrame(
+    [
+        ["Jurisdiction", "Revenues", "Income tax paid", "Employees"],
+        ["France", "1,234", "12", "10"],
+        ["Germany", "(5)", "3", "20"],
+        ["Europe", "7", "8", "30"],
+        ["Total", "1236", "23", "60"],
+    ]
+)
+
+
+def assert_same_profile(first: TableProfile, second: TableProfile):
+    np.testing.assert_array_equal(first.countries, second.countries)
+    np.testing.assert_array_equal(first.terms, second.terms)
+    np.testing.assert_array_equal(first.countries_per_row, second.countries_per_row)
+    np.testing.assert_array_equal(first.countries_per_column, second.countries_per_column)
+
+
+class TestTableProfile(unittest.TestCase):
+    def setUp(self):
+        self.profile = TableProfile.of(TABLE)
+
+    def test_aggregates(self):
+        self.assertEqual(self.profile.shape, TABLE.shape)
+        self.assertEqual(self.profile.nb_countries, 3)
+        self.assertEqual(self.profile.nb_terms, 4)
+        np.testing.assert_array_equal(self.profile.columns_with_countries(3), [0])
+        self.assertEqual(self.profile.rows_with_countries(2).size, 0)
+
+    def test_follows_the_table(self):
+        assert_same_profile(self.profile.transpose(), TableProfile.of(TABLE.T))
+        assert_same_profile(self.profile.rows_from(1), TableProfile.of(TABLE.iloc[1:]))
+        assert_same_profile(
+            TableProfile.concat([self.profile, self.profile.rows_from(2)]),
+            TableProfile.of(pd.concat([TABLE, TABLE.iloc[2:]], ignore_index=True)),
+        )
+        np.testing.assert_array_equal(
+            self.profile.transpose().rows_with_countries(3), [0]
+        )
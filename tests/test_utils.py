@@ -0,0 +1,70 @@
+import os.path
+import sys
+import tempfile
+import unittest
+
+import pandas as pd
+import pycountry
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from extraction import utils
+from extraction.utils import (
+    CONTRY_TO_ISO3166_MAPPING,
+    CountryNameIndex,
+    jurisdiction_to_iso3166,
+    jurisdictions_to_iso3166,
+    load_country_memo,
+    my_search_fuzzy,
+    neatify,
+    neatify_series,
+    save_country_memo,
+    search_country_fuzzy,
+)
+
+
+class TestCountryFuzzySearch(unittest.TestCase):
+    def test_same_scores_as_linear_search(self):
+        index = CountryNameIndex()
+        queries = list(CONTRY_TO_ISO3166_MAPPING)[:300] + [
+            "guinea", "island", "republic of", "korea", "ÉTATS", "zz", "a", "europe"
+        ]
+        for query in queries:
+            try:
+                expected = my_search_fuzzy(pycountry.countries, query)
+            except LookupError:
+                self.assertRaises(LookupError, index.search, query)
+                continue
+            self.assertEqual(index.search(query), expected, query)
+
+    def test_memo_persists(self):
+        self.assertEqual(jurisdiction_to_iso3166("Republic of Guinea"), "GIN")
+        self.assertRaises(LookupError, search_country_fuzzy, "qqqq")
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "memo.json")
+            save_country_memo(path)
+            utils.COUNTRY_MEMO.clear()
+            load_country_memo(path)
+        self.assertEqual(utils.COUNTRY_MEMO["qqqq"], None)
+        self.assertEqual(search_country_fuzzy("guinea"), [("GIN", 80), ("GNB", 30), ("PNG", 10), ("GNQ", 8)])
+
+
+class TestNeatify(unittest.TestCase):
+    def test_series_same_as_scalar(self):
+        values = [
+            "Revenues - Unrelated Party (US$ m)",
+            "  Profit (loss)\nbefore tax  ",
+            "Tax paid x",
+            "Tangible assets mn",
+            "Employees'",
+            " a",
+            "",
+            "Ré-sumé\t€ 1.000",
+        ]
+        self.assertEqual(neatify_series(values).tolist(), [neatify(v) for v in values])
+
+    def test_jurisdictions_to_iso3166(self):
+        values = pd.Series(["Portugal", "uk", "PRT", "Portugal", "", "Narnia"])
+        self.assertEqual(
+            jurisdictions_to_iso3166(values).tolist(),
+            [jurisdiction_to_iso3166(v) for v in values],
+        )